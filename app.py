@@ -1,239 +1,3130 @@
-from flask import Flask, request, jsonify, render_template
-from datetime import datetime, timedelta
-from typing import List, Dict
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context, url_for
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, List
+import codecs
 import csv
-from collections import defaultdict
+import glob
+from collections import Counter, OrderedDict, defaultdict
+from collections.abc import Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from functools import cached_property, lru_cache, partial, wraps
+from itertools import accumulate, compress, count, islice, repeat
+from operator import itemgetter, ne, not_, sub
 from flask_cors import CORS
-from itertools import combinations
+import orjson
+import heapq
+import math
+import multiprocessing
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right, insort
 import os
 import io
+import re
+import base64
+import gzip
+import sqlite3
+import json
+import logging
+import mmap
+import struct
+import shutil
+import sys
+import tempfile
+import time
+import threading
+import uuid
 
 app = Flask(__name__)
 CORS(app)
+logger = logging.getLogger(__name__)
 
 # In-memory storage
 PURCHASES = []
 ORDERS = {}
+INDEX = None  # PurchaseIndex over the PURCHASES store, rebuilt on every load
+DATASET_VERSION = 0  # Bumped on every load; identifies the dataset this process serves
+
+DATASET_LOAD_MS = None  # Time taken to install the current dataset from the shared store
+
+# Where loaded datasets live: 'memory' keeps each process's own copy, while
+# 'sqlite' and 'snapshot' (a memory-mapped binary file) publish them to
+# DATASET_PATH so every worker serves the latest upload, also after a restart
+DATASET_STORE = os.environ.get('DATASET_STORE', 'memory')
+DATASET_PATH = os.environ.get('DATASET_PATH')
+# Hours an upload published to DATASET_PATH is kept before it is deleted;
+# 0 keeps it until the next upload or DELETE /api/dataset
+DATASET_RETENTION_HOURS = float(os.environ.get('DATASET_RETENTION_HOURS', 24))
+
+# Search result cache: entries kept, and seconds before an entry is recomputed
+SEARCH_CACHE_SIZE = int(os.environ.get('SEARCH_CACHE_SIZE', 512))
+SEARCH_CACHE_TTL = float(os.environ.get('SEARCH_CACHE_TTL', 600))
+
+# Search responses at least this large are gzip-compressed for clients that
+# accept it; level 1 shrinks match JSON several times over at a fraction of
+# the default level's cost
+RESPONSE_COMPRESS_MIN_BYTES = 1024
+RESPONSE_COMPRESS_LEVEL = 1
+# /api/dataset is compressed once per dataset, so it can afford a smaller encoding
+DATASET_EXPORT_COMPRESS_LEVEL = 6
+
+# Per-phase timings and counters aggregated for /api/metrics; set to 0 to turn
+# them off (?profile=1 still reports a single request's breakdown)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+# Upper bounds (seconds) of the latency histogram buckets
+METRICS_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Snapshot files: bump the schema version whenever the parts change meaning
+SNAPSHOT_MAGIC = b'AMZSNAP\0'
+SNAPSHOT_SCHEMA_VERSION = 1
+
+# Combination search limits: candidates kept in the date window, and the
+# total size (in bits) of the subset-sum reachability tables per search
+MAX_COMBINATION_CANDIDATES = 1000
+COMBINATION_TABLE_BITS = 256 * 1024 * 1024
+# Upper bound on exact combinations scored per search; dense price lists can
+# have millions of valid subsets and only the top 10 are ever returned
+MAX_COMBINATION_SOLUTIONS = 20000
+# Most items a combination may have (max_combo_items)
+MAX_COMBO_ITEMS = 10
+
+# Orders with up to this many priced lines get every subset total worked out
+# (at most 2**12 - 1 subsets each) for shipment search
+SHIPMENT_MAX_LINES = 12
+
+# Default and maximum wall-clock budget for one combination search, and how
+# often a streamed search reports progress (seconds)
+COMBINATION_TIME_BUDGET_MS = int(os.environ.get('COMBINATION_TIME_BUDGET_MS', 5000))
+MAX_COMBINATION_TIME_BUDGET_MS = 30000
+COMBINATION_PROGRESS_INTERVAL = 0.25
+
+# Worker processes that take over combination searches still going after
+# COMBINATION_HANDOFF_EXPANSIONS subtrees; 0 or 1 keeps every search in the
+# request's own thread
+COMBINATION_WORKERS = int(os.environ.get('COMBINATION_WORKERS', 0))
+COMBINATION_HANDOFF_EXPANSIONS = 256
+
+# Bytes read from an upload stream at a time (the first chunk picks the encoding)
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Parsed rows buffered before being appended to the store's columns
+LOAD_BATCH_SIZE = 4096
+# Rejected rows an upload reports as examples of each reject reason
+REJECT_SAMPLES = 3
+# Lower bounds (cents) of the price histogram's buckets in /api/stats
+PRICE_HISTOGRAM_CENTS = (0, 500, 1000, 2500, 5000, 10000, 25000, 50000)
+# Finished upload jobs remembered for /api/upload/<job_id>
+MAX_UPLOAD_JOBS = 50
+# Seconds between saves of a running job's progress to the shared backend
+UPLOAD_JOB_SAVE_INTERVAL = 0.5
+
+# Statement reconciliation limits
+MAX_RECONCILE_TRANSACTIONS = 5000
+RECONCILE_MATCHES_PER_TRANSACTION = 5
+# Default and maximum wall-clock budget shared by a reconcile request's
+# combination searches. Each may use up to RECONCILE_SEARCH_SHARES even shares
+# of the time left, so quick searches leave theirs to slower ones.
+RECONCILE_TIME_BUDGET_MS = int(os.environ.get('RECONCILE_TIME_BUDGET_MS', 500))
+MAX_RECONCILE_TIME_BUDGET_MS = 30000
+RECONCILE_SEARCH_SHARES = 16
+# Largest amount (dollars) a charge to match may have
+MAX_AMOUNT = 1_000_000
 
 def parse_date(date_string: str) -> datetime:
     return datetime.strptime(date_string, "%Y-%m-%d")
 
-def get_date_range(target_date: str, days_range: int):
-    """Calculate start and end dates for a given target date and range."""
-    target_dt = parse_date(target_date)
-    start_date = target_dt - timedelta(days=days_range)
-    end_date = target_dt + timedelta(days=days_range)
-    return target_dt, start_date, end_date
+@lru_cache(maxsize=8192)
+def parse_day(date_string: str) -> int:
+    """Parse a YYYY-MM-DD date into a day ordinal (cached; exports repeat dates heavily)."""
+    return parse_date(date_string).toordinal()
+
+@lru_cache(maxsize=8192)
+def month_of_day(day: int) -> str:
+    """Return the YYYY-MM month of a day ordinal (cached like parse_day)."""
+    return date.fromordinal(day).strftime('%Y-%m')
+
+def round_amount(amount: float) -> float:
+    """Round amount to 2 decimal places for consistent comparison."""
+    return round(amount, 2)
+
+def to_cents(amount: float) -> int:
+    """Convert a dollar amount to integer cents."""
+    return int(round(amount * 100))
+
+def parse_amount(value) -> float:
+    """Read the dollar amount of a charge to match; raises ValueError unless finite and within MAX_AMOUNT."""
+    amount = float(value)
+    if not math.isfinite(amount) or abs(amount) > MAX_AMOUNT:
+        raise ValueError(f"Amounts must be numbers of at most {MAX_AMOUNT:,}")
+    return amount
+
+def _join_strings(values: Iterable[str]) -> bytes:
+    """Encode strings as NUL-terminated UTF-8 (embedded NULs are dropped)."""
+    return ''.join(value.replace('\0', '') + '\0' for value in values).encode('utf-8')
+
+def _split_strings(data) -> List[str]:
+    """Inverse of _join_strings."""
+    return str(data, 'utf-8').split('\0')[:-1]
+
+def _array_from(typecode: str, data):
+    """Typed column over ``data``; memoryviews (e.g. of a snapshot) are cast in place, not copied."""
+    if isinstance(data, memoryview):
+        return data.cast(typecode)
+    column = array(typecode)
+    column.frombytes(data)
+    return column
+
+class _Slices(Sequence):
+    """Read-only sequence of the consecutive slices of ``data`` that end at ``ends``.
+
+    Lets columns restored from a snapshot be used in place instead of being
+    split into per-value objects up front.
+    """
+    __slots__ = ('data', 'ends')
+
+    def __init__(self, data, ends):
+        self.data = data
+        self.ends = ends
+
+    def __getitem__(self, i: int):
+        if i < 0:
+            i += len(self.ends)
+        return self.data[self.ends[i - 1] if i else 0:self.ends[i]]
+
+    def __len__(self) -> int:
+        return len(self.ends)
+
+class _StringTable(_Slices):
+    """_Slices over _join_strings output, yielding the strings."""
+    __slots__ = ()
+
+    def __getitem__(self, i: int) -> str:
+        return str(super().__getitem__(i), 'utf-8')[:-1]
+
+def _string_ends(values: Iterable[str]) -> bytes:
+    """End offsets of each value in _join_strings(values), for _StringTable."""
+    return array('q', accumulate(len(value.replace('\0', '').encode('utf-8')) + 1 for value in values)).tobytes()
+
+class PackedStrings:
+    """Append-only string column stored as zlib-compressed blocks.
+
+    Values are buffered until ``BLOCK_SIZE`` of them have arrived, then
+    joined with NULs and compressed into a single ``bytes`` object. Reads
+    decompress one block (the most recent block is cached), which is cheap
+    for the handful of rows a search returns and avoids keeping a separate
+    ``str`` object per value.
+    """
+    __slots__ = ('blocks', 'pending', '_cached')
+    BLOCK_SIZE = 128
+    # Fast level, raw deflate with a 4 KiB window: blocks are only a few KiB
+    LEVEL = 1
+    WBITS = -12
+
+    def __init__(self):
+        self.blocks = []
+        self.pending = []
+        self._cached = (-1, None)
+
+    def append(self, value: str):
+        self.extend((value,))
+
+    def extend(self, values: Iterable[str]):
+        pending = self.pending
+        pending.extend(values)
+        if len(pending) < self.BLOCK_SIZE:
+            return
+        full = len(pending) - len(pending) % self.BLOCK_SIZE
+        for start in range(0, full, self.BLOCK_SIZE):
+            joined = '\0'.join(pending[start:start + self.BLOCK_SIZE])
+            if joined.count('\0') != self.BLOCK_SIZE - 1:
+                joined = '\0'.join(value.replace('\0', '') for value in pending[start:start + self.BLOCK_SIZE])
+            self.blocks.append(zlib.compress(joined.encode('utf-8'), self.LEVEL, self.WBITS))
+        self.pending = pending[full:]
+
+    def __getitem__(self, i: int) -> str:
+        block, offset = divmod(i, self.BLOCK_SIZE)
+        if block == len(self.blocks):
+            return self.pending[offset]
+        cached_block, values = self._cached
+        if cached_block != block:
+            values = zlib.decompress(self.blocks[block], self.WBITS).decode('utf-8').split('\0')
+            self._cached = (block, values)
+        return values[offset]
+
+    def __len__(self) -> int:
+        return len(self.blocks) * self.BLOCK_SIZE + len(self.pending)
+
+    def to_parts(self, name: str) -> Dict[str, bytes]:
+        return {
+            f'{name}.blocks': b''.join(self.blocks),
+            f'{name}.ends': array('q', accumulate(map(len, self.blocks))).tobytes(),
+            f'{name}.pending': _join_strings(self.pending),
+        }
+
+    @classmethod
+    def from_parts(cls, parts: Mapping[str, bytes], name: str) -> 'PackedStrings':
+        packed = cls()
+        packed.blocks = _Slices(parts[f'{name}.blocks'], _array_from('q', parts[f'{name}.ends']))
+        packed.pending = _split_strings(parts[f'{name}.pending'])
+        return packed
+
+class PurchaseRow:
+    """Read-only view of one purchase in a PurchaseStore.
+
+    Supports ``row['key']`` access and ``{**row}`` unpacking, producing the
+    same keys the per-row purchase dicts used to have.
+    """
+    __slots__ = ('_store', '_i')
+    KEYS = ('id', 'order_id', 'date', 'amount', 'description', 'item_url', 'order_url', 'asin', 'quantity')
+
+    def __init__(self, store: 'PurchaseStore', i: int):
+        self._store = store
+        self._i = i
+
+    @property
+    def id(self) -> int:
+        return self._i + 1
+
+    @property
+    def order_id(self) -> str:
+        return self._store.order_ids[self._store.order_idx[self._i]]
+
+    @property
+    def date(self) -> str:
+        return self._store.date_strings[self._store.days[self._i]]
+
+    @property
+    def amount(self) -> float:
+        return self._store.cents[self._i] / 100
+
+    @property
+    def description(self) -> str:
+        return self._store.descriptions[self._i]
+
+    @property
+    def item_url(self) -> str:
+        return self._store.item_urls[self._i]
+
+    @property
+    def order_url(self) -> str:
+        url = self._store.row_order_urls.get(self._i)
+        return url if url is not None else self._store.order_urls[self._store.order_idx[self._i]]
+
+    @property
+    def asin(self) -> str:
+        return self._store.asins[self._i]
+
+    @property
+    def quantity(self) -> int:
+        return self._store.quantities[self._i]
+
+    def keys(self):
+        return self.KEYS
+
+    def __getitem__(self, key: str):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def to_dict(self) -> Dict:
+        return {key: getattr(self, key) for key in self.KEYS}
+
+class OrderRow:
+    """Read-only view of one order in a PurchaseStore (dict-style access)."""
+    __slots__ = ('_store', '_o')
+    KEYS = ('order_id', 'date', 'total', 'item_count', 'items', 'order_url')
+
+    def __init__(self, store: 'PurchaseStore', o: int):
+        self._store = store
+        self._o = o
+
+    @property
+    def order_id(self) -> str:
+        return self._store.order_ids[self._o]
+
+    @property
+    def date(self) -> str:
+        return self._store.date_strings[self._store.order_days[self._o]]
+
+    @property
+    def total(self) -> float:
+        return self._store.order_cents[self._o] / 100
+
+    @property
+    def item_count(self) -> int:
+        return self._store.order_offsets[self._o + 1] - self._store.order_offsets[self._o]
+
+    @property
+    def items(self) -> List[Dict]:
+        return [PurchaseRow(self._store, i).to_dict() for i in self._store.order_rows(self._o)]
+
+    @property
+    def order_url(self) -> str:
+        return self._store.order_urls[self._o]
+
+    def keys(self):
+        return self.KEYS
+
+    def __getitem__(self, key: str):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+class OrderTable(Mapping):
+    """``order_id -> OrderRow`` mapping over a PurchaseStore, in load order."""
+
+    def __init__(self, store: 'PurchaseStore'):
+        self._store = store
+
+    def __getitem__(self, order_id: str) -> OrderRow:
+        return OrderRow(self._store, self._store.order_lookup[order_id])
+
+    def __iter__(self):
+        return iter(self._store.order_ids)
+
+    def __len__(self) -> int:
+        return len(self._store.order_ids)
+
+class DatasetStats:
+    """Summary statistics of a PurchaseStore, kept up to date as rows arrive.
+
+    ``add_rows`` folds in each appended batch (date range, per-month item
+    counts and totals, price histogram), ``add_rejects`` the rows uploads
+    turned away, and ``count_orders`` the distribution of order sizes once
+    rows are grouped. ``summary`` is rebuilt then, so /api/stats and
+    /api/health serve it without scanning the dataset.
+    """
+
+    def __init__(self):
+        self.first_day = None
+        self.last_day = None
+        self.months = {}  # 'YYYY-MM' -> [items, cents]
+        self.prices = [0] * len(PRICE_HISTOGRAM_CENTS)
+        self.order_sizes = Counter()  # lines per order -> orders
+        self.rejected = Counter()  # reject reason -> rows
+        self.summary = self._summarize()
+
+    def add_rows(self, days: List[int], cents_column: List[int]):
+        if not days:
+            return
+        day_cents = defaultdict(int)
+        for day, cents in zip(days, cents_column):
+            day_cents[day] += cents
+        day_items = Counter(days)
+        first, last = min(day_items), max(day_items)
+        self.first_day = first if self.first_day is None else min(self.first_day, first)
+        self.last_day = last if self.last_day is None else max(self.last_day, last)
+        for day, cents in day_cents.items():
+            month = self.months.setdefault(month_of_day(day), [0, 0])
+            month[0] += day_items[day]
+            month[1] += cents
+        # Negative prices (refunds) count in the lowest bucket
+        for bucket, n in Counter(map(partial(bisect_right, PRICE_HISTOGRAM_CENTS), cents_column)).items():
+            self.prices[max(bucket - 1, 0)] += n
+
+    def add_rejects(self, counts: Mapping[str, int]):
+        self.rejected.update(counts)
+
+    def count_orders(self, order_offsets):
+        self.order_sizes = Counter(map(sub, order_offsets[1:], order_offsets[:-1]))
+        self.summary = self._summarize()
+
+    @classmethod
+    def of(cls, store: 'PurchaseStore') -> 'DatasetStats':
+        """Compute the statistics of a finalized store from its columns."""
+        stats = cls()
+        stats.add_rows(store.days, store.cents)
+        stats.count_orders(store.order_offsets)
+        return stats
+
+    def to_bytes(self) -> bytes:
+        return orjson.dumps({
+            "first_day": self.first_day, "last_day": self.last_day, "months": self.months,
+            "prices": self.prices, "order_sizes": list(self.order_sizes.items()), "rejected": dict(self.rejected),
+        })
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'DatasetStats':
+        state = orjson.loads(data)
+        stats = cls()
+        stats.first_day, stats.last_day = state["first_day"], state["last_day"]
+        stats.months = state["months"]
+        stats.prices = state["prices"]
+        stats.order_sizes = Counter(dict(state["order_sizes"]))
+        stats.rejected = Counter(state["rejected"])
+        stats.summary = stats._summarize()
+        return stats
+
+    def _summarize(self) -> Dict:
+        bounds = PRICE_HISTOGRAM_CENTS + (None,)
+        return {
+            "items": sum(self.prices),
+            "orders": sum(self.order_sizes.values()),
+            "date_range": {
+                "earliest": date.fromordinal(self.first_day).isoformat() if self.first_day is not None else None,
+                "latest": date.fromordinal(self.last_day).isoformat() if self.last_day is not None else None
+            },
+            "months": [{"month": month, "items": items, "total": round_amount(cents / 100)}
+                       for month, (items, cents) in sorted(self.months.items())],
+            "price_histogram": [{"min": low / 100, "max": high / 100 if high is not None else None, "items": n}
+                                for low, high, n in zip(bounds, bounds[1:], self.prices)],
+            "order_sizes": [{"items": size, "orders": n} for size, n in sorted(self.order_sizes.items())],
+            "rejected_rows": dict(sorted(self.rejected.items()))
+        }
+
+class PurchaseStore(Sequence):
+    """Columnar storage for a loaded order history.
+
+    Numeric fields live in parallel typed arrays indexed by row (purchase id
+    minus one) or by order index, long strings are packed into PackedStrings,
+    and order ids and date strings are stored once per order/day. Indexing
+    the store yields PurchaseRow views; ``store.orders`` is an OrderTable.
+    A finalized store round-trips through ``to_parts``/``from_parts``.
+    """
+    ARRAY_COLUMNS = ('days', 'cents', 'quantities', 'order_idx',
+                     'order_days', 'order_cents', 'order_offsets', 'order_members')
+    STRING_COLUMNS = ('descriptions', 'item_urls', 'asins', 'order_urls')
+
+    def __init__(self):
+        # Per-row columns
+        self.days = array('i')
+        self.cents = array('q')
+        self.quantities = array('i')
+        self.order_idx = array('I')
+        self.descriptions = PackedStrings()
+        self.item_urls = PackedStrings()
+        self.asins = PackedStrings()
+
+        # Per-order columns; order_rows(o) lists an order's rows once finalized
+        self.order_ids = []
+        self._order_lookup = {}
+        self.order_urls = PackedStrings()
+        self.order_days = array('i')
+        self.order_cents = array('q')
+        self.order_offsets = array('I', [0])
+        self.order_members = array('I')
+
+        # Rows whose order url differs from their order's (rare in real exports),
+        # and the order urls appended since the last finalize()
+        self.row_order_urls = {}
+        self._new_order_urls = {}
+        self.date_strings = {}
+        self.orders = OrderTable(self)
+        self.stats = DatasetStats()
+
+    def extend(self, order_ids: List[str], dates: List[str], days: List[int], cents_column: List[int],
+               descriptions: List[str], item_urls: List[str], order_urls: List[str],
+               asins: List[str], quantities: List[int]):
+        """Append a batch of rows given as parallel columns."""
+        for date_string, day in dict(zip(dates, days)).items():
+            self.date_strings.setdefault(day, date_string)
+
+        # Register new orders in first-appearance order
+        order_lookup = self.order_lookup
+        order_cents = self.order_cents
+        new_order_urls = self._new_order_urls
+        first_offsets = dict(zip(reversed(order_ids), range(len(order_ids) - 1, -1, -1)))
+        added_urls = []
+        for order_id in dict.fromkeys(order_ids):
+            if order_id not in order_lookup:
+                offset = first_offsets[order_id]
+                o = len(self.order_ids)
+                order_lookup[order_id] = o
+                self.order_ids.append(order_id)
+                added_urls.append(order_urls[offset])
+                new_order_urls[o] = order_urls[offset]
+                self.order_days.append(days[offset])
+                order_cents.append(0)
+
+        order_idx = list(map(order_lookup.__getitem__, order_ids))
+        for o, cents in zip(order_idx, cents_column):
+            order_cents[o] += cents
+
+        # Remember rows whose order url differs from their order's first row
+        first_urls = {
+            o: new_order_urls[o] if o in new_order_urls else self.order_urls[o]
+            for o in dict.fromkeys(order_idx)
+        }
+        first_row = len(self.days)
+        for offset in compress(count(), map(ne, order_urls, map(first_urls.__getitem__, order_idx))):
+            self.row_order_urls[first_row + offset] = order_urls[offset]
+
+        self.order_urls.extend(added_urls)
+        self.days.extend(days)
+        self.order_idx.extend(order_idx)
+        self.cents.extend(cents_column)
+        self.quantities.extend(quantities)
+        self.descriptions.extend(descriptions)
+        self.item_urls.extend(item_urls)
+        self.asins.extend(asins)
+        self.stats.add_rows(days, cents_column)
+
+    @property
+    def order_lookup(self) -> Dict[str, int]:
+        """``order_id -> order index``, built on first use for restored stores."""
+        if self._order_lookup is None:
+            self._order_lookup = dict(zip(self.order_ids, range(len(self.order_ids))))
+        return self._order_lookup
+
+    def finalize(self):
+        """Group rows by order into order_members, delimited by order_offsets."""
+        self._new_order_urls = {}
+        counts = Counter(self.order_idx)
+        self.order_offsets = array('I', [0])
+        self.order_offsets.extend(accumulate(counts[o] for o in range(len(self.order_ids))))
+        # Stable sort, so each order's rows stay in load order
+        self.order_members = array('I', sorted(range(len(self.days)), key=self.order_idx.__getitem__))
+        self.stats.count_orders(self.order_offsets)
+
+    def finalize_appended(self, first_row: int):
+        """finalize() for a store whose rows before ``first_row`` were already grouped.
+
+        The new rows go to the end of their order's members (new orders
+        after every existing one); unchanged runs of order_members and
+        order_offsets are copied in C, so the Python work is proportional
+        to the appended rows.
+        """
+        self._new_order_urls = {}
+        order_idx = self.order_idx
+        old_offsets = self.order_offsets
+        old_orders = len(old_offsets) - 1
+        new_rows = sorted(range(first_row, len(self.days)), key=order_idx.__getitem__)
+        counts = Counter(order_idx[i] for i in new_rows)
+
+        members, = _splice((self.order_members,), [], [
+            (old_offsets[order_idx[i] + 1], (i,)) for i in new_rows if order_idx[i] < old_orders
+        ])
+        members.extend(i for i in new_rows if order_idx[i] >= old_orders)
+
+        # Each existing order's end moves by the rows added to it and to every order before it
+        offsets = array('I')
+        shift = start = 0
+        for o in sorted(o for o in counts if o < old_orders):
+            offsets.extend(map(shift.__add__, old_offsets[start:o + 1]))
+            shift += counts[o]
+            start = o + 1
+        offsets.extend(map(shift.__add__, old_offsets[start:]))
+        offsets.extend(islice(accumulate((counts[o] for o in range(old_orders, len(self.order_ids))),
+                                         initial=offsets[-1]), 1, None))
+        self.order_members = members
+        self.order_offsets = offsets
+        self.stats.count_orders(offsets)
+
+    def thaw(self):
+        """Copy columns restored by ``from_parts`` (read-only views of a snapshot or
+        SQLite blob) into growable ones, so more rows can be appended."""
+        for name in self.ARRAY_COLUMNS:
+            column = getattr(self, name)
+            if not isinstance(column, array):
+                setattr(self, name, _array_from(column.format, bytes(column)))
+        for name in self.STRING_COLUMNS:
+            packed = getattr(self, name)
+            if not isinstance(packed.blocks, list):
+                packed.blocks = list(map(bytes, packed.blocks))
+        if not isinstance(self.order_ids, list):
+            self.order_ids = list(self.order_ids)
+
+    def order_lines(self, o: int) -> Counter:
+        """Count order ``o``'s lines by (ASIN, cents, quantity), the key uploads are deduplicated on."""
+        return Counter((self.asins[i], self.cents[i], self.quantities[i]) for i in self.order_rows(o))
+
+    def to_parts(self) -> Dict[str, bytes]:
+        """Serialize a finalized store into named byte strings."""
+        parts = {name: getattr(self, name).tobytes() for name in self.ARRAY_COLUMNS}
+        for name in self.STRING_COLUMNS:
+            parts.update(getattr(self, name).to_parts(name))
+        parts['order_ids'] = _join_strings(self.order_ids)
+        parts['order_id_ends'] = _string_ends(self.order_ids)
+        parts['date_days'] = array('i', self.date_strings).tobytes()
+        parts['date_strings'] = _join_strings(self.date_strings.values())
+        parts['row_order_url_rows'] = array('I', self.row_order_urls).tobytes()
+        parts['row_order_url_values'] = _join_strings(self.row_order_urls.values())
+        parts['stats'] = self.stats.to_bytes()
+        return parts
+
+    @classmethod
+    def from_parts(cls, parts: Mapping[str, bytes]) -> 'PurchaseStore':
+        """Rebuild a store written by ``to_parts`` without re-parsing any CSV."""
+        store = cls()
+        for name in cls.ARRAY_COLUMNS:
+            setattr(store, name, _array_from(getattr(store, name).typecode, parts[name]))
+        for name in cls.STRING_COLUMNS:
+            setattr(store, name, PackedStrings.from_parts(parts, name))
+        store.order_ids = _StringTable(parts['order_ids'], _array_from('q', parts['order_id_ends']))
+        store._order_lookup = None
+        store.date_strings = dict(zip(_array_from('i', parts['date_days']), _split_strings(parts['date_strings'])))
+        store.row_order_urls = dict(zip(_array_from('I', parts['row_order_url_rows']),
+                                        _split_strings(parts['row_order_url_values'])))
+        # Datasets saved before statistics were kept get them recomputed
+        store.stats = DatasetStats.from_bytes(parts['stats']) if 'stats' in parts else DatasetStats.of(store)
+        return store
+
+    def order_rows(self, o: int):
+        return self.order_members[self.order_offsets[o]:self.order_offsets[o + 1]]
+
+    def __getitem__(self, i: int) -> PurchaseRow:
+        if isinstance(i, slice):
+            return [PurchaseRow(self, j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return PurchaseRow(self, i)
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+def _gather(typecode: str, column, positions) -> array:
+    """Return ``column[p] for p in positions`` as a new typed array."""
+    if len(positions) < 2:
+        return array(typecode, [column[p] for p in positions])
+    return array(typecode, itemgetter(*positions)(column))
+
+def _splice(columns: tuple, removed: List[int], inserted: List[tuple]) -> List[array]:
+    """Copy the parallel sorted ``columns`` with some entries moved in or out.
+
+    Entries at the positions in ``removed`` are dropped, and each
+    ``(position, values)`` of ``inserted`` (given in sort order) adds one
+    value per column just before the entry at ``position`` of the input.
+    The runs between edits are copied in C, so the Python work is
+    proportional to the number of edits, not to the length of the columns.
+    """
+    edits = sorted([(position, 0, values) for position, values in inserted] +
+                   [(position, 1, None) for position in removed], key=itemgetter(0, 1))
+    views = [memoryview(column) for column in columns]
+    spliced = [array(view.format) for view in views]
+    start = 0
+    for position, is_removal, values in edits:
+        for result, view in zip(spliced, views):
+            result.frombytes(view[start:position].cast('B'))
+        if is_removal:
+            start = position + 1
+        else:
+            for result, value in zip(spliced, values):
+                result.append(value)
+            start = position
+    for result, view in zip(spliced, views):
+        result.frombytes(view[start:].cast('B'))
+        view.release()
+    return spliced
+
+_WORD = re.compile(r'\w+')
+
+def _tokens(text: str) -> List[str]:
+    """Split ``text`` into the lower-cased words keyword search indexes and looks up."""
+    return _WORD.findall(text.lower())
+
+def _row_tokens(store: PurchaseStore, rows: range) -> List[tuple]:
+    """Return the distinct tokens of each row's description and ASIN."""
+    descriptions, asins = store.descriptions, store.asins
+    # Exports repeat descriptions heavily, so each distinct one is split once
+    split = {}
+    row_tokens = []
+    for i in rows:
+        description = descriptions[i]
+        words = split.get(description)
+        if words is None:
+            words = split[description] = tuple(dict.fromkeys(_tokens(description)))
+        asin = asins[i].lower()
+        row_tokens.append(words + (asin,) if asin and asin not in words else words)
+    return row_tokens
+
+def _order_subsets(store: PurchaseStore, o: int) -> tuple:
+    """Return (totals, masks) of every non-empty subset of order ``o``'s priced lines.
+
+    Bit k of a mask stands for the k-th priced row of ``store.order_rows(o)``.
+    Subsets come sorted by (total, mask); orders with more than
+    SHIPMENT_MAX_LINES priced lines get none.
+    """
+    priced = [c for c in map(store.cents.__getitem__, store.order_rows(o)) if c > 0]
+    if len(priced) < 2:
+        return priced, [1] * len(priced)
+    if len(priced) > SHIPMENT_MAX_LINES:
+        return [], []
+    # Doubling the list for each line leaves the subset with mask m at totals[m]
+    totals = [0]
+    for c in priced:
+        totals += [total + c for total in totals]
+    masks = sorted(range(1, len(totals)), key=totals.__getitem__)
+    return list(map(totals.__getitem__, masks)), masks
+
+@lru_cache(maxsize=None)
+def _shipment_flags(lines: int) -> bytes:
+    """Flags, by mask, for the subsets of a ``lines``-line order that are partial shipments:
+    two or more lines, but not all of them."""
+    whole = (1 << lines) - 1
+    return bytes(mask & (mask - 1) != 0 and mask != whole for mask in range(whole + 1))
+
+def _partial_shipments(totals, masks) -> tuple:
+    """Return the (totals, masks) among one order's subsets that are partial shipments."""
+    # Orders of fewer than three lines have none
+    if len(masks) < 7:
+        return [], []
+    # An order's subsets are every mask from 1 to the whole order's
+    selected = list(map(_shipment_flags(len(masks).bit_length()).__getitem__, masks))
+    return list(compress(totals, selected)), list(compress(masks, selected))
+
+class PurchaseIndex:
+    """Sorted lookup arrays over a PurchaseStore.
+
+    Built once per load so searches never re-parse dates or scan the whole
+    dataset. Each view is a permutation of row (or order) indices plus its
+    sort keys, so a date window or an exact amount is found by bisection:
+
+    * ``by_day`` - rows sorted by (day, id), keyed by ``day_keys``
+    * ``by_amount`` - rows sorted by (cents, day, id), keyed by
+      ``amount_keys``/``amount_days``
+    * ``orders_by_amount`` - the same for orders and their totals
+    * ``orders_by_day`` - orders sorted by (day, index), keyed by
+      ``order_day_keys``
+
+    ``postings`` holds, for each word of the descriptions and ASINs (see
+    _tokens), the rows containing it sorted by (day, id) and keyed by their
+    days; the ``t``-th of the sorted tokens owns ``offsets[t:t + 2]`` of
+    those packed arrays. It is built on the first keyword search, so loads
+    and workers that never run one don't pay for it.
+
+    The totals of every subset of an order's priced lines (see
+    _order_subsets), which shipment and same-order combination searches
+    read, are worked out per order the first time a search looks at it and
+    kept for the index's lifetime, so a load doesn't pay for orders no
+    search ever reaches.
+    """
+    ARRAYS = {
+        'by_day': 'I', 'day_keys': 'i',
+        'by_amount': 'I', 'amount_keys': 'q', 'amount_days': 'i',
+        'orders_by_amount': 'I', 'order_amount_keys': 'q', 'order_amount_days': 'i',
+        'orders_by_day': 'I', 'order_day_keys': 'i',
+    }
+
+    def __init__(self, store: PurchaseStore):
+        self.store = store
+        days, cents = store.days, store.cents
+
+        # Python's sort is stable, so rows on the same day stay in load order
+        self.by_day = array('I', sorted(range(len(store)), key=days.__getitem__))
+        self.day_keys = _gather('i', days, self.by_day)
+
+        self.by_amount = array('I', sorted(self.by_day, key=cents.__getitem__))
+        self.amount_keys = _gather('q', cents, self.by_amount)
+        self.amount_days = _gather('i', days, self.by_amount)
+
+        order_days, order_cents = store.order_days, store.order_cents
+        by_order_day = sorted(range(len(store.order_ids)), key=order_days.__getitem__)
+        self.orders_by_amount = array('I', sorted(by_order_day, key=order_cents.__getitem__))
+        self.order_amount_keys = _gather('q', order_cents, self.orders_by_amount)
+        self.order_amount_days = _gather('i', order_days, self.orders_by_amount)
+        self.orders_by_day = array('I', by_order_day)
+        self.order_day_keys = _gather('i', order_days, self.orders_by_day)
+        # order -> (totals, masks) of its subsets, and of its partial shipments
+        self._subsets = {}
+        self._shipments = {}
+
+    @cached_property
+    def postings(self) -> tuple:
+        """(tokens, offsets, rows, days) of the keyword postings, built on first use."""
+        # Walking the rows by day leaves every token's rows in (day, id) order
+        row_tokens = _row_tokens(self.store, range(len(self.store)))
+        postings = defaultdict(list)
+        for i in self.by_day:
+            for token in row_tokens[i]:
+                postings[token].append(i)
+        tokens = sorted(postings)
+        offsets = array('I', accumulate((len(postings[token]) for token in tokens), initial=0))
+        rows = array('I')
+        for token in tokens:
+            rows.extend(postings.pop(token))
+        return tokens, offsets, rows, _gather('i', self.store.days, rows)
+
+    def to_parts(self) -> Dict[str, bytes]:
+        return {f'index.{name}': getattr(self, name).tobytes() for name in self.ARRAYS}
+
+    def patched(self, first_row: int, first_order: int, old_order_cents: Dict[int, int]) -> 'PurchaseIndex':
+        """Return the index of the store after an append, without re-sorting it.
+
+        Rows from ``first_row`` and orders from ``first_order`` on are new;
+        ``old_order_cents`` holds the previous totals of the existing orders
+        that gained rows, whose entries move to their new amount. The result
+        is identical to ``PurchaseIndex(store)``.
+        """
+        store = self.store
+        days, cents = store.days, store.cents
+        index = PurchaseIndex.__new__(PurchaseIndex)
+        index.store = store
+
+        # New rows sort after every existing row with the same keys
+        new_rows = sorted(range(first_row, len(store)), key=days.__getitem__)
+        index.by_day, index.day_keys = _splice((self.by_day, self.day_keys), [], [
+            (bisect_right(self.day_keys, days[i]), (i, days[i])) for i in new_rows
+        ])
+
+        inserted = []
+        for i in sorted(new_rows, key=cents.__getitem__):
+            lo = bisect_left(self.amount_keys, cents[i])
+            hi = bisect_right(self.amount_keys, cents[i], lo)
+            inserted.append((bisect_right(self.amount_days, days[i], lo, hi), (i, cents[i], days[i])))
+        index.by_amount, index.amount_keys, index.amount_days = _splice(
+            (self.by_amount, self.amount_keys, self.amount_days), [], inserted)
+
+        # Orders are sorted by (total, day, order index)
+        order_days, order_cents = store.order_days, store.order_cents
+        keys, key_days, perm = self.order_amount_keys, self.order_amount_days, self.orders_by_amount
+
+        def position(o, total):
+            lo = bisect_left(keys, total)
+            hi = bisect_right(keys, total, lo)
+            lo = bisect_left(key_days, order_days[o], lo, hi)
+            hi = bisect_right(key_days, order_days[o], lo, hi)
+            return bisect_left(perm, o, lo, hi)
+
+        moved = sorted([*old_order_cents, *range(first_order, len(store.order_ids))],
+                       key=lambda o: (order_cents[o], order_days[o], o))
+        index.orders_by_amount, index.order_amount_keys, index.order_amount_days = _splice(
+            (perm, keys, key_days),
+            [position(o, total) for o, total in old_order_cents.items()],
+            [(position(o, order_cents[o]), (o, order_cents[o], order_days[o])) for o in moved])
+
+        # New orders sort after every existing order of the same day
+        index.orders_by_day, index.order_day_keys = _splice((self.orders_by_day, self.order_day_keys), [], [
+            (bisect_right(self.order_day_keys, order_days[o]), (o, order_days[o]))
+            for o in sorted(range(first_order, len(store.order_ids)), key=order_days.__getitem__)
+        ])
+        # Orders that gained rows have their subsets worked out again on next use
+        index._subsets = {o: subsets for o, subsets in self._subsets.items() if o not in old_order_cents}
+        index._shipments = {o: shipments for o, shipments in self._shipments.items() if o not in old_order_cents}
+
+        # Postings not built yet are left to the first keyword search
+        if 'postings' not in self.__dict__:
+            return index
+        # New rows go after a token's existing rows of the same day, and new
+        # tokens just before the first existing token that sorts after them
+        tokens, token_offsets, token_rows, token_days = self.postings
+        row_tokens = _row_tokens(store, range(first_row, len(store)))
+        inserted = []
+        added = set()
+        for i in new_rows:
+            for token in row_tokens[i - first_row]:
+                t = bisect_left(tokens, token)
+                if t < len(tokens) and tokens[t] == token:
+                    position = bisect_right(token_days, days[i], token_offsets[t], token_offsets[t + 1])
+                else:
+                    position = token_offsets[t]
+                    added.add(token)
+                inserted.append((position, token, days[i], i))
+        inserted.sort()
+        rows, row_days = _splice((token_rows, token_days), [],
+                                 [(position, (i, day)) for position, _, day, i in inserted])
+        gained = Counter(token for _, token, _, _ in inserted)
+        sizes = iter(map(sub, token_offsets[1:], token_offsets[:-1]))
+        tokens = sorted([*tokens, *added])
+        offsets = array('I', accumulate(
+            ((0 if token in added else next(sizes)) + gained[token] for token in tokens), initial=0))
+        index.postings = tokens, offsets, rows, row_days
+        return index
+
+    @classmethod
+    def from_parts(cls, store: PurchaseStore, parts: Mapping[str, bytes]) -> 'PurchaseIndex':
+        """Restore an index saved with ``to_parts`` instead of re-sorting the store."""
+        index = cls.__new__(cls)
+        index.store = store
+        for name, typecode in cls.ARRAYS.items():
+            setattr(index, name, _array_from(typecode, parts[f'index.{name}']))
+        index._subsets = {}
+        index._shipments = {}
+        return index
+
+    def window(self, start_day: int, end_day: int):
+        """Return row indices dated within [start_day, end_day], in (day, id) order."""
+        lo = bisect_left(self.day_keys, start_day)
+        hi = bisect_right(self.day_keys, end_day)
+        return self.by_day[lo:hi]
+
+    @staticmethod
+    def _amount_window(perm, keys, days, cents: int, start_day: int, end_day: int):
+        lo = bisect_left(keys, cents)
+        hi = bisect_right(keys, cents, lo)
+        lo = bisect_left(days, start_day, lo, hi)
+        hi = bisect_right(days, end_day, lo, hi)
+        return perm[lo:hi]
+
+    def items_with_cents(self, cents: int, start_day: int, end_day: int):
+        """Return row indices priced at exactly ``cents`` within the window."""
+        return self._amount_window(self.by_amount, self.amount_keys, self.amount_days, cents, start_day, end_day)
+
+    def items_in_range(self, low_cents: int, high_cents: int, start_day: int, end_day: int):
+        """Return row indices priced within [low_cents, high_cents] and dated within the window.
+
+        Scans whichever is smaller: the amount range of ``by_amount`` or the
+        date window of ``by_day``.
+        """
+        lo = bisect_left(self.amount_keys, low_cents)
+        hi = bisect_right(self.amount_keys, high_cents, lo)
+        day_lo = bisect_left(self.day_keys, start_day)
+        day_hi = bisect_right(self.day_keys, end_day, day_lo)
+        if hi - lo <= day_hi - day_lo:
+            days = self.amount_days
+            return [self.by_amount[k] for k in range(lo, hi) if start_day <= days[k] <= end_day]
+        cents = self.store.cents
+        return [i for i in self.by_day[day_lo:day_hi] if low_cents <= cents[i] <= high_cents]
+
+    def orders_in_range(self, low_cents: int, high_cents: int, start_day: int, end_day: int):
+        """Return order indices totalling within [low_cents, high_cents] within the window."""
+        lo = bisect_left(self.order_amount_keys, low_cents)
+        hi = bisect_right(self.order_amount_keys, high_cents, lo)
+        days = self.order_amount_days
+        return [self.orders_by_amount[k] for k in range(lo, hi) if start_day <= days[k] <= end_day]
+
+    def orders_with_cents(self, cents: int, start_day: int, end_day: int):
+        """Return order indices totalling exactly ``cents`` within the window."""
+        return self._amount_window(self.orders_by_amount, self.order_amount_keys, self.order_amount_days,
+                                   cents, start_day, end_day)
+
+    def _order_subsets(self, o: int) -> tuple:
+        """(totals, masks) of every subset of order ``o``'s priced lines, worked out on first use."""
+        subsets = self._subsets.get(o)
+        if subsets is None:
+            subsets = self._subsets[o] = _order_subsets(self.store, o)
+        return subsets
+
+    def _order_shipments(self, o: int) -> tuple:
+        """(totals, masks) of order ``o``'s partial shipments, worked out on first use."""
+        shipments = self._shipments.get(o)
+        if shipments is None:
+            offsets = self.store.order_offsets
+            # Orders of fewer than three lines have none
+            shipments = ([], []) if offsets[o + 1] - offsets[o] < 3 else _partial_shipments(*self._order_subsets(o))
+            self._shipments[o] = shipments
+        return shipments
+
+    def order_subsets(self, o: int, low_cents: int, high_cents: int):
+        """Return the (total, mask) subsets of order ``o`` totalling within [low_cents, high_cents],
+        or None if the order has too many lines to have them worked out."""
+        totals, masks = self._order_subsets(o)
+        if not masks:
+            return None
+        lo = bisect_left(totals, low_cents)
+        hi = bisect_right(totals, high_cents, lo)
+        return list(zip(totals[lo:hi], masks[lo:hi]))
+
+    def subset_rows(self, o: int, mask: int) -> tuple:
+        """Return the rows of order ``o`` that ``mask`` selects, in load order."""
+        cents = self.store.cents
+        priced = [i for i in self.store.order_rows(o) if cents[i] > 0]
+        return tuple(compress(priced, (mask >> k & 1 for k in range(len(priced)))))
+
+    def shipments_in_range(self, low_cents: int, high_cents: int, start_day: int, end_day: int):
+        """Return (order, mask) of the partial shipments totalling within [low_cents, high_cents]
+        of the orders dated within the window."""
+        lo = bisect_left(self.order_day_keys, start_day)
+        hi = bisect_right(self.order_day_keys, end_day, lo)
+        found = []
+        for o in self.orders_by_day[lo:hi]:
+            totals, masks = self._order_shipments(o)
+            if masks:
+                first = bisect_left(totals, low_cents)
+                found += zip(repeat(o), masks[first:bisect_right(totals, high_cents, first)])
+        return found
+
+    def keyword_rows(self, terms: Iterable[str], start_day: int, end_day: int) -> Dict[int, int]:
+        """Return ``{row: relevance}`` for the rows within the window that match every term.
+
+        A term matches the words it is a prefix of. Relevance adds 2 for each
+        term that is a whole word of the row and 1 for each that only
+        prefixes one.
+        """
+        tokens, offsets, rows, days = self.postings
+        matched = None
+        for term in set(terms):
+            first = bisect_left(tokens, term)
+            last = bisect_left(tokens, term[:-1] + chr(ord(term[-1]) + 1), first)
+            span = range(first, last)
+            scores = {}
+            # The whole word sorts first; its rows are counted last so they keep their 2
+            for t in [*span[1:], *span[:1]]:
+                lo = bisect_left(days, start_day, offsets[t], offsets[t + 1])
+                hi = bisect_right(days, end_day, lo, offsets[t + 1])
+                scores.update(dict.fromkeys(rows[lo:hi], 2 if tokens[t] == term else 1))
+            if matched is None:
+                matched = scores
+            else:
+                fewer, more = sorted((matched, scores), key=len)
+                matched = {i: score + more[i] for i, score in fewer.items() if i in more}
+            if not matched:
+                return {}
+        return matched or {}
+
+class ResultCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds.
+
+    Keys should include DATASET_VERSION so results computed against an
+    earlier upload can never be returned.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Return the cached value for ``key``, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+SEARCH_CACHE = ResultCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+
+class Profile:
+    """Phase timings and work counters for one upload or search.
+
+    Phases and counters are named ``<search_type>.<name>`` (``item``,
+    ``order``, ``combination``) or ``upload.<name>``; a disabled profile
+    records nothing, so instrumented code can always call it.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.phases = defaultdict(float)
+        self.counters = Counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] += time.perf_counter() - started
+
+    def add(self, name: str, seconds: float):
+        if self.enabled:
+            self.phases[name] += seconds
+
+    def count(self, name: str, n: int = 1):
+        if self.enabled:
+            self.counters[name] += n
+
+    def to_dict(self) -> Dict:
+        return {
+            "phases_ms": {name: round(seconds * 1000, 3) for name, seconds in self.phases.items()},
+            "counters": dict(self.counters)
+        }
+
+NO_PROFILE = Profile(enabled=False)
+
+class Metrics:
+    """Process-wide totals of recorded profiles, rendered in the Prometheus text format.
+
+    Each worker process keeps its own totals. Searches are observed in a
+    latency histogram per search type (the sum of that type's phases) and
+    uploads in their own histogram.
+    """
+
+    COUNTER_HELP = {
+        'upload_rows_parsed_total': 'CSV rows read by uploads.',
+        'upload_rows_skipped_total': 'CSV rows that were not purchases (blank, subtotal or invalid).',
+        'upload_items_loaded_total': 'Purchases loaded by uploads.',
+        'search_candidates_total': 'Purchases considered as combination members.',
+        'search_enumerated_total': 'Combinations enumerated and scored.',
+        'search_expanded_total': 'Branch-and-bound subtrees expanded by combination searches.',
+        'search_matches_total': 'Matches returned, by search_type.',
+    }
+
+    def __init__(self, buckets: tuple = METRICS_LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.phase_seconds = Counter()
+        self.counters = Counter()
+        self.requests = Counter()
+        # (metric, search_type) -> [count per bucket..., +Inf count, sum]
+        self.histograms = {}
+
+    def _observe(self, key: tuple, seconds: float):
+        histogram = self.histograms.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+        histogram[bisect_left(self.buckets, seconds)] += 1
+        histogram[-1] += seconds
+
+    def record(self, profile: Profile, request_type: str = None):
+        """Add a finished profile; ``request_type`` counts it as one search request of that type."""
+        if not profile.enabled:
+            return
+        durations = defaultdict(float)
+        for name, seconds in profile.phases.items():
+            durations[name.partition('.')[0]] += seconds
+        with self._lock:
+            self.phase_seconds.update(profile.phases)
+            self.counters.update(profile.counters)
+            if request_type is not None:
+                self.requests[request_type] += 1
+            for kind, seconds in durations.items():
+                if kind == 'upload':
+                    self._observe(('upload_duration_seconds', None), seconds)
+                elif kind in ('item', 'order', 'combination', 'shipment'):
+                    self._observe(('search_duration_seconds', kind), seconds)
+
+    def render(self) -> str:
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP purchase_{name} {help_text}")
+            lines.append(f"# TYPE purchase_{name} {kind}")
+
+        def sample(name, value, **labels):
+            label_text = ','.join(f'{key}="{value}"' for key, value in labels.items() if value is not None)
+            lines.append(f"purchase_{name}{{{label_text}}} {value}" if label_text else f"purchase_{name} {value}")
+
+        with self._lock:
+            family('search_requests_total', 'counter', 'Search requests by requested search_type.')
+            for search_type, n in sorted(self.requests.items()):
+                sample('search_requests_total', n, search_type=search_type)
+
+            for metric, help_text in (('search_duration_seconds', 'Search latency by search_type.'),
+                                      ('upload_duration_seconds', 'Upload processing time.')):
+                family(metric, 'histogram', help_text)
+                for (name, search_type), histogram in sorted(self.histograms.items(), key=lambda h: str(h[0])):
+                    if name != metric:
+                        continue
+                    for bound, n in zip((*self.buckets, '+Inf'), accumulate(histogram[:-1])):
+                        sample(f'{metric}_bucket', n, search_type=search_type, le=bound)
+                    sample(f'{metric}_sum', round(histogram[-1], 6), search_type=search_type)
+                    sample(f'{metric}_count', sum(histogram[:-1]), search_type=search_type)
+
+            family('phase_seconds_total', 'counter', 'Time spent per upload or search phase.')
+            for phase, seconds in sorted(self.phase_seconds.items()):
+                sample('phase_seconds_total', round(seconds, 6), phase=phase)
+
+            # Counters named upload.<name> or <search_type>.<name>
+            counters = defaultdict(list)
+            for name, n in sorted(self.counters.items()):
+                kind, _, counter = name.partition('.')
+                if kind == 'upload':
+                    counters[f'upload_{counter}_total'].append((None, n))
+                else:
+                    counters[f'search_{counter}_total'].append((kind, n))
+            for metric, values in sorted(counters.items()):
+                family(metric, 'counter', self.COUNTER_HELP.get(metric, metric))
+                for search_type, n in values:
+                    sample(metric, n, search_type=search_type)
+
+        cache = SEARCH_CACHE.stats()
+        for name in ('hits', 'misses', 'evictions'):
+            family(f'search_cache_{name}_total', 'counter', f'Search result cache {name}.')
+            sample(f'search_cache_{name}_total', cache[name])
+        family('dataset_items', 'gauge', 'Purchases in the loaded dataset.')
+        sample('dataset_items', len(PURCHASES))
+        family('dataset_orders', 'gauge', 'Orders in the loaded dataset.')
+        sample('dataset_orders', len(ORDERS))
+        return '\n'.join(lines) + '\n'
+
+METRICS = Metrics()
+
+class SQLiteDatasetBackend:
+    """Dataset shared by every process on the box through one SQLite file.
+
+    A load publishes the store's parts and bumps a version number in a
+    single transaction; other workers compare that number before each
+    request (one indexed read) and fetch the parts when it has moved on,
+    so an upload is visible everywhere without any worker re-parsing it,
+    and survives worker restarts.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.created_at = None
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection may only be used by the thread that opened it, and
+        # must not be shared across fork() (e.g. gunicorn --preload)
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            # Only this user may read the uploaded orders
+            os.close(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600))
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # Replaced or deleted data is overwritten, not just unlinked
+            connection.execute("PRAGMA secure_delete=ON")
+            with connection:
+                connection.execute("CREATE TABLE IF NOT EXISTS dataset_parts (name TEXT PRIMARY KEY, data BLOB NOT NULL)")
+                connection.execute("CREATE TABLE IF NOT EXISTS dataset_meta (id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER NOT NULL, published_at REAL)")
+                if 'published_at' not in {column[1] for column in connection.execute("PRAGMA table_info(dataset_meta)")}:
+                    connection.execute("ALTER TABLE dataset_meta ADD COLUMN published_at REAL")
+                connection.execute("INSERT OR IGNORE INTO dataset_meta (id, version) VALUES (0, 0)")
+                connection.execute("CREATE TABLE IF NOT EXISTS upload_jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, updated_at REAL NOT NULL)")
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    def version(self) -> int:
+        return self._connect().execute("SELECT version FROM dataset_meta").fetchone()[0]
+
+    def publish(self, parts: Dict[str, bytes]) -> int:
+        """Replace the shared dataset and return its new version."""
+        connection = self._connect()
+        self.created_at = time.time()
+        with connection:
+            connection.execute("DELETE FROM dataset_parts")
+            connection.executemany("INSERT INTO dataset_parts VALUES (?, ?)", parts.items())
+            connection.execute("UPDATE dataset_meta SET version = version + 1, published_at = ?", (self.created_at,))
+            return connection.execute("SELECT version FROM dataset_meta").fetchone()[0]
+
+    def clear(self) -> int:
+        """Delete the shared dataset (and upload job reports) and return the new (empty) version."""
+        with self._connect() as connection:
+            connection.execute("DELETE FROM upload_jobs")
+        version = self.publish({})
+        # Drop the deleted pages' old contents from the write-ahead log too
+        self._connect().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return version
+
+    def fetch(self):
+        """Return (version, parts) read from one consistent snapshot."""
+        connection = self._connect()
+        connection.execute("BEGIN")
+        try:
+            version, self.created_at = connection.execute("SELECT version, published_at FROM dataset_meta").fetchone()
+            parts = dict(connection.execute("SELECT name, data FROM dataset_parts"))
+        finally:
+            connection.execute("COMMIT")
+        return version, parts
+
+    def save_job(self, job_id: str, job: Dict):
+        """Store an upload job's status for /api/upload/<job_id> in any worker."""
+        with self._connect() as connection:
+            connection.execute("INSERT OR REPLACE INTO upload_jobs VALUES (?, ?, ?)",
+                               (job_id, json.dumps(job), time.time()))
+            connection.execute("DELETE FROM upload_jobs WHERE id NOT IN "
+                               "(SELECT id FROM upload_jobs ORDER BY updated_at DESC LIMIT ?)", (MAX_UPLOAD_JOBS,))
+
+    def load_job(self, job_id: str):
+        """Return the status save_job stored for ``job_id``, or None."""
+        row = self._connect().execute("SELECT status FROM upload_jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+# magic, schema version, TOC length, dataset version, created at (unix time),
+# CRC-32 of everything after the header, total file size
+_SNAPSHOT_HEADER = struct.Struct('<8sIIqdIQ')
+# Array item sizes and byte order the parts were written with
+_SNAPSHOT_ABI = f"{sys.byteorder} i{array('i').itemsize} I{array('I').itemsize} q{array('q').itemsize}".encode()
+
+def _align(offset: int) -> int:
+    return -(-offset // 8) * 8
+
+def write_snapshot(path: str, parts: Dict[str, bytes], version: int) -> int:
+    """Atomically write ``parts`` as a snapshot file and return its size.
+
+    Layout: fixed header, JSON table of contents (name, offset, length),
+    then each part 8-byte aligned so typed columns can be cast in place
+    once mapped. The file is written beside ``path`` and renamed over it,
+    so processes still mapping the previous snapshot are unaffected. Only
+    the user the server runs as may read it.
+    """
+    parts = {'snapshot.abi': _SNAPSHOT_ABI, **parts}
+    toc, offset = [], 0
+    for name, data in parts.items():
+        offset = _align(offset)
+        toc.append((name, offset, len(data)))
+        offset += len(data)
+    toc_bytes = json.dumps(toc).encode('utf-8')
+    data_start = _align(_SNAPSHOT_HEADER.size + len(toc_bytes))
+    size = data_start + offset
+
+    body = [toc_bytes, bytes(data_start - _SNAPSHOT_HEADER.size - len(toc_bytes))]
+    position = 0
+    for (name, start, length), data in zip(toc, parts.values()):
+        body.append(bytes(start - position))
+        body.append(data)
+        position = start + length
+    crc = 0
+    for chunk in body:
+        crc = zlib.crc32(chunk, crc)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    # A file left behind by a crash keeps the mode it was created with
+    os.fchmod(fd, 0o600)
+    with open(fd, 'wb') as f:
+        f.write(_SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_SCHEMA_VERSION, len(toc_bytes),
+                                      version, time.time(), crc, size))
+        f.writelines(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return size
+
+def read_snapshot_header(path: str):
+    """Return (dataset version, created at) from a snapshot header, validating magic and schema."""
+    with open(path, 'rb') as f:
+        header = f.read(_SNAPSHOT_HEADER.size)
+    return _unpack_snapshot_header(header)[3:5]
+
+def _unpack_snapshot_header(header) -> tuple:
+    if len(header) < _SNAPSHOT_HEADER.size:
+        raise ValueError("Snapshot is truncated")
+    fields = _SNAPSHOT_HEADER.unpack_from(header)
+    if fields[0] != SNAPSHOT_MAGIC:
+        raise ValueError("Not a purchase snapshot")
+    if fields[1] != SNAPSHOT_SCHEMA_VERSION:
+        raise ValueError(f"Unsupported snapshot schema {fields[1]}")
+    return fields
+
+def read_snapshot(path: str):
+    """Memory-map a snapshot and return (version, created at, parts).
+
+    Parts are memoryview slices of the read-only mapping, so nothing is
+    copied and every process mapping the same file shares its pages.
+    """
+    with open(path, 'rb') as f:
+        view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    _, _, toc_length, version, created_at, crc, size = _unpack_snapshot_header(view)
+    if size != len(view):
+        raise ValueError("Snapshot is truncated")
+    if zlib.crc32(view[_SNAPSHOT_HEADER.size:]) != crc:
+        raise ValueError("Snapshot checksum mismatch")
+
+    toc = json.loads(bytes(view[_SNAPSHOT_HEADER.size:_SNAPSHOT_HEADER.size + toc_length]))
+    data_start = _align(_SNAPSHOT_HEADER.size + toc_length)
+    parts = {name: view[data_start + start:data_start + start + length] for name, start, length in toc}
+    if parts.pop('snapshot.abi', None) != _SNAPSHOT_ABI:
+        raise ValueError("Snapshot was written on an incompatible platform")
+    return version, created_at, parts
+
+class SnapshotDatasetBackend:
+    """Dataset shared through a memory-mapped snapshot file (see write_snapshot).
+
+    Workers notice a new upload when the file's inode or mtime changes and
+    then map it: columns and indexes are used in place, so a worker (or a
+    restarted server) is ready after a checksum pass instead of a parse.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.created_at = None
+        self.size = None
+        self._stat = None
+        self._version = 0
+
+    def version(self) -> int:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return 0
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if signature != self._stat:
+            try:
+                self._version = read_snapshot_header(self.path)[0]
+            except ValueError:
+                self._version = -1
+            self._stat = signature
+        return self._version
+
+    def publish(self, parts: Dict[str, bytes]) -> int:
+        version = max(self.version(), 0) + 1
+        self.size = write_snapshot(self.path, parts, version)
+        self.created_at = time.time()
+        return version
+
+    def clear(self) -> int:
+        """Replace the snapshot with an empty one and return its version.
+
+        Versions keep counting up, so no worker mistakes a later upload for
+        the dataset it already has. Files a crashed write left behind, and
+        upload job reports, go too.
+        """
+        version = self.publish({})
+        for leftover in glob.glob(f"{glob.escape(self.path)}.*.tmp"):
+            os.remove(leftover)
+        for report in glob.glob(os.path.join(glob.escape(self.jobs_path), '*')):
+            os.remove(report)
+        return version
+
+    def fetch(self):
+        version, self.created_at, parts = read_snapshot(self.path)
+        self.size = os.path.getsize(self.path)
+        return version, parts
+
+    @property
+    def jobs_path(self) -> str:
+        """Directory of upload job reports, one JSON file per job, beside the snapshot."""
+        return f"{self.path}.jobs"
+
+    def save_job(self, job_id: str, job: Dict):
+        """Store an upload job's status for /api/upload/<job_id> in any worker."""
+        os.makedirs(self.jobs_path, mode=0o700, exist_ok=True)
+        path = os.path.join(self.jobs_path, f"{job_id}.json")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as f:
+            f.write(orjson.dumps(job))
+        os.replace(tmp_path, path)
+        reports = sorted(glob.glob(os.path.join(glob.escape(self.jobs_path), '*.json')), key=os.path.getmtime)
+        for report in reports[:max(0, len(reports) - MAX_UPLOAD_JOBS)]:
+            try:
+                os.remove(report)
+            except FileNotFoundError:
+                pass
+
+    def load_job(self, job_id: str):
+        """Return the status save_job stored for ``job_id``, or None."""
+        # Job ids are uuid4 hex; anything else must not become a path
+        if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+            return None
+        try:
+            with open(os.path.join(self.jobs_path, f"{job_id}.json"), 'rb') as f:
+                return orjson.loads(f.read())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            return None
+
+def make_dataset_backend(kind: str, path: str = None):
+    """Return the shared dataset backend for ``kind`` (None for per-process memory)."""
+    if kind == 'memory':
+        return None
+    if kind == 'sqlite':
+        return SQLiteDatasetBackend(path or 'purchases.db')
+    if kind == 'snapshot':
+        return SnapshotDatasetBackend(path or 'purchases.snapshot')
+    raise ValueError(f"Unknown DATASET_STORE: {kind}")
+
+DATASET_BACKEND = make_dataset_backend(DATASET_STORE, DATASET_PATH)
+
+class DatasetLock:
+    """Readers-writer lock around the installed dataset.
+
+    Any number of searches may read at once; swapping in a new dataset (or
+    merging into the live one) waits for them to finish and holds off new
+    ones meanwhile, so a search never sees half of each. Swaps nest.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.RLock())
+        self._readers = 0
+
+    @contextmanager
+    def reading(self):
+        with self._condition:
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def swapping(self):
+        with self._condition:
+            self._condition.wait_for(lambda: self._readers == 0)
+            yield
+
+DATASET_LOCK = DatasetLock()
+
+def install_dataset(store: PurchaseStore, version: int, index: PurchaseIndex = None):
+    """Make ``store`` the dataset this process searches."""
+    global PURCHASES, ORDERS, INDEX, DATASET_VERSION
+    index = index or PurchaseIndex(store)
+    with DATASET_LOCK.swapping():
+        PURCHASES = store
+        ORDERS = store.orders
+        INDEX = index
+        DATASET_VERSION = version
+        # Entries for the previous dataset can no longer be hit; drop them now
+        SEARCH_CACHE.clear()
+
+def publish_dataset(store: PurchaseStore, index: PurchaseIndex = None):
+    """Install a freshly loaded store, publishing it to the shared backend if there is one."""
+    index = index or PurchaseIndex(store)
+    if DATASET_BACKEND is None:
+        install_dataset(store, DATASET_VERSION + 1, index)
+    else:
+        install_dataset(store, DATASET_BACKEND.publish({**store.to_parts(), **index.to_parts()}), index)
+
+def forget_dataset(version: int):
+    """Stop serving any dataset, as before the first upload."""
+    global PURCHASES, ORDERS, INDEX, DATASET_VERSION
+    with DATASET_LOCK.swapping():
+        PURCHASES, ORDERS, INDEX = [], {}, None
+        DATASET_VERSION = version
+        SEARCH_CACHE.clear()
+
+def clear_dataset():
+    """Forget the loaded dataset, deleting it from the shared backend if there is one."""
+    forget_dataset(DATASET_VERSION + 1 if DATASET_BACKEND is None else DATASET_BACKEND.clear())
+
+_EXPIRY_TIMER = None
+
+def expire_dataset():
+    """Delete the shared dataset once it is DATASET_RETENTION_HOURS old, or schedule that.
+
+    Runs at startup and before every request; the timer deletes it on
+    time in a worker that sits idle.
+    """
+    global _EXPIRY_TIMER
+    if DATASET_BACKEND is None or not DATASET_RETENTION_HOURS or not len(PURCHASES):
+        return
+    created_at = DATASET_BACKEND.created_at or time.time()
+    remaining = created_at + DATASET_RETENTION_HOURS * 3600 - time.time()
+    if remaining <= 0:
+        clear_dataset()
+        return
+    # A timer started before fork() (gunicorn --preload) isn't running here
+    if _EXPIRY_TIMER is None or not _EXPIRY_TIMER.is_alive():
+        _EXPIRY_TIMER = threading.Timer(remaining, _expiry_due)
+        _EXPIRY_TIMER.daemon = True
+        _EXPIRY_TIMER.start()
+
+def _expiry_due():
+    global _EXPIRY_TIMER
+    # A newer upload may have moved the expiry on; expire_dataset schedules that
+    _EXPIRY_TIMER = None
+    expire_dataset()
+
+def sync_dataset():
+    """Switch to the shared backend's dataset if another process published a newer one."""
+    global DATASET_VERSION, DATASET_LOAD_MS
+    if DATASET_BACKEND is None:
+        return
+    version = DATASET_BACKEND.version()
+    if version == DATASET_VERSION:
+        return
+    started = time.perf_counter()
+    try:
+        version, parts = DATASET_BACKEND.fetch()
+    except (OSError, ValueError) as e:
+        # Keep serving the current dataset and don't retry until the store changes
+        logger.warning("Could not load shared dataset: %s", e)
+        DATASET_VERSION = version
+        return
+    if parts:
+        store = PurchaseStore.from_parts(parts)
+        # Datasets saved before an index array existed get their index rebuilt
+        complete = all(f'index.{name}' in parts for name in PurchaseIndex.ARRAYS)
+        index = PurchaseIndex.from_parts(store, parts) if complete else None
+        install_dataset(store, version, index)
+        DATASET_LOAD_MS = round((time.perf_counter() - started) * 1000, 2)
+    else:
+        # Another worker deleted the dataset
+        forget_dataset(version)
+
+# Warm start from whatever the shared store already holds. COMBINATION_POOL
+# workers import this module too, but only search the arrays they're sent.
+if multiprocessing.parent_process() is None:
+    sync_dataset()
+    expire_dataset()
+
+class _PrefixedStream(io.RawIOBase):
+    """Raw binary stream that replays an already-read head before the rest of ``stream``."""
+
+    def __init__(self, head: bytes, stream):
+        self._head = memoryview(head)
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._head:
+            n = min(len(buffer), len(self._head))
+            buffer[:n] = self._head[:n]
+            self._head = self._head[n:]
+            return n
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+def open_csv_stream(stream, chunk_size: int = UPLOAD_CHUNK_SIZE, encoding: str = None) -> io.TextIOWrapper:
+    """Wrap a binary upload stream as incrementally decoded CSV text.
+
+    Unless ``encoding`` is given, it is chosen from the first chunk: UTF-8
+    (a BOM is stripped) when it decodes cleanly, latin-1 otherwise. A later
+    byte that isn't UTF-8 raises UnicodeDecodeError (see read_csv_stream).
+    """
+    head = stream.read(chunk_size)
+    if encoding is None:
+        encoding = 'utf-8-sig'
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(head, final=False)
+        except UnicodeDecodeError:
+            encoding = 'latin-1'
+    raw = io.BufferedReader(_PrefixedStream(head, stream), chunk_size)
+    return io.TextIOWrapper(raw, encoding=encoding, newline='')
+
+def read_csv_stream(stream, read: Callable[[io.TextIOWrapper], object], chunk_size: int = UPLOAD_CHUNK_SIZE):
+    """Return ``read(open_csv_stream(stream))``.
+
+    A file whose first chunk is UTF-8 can still turn out not to be, so if
+    decoding fails further on, the seekable ``stream`` is read again from
+    the start as latin-1, which decodes any byte.
+    """
+    start = stream.tell()
+    try:
+        return read(open_csv_stream(stream, chunk_size))
+    except UnicodeDecodeError:
+        stream.seek(start)
+        return read(open_csv_stream(stream, chunk_size, 'latin-1'))
+
+# CSV header names for each purchase field, in order of preference
+CSV_COLUMNS = {
+    'order_id': ('order id',),
+    'date': ('order date',),
+    'price': ('price',),
+    'description': ('description',),
+    'item_url': ('item url', 'item_url'),
+    'order_url': ('order url', 'order_url'),
+    'asin': ('ASIN',),
+    'quantity': ('quantity',),
+}
+
+def _column_positions(header: List[str]) -> Dict[str, int]:
+    """Map each purchase field to its column position (None when absent)."""
+    positions = {}
+    for position, name in enumerate(header):
+        positions.setdefault(name, position)
+    return {
+        field: next((positions[name] for name in names if name in positions), None)
+        for field, names in CSV_COLUMNS.items()
+    }
+
+def _price_to_cents(price: str) -> int:
+    price_str = price.replace('$', '').strip()
+    return to_cents(float(price_str)) if price_str and price_str != '0' else 0
+
+def _parse_quantity(quantity: str) -> int:
+    return int(quantity) if quantity else 1
+
+def _parse_rows_fast(rows: List[List[str]], positions: Dict[str, int], width: int):
+    """Parse a batch of well-formed rows column by column.
+
+    Every step is a C-level ``map``/``itemgetter`` pass over one column.
+    Raises on the first bad value; the caller then falls back to
+    ``_parse_rows_slow`` for the batch.
+    """
+    if positions['date'] is None or positions['price'] is None or min(map(len, rows)) < width:
+        raise ValueError("batch needs per-row parsing")
+
+    def column(field):
+        position = positions[field]
+        return list(map(itemgetter(position), rows)) if position is not None else [''] * len(rows)
+
+    dates = column('date')
+    days = list(map(parse_day, dates))
+    return (
+        column('order_id'),
+        dates,
+        days,
+        list(map(_price_to_cents, column('price'))),
+        list(map(itemgetter(slice(0, 100)), column('description'))),
+        column('item_url'),
+        column('order_url'),
+        column('asin'),
+        list(map(_parse_quantity, column('quantity'))),
+    )
+
+class IngestReport:
+    """Rows an upload rejected, counted by reason, with the first few of each kept as samples.
+
+    Reasons are ``missing_order_id`` and ``subtotal`` for rows that are not
+    purchases, ``missing_<field>`` for rows without a date or price column
+    and ``bad_<field>`` for a date, price or quantity that doesn't parse.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.samples = defaultdict(list)
+
+    def reject(self, reason: str, row_number: int, row: List[str], error: str = None):
+        self.counts[reason] += 1
+        samples = self.samples[reason]
+        if len(samples) < REJECT_SAMPLES:
+            samples.append({"row": row_number, "error": error, "data": row})
+
+    def to_dict(self) -> Dict:
+        return {reason: {"count": n, "samples": self.samples[reason]} for reason, n in sorted(self.counts.items())}
+
+def _parse_rows_slow(numbered_rows: List[tuple], positions: Dict[str, int], report: IngestReport):
+    """Parse (row number, row) pairs one by one, rejecting rows that fail into ``report``."""
+    parsed = []
+    for row_number, row in numbered_rows:
+        def cell(field):
+            position = positions[field]
+            return row[position] if position is not None and position < len(row) else ''
+
+        # The field being read, named in the reject reason if it fails
+        field = 'date'
+        try:
+            order_date = row[positions['date']]
+            day = parse_day(order_date)
+            field = 'price'
+            cents = _price_to_cents(row[positions['price']])
+            field = 'quantity'
+            quantity = _parse_quantity(cell('quantity'))
+        except (IndexError, TypeError):
+            report.reject(f'missing_{field}', row_number, row)
+            continue
+        except (ValueError, OverflowError) as e:
+            report.reject(f'bad_{field}', row_number, row, str(e))
+            continue
+        parsed.append((
+            cell('order_id'),
+            order_date,
+            day,
+            cents,
+            cell('description')[:100],
+            cell('item_url'),
+            cell('order_url'),
+            cell('asin'),
+            quantity,
+        ))
+    return tuple(map(list, zip(*parsed))) if parsed else None
 
-def round_amount(amount: float) -> float:
-    """Round amount to 2 decimal places for consistent comparison."""
-    return round(amount, 2)
+def _drop_known_lines(store: PurchaseStore, columns: tuple, first_order: int, known: Dict[int, Counter]) -> tuple:
+    """Drop the rows of a parsed batch that ``store`` already holds.
 
-def calculate_days_diff(item_date: str, target_dt: datetime) -> int:
-    """Calculate days difference between item date and target date."""
-    return (parse_date(item_date) - target_dt).days
+    A row is known when one of the store's first ``first_order`` orders has
+    a line with the same order id, ASIN, price and quantity that no earlier
+    row of this upload has claimed; ``known`` keeps the unclaimed lines of
+    each order looked at so far. Only orders the upload mentions are read.
+    Returns (columns, duplicates).
+    """
+    lookup = store.order_lookup
+    keep = []
+    for order_id, cents, asin, quantity in zip(columns[0], columns[3], columns[7], columns[8]):
+        o = lookup.get(order_id, first_order)
+        if o < first_order:
+            lines = known.get(o)
+            if lines is None:
+                lines = known[o] = store.order_lines(o)
+            key = (asin, cents, quantity)
+            if lines[key] > 0:
+                lines[key] -= 1
+                keep.append(False)
+                continue
+        keep.append(True)
+    duplicates = keep.count(False)
+    if duplicates:
+        columns = tuple(list(compress(column, keep)) for column in columns)
+    return columns, duplicates
 
-def filter_candidates_by_date_range(items, target_date: str, days_range: int, min_amount: float = 0):
-    """Filter items by date range and optionally by minimum amount."""
-    target_dt, start_date, end_date = get_date_range(target_date, days_range)
+def load_amazon_csv(lines: Iterable[str], profile: Profile = NO_PROFILE, append: bool = False,
+                    progress: Callable[[int, int], None] = None) -> Dict:
+    """Load an Amazon order history CSV from any iterable of text lines.
 
-    candidates = []
-    for item in items:
-        item_date = parse_date(item["date"])
-        if start_date <= item_date <= end_date and item["amount"] > min_amount:
-            candidates.append(item)
+    Rows are read with a plain csv.reader (column positions come from the
+    header once), parsed in batches of LOAD_BATCH_SIZE and appended straight
+    into a new PurchaseStore, so ``lines`` can be a streaming upload (see
+    open_csv_stream) and only one batch is ever held in text form.
 
-    return candidates, target_dt
+    With ``append``, the rows are merged into the loaded dataset instead:
+    lines it already has (see _drop_known_lines) are skipped, existing
+    orders gain the new lines, and the orders and search index are patched
+    rather than rebuilt, so the work is proportional to the upload.
 
-def load_amazon_csv_from_string(csv_content: str):
-    global PURCHASES, ORDERS
-    
-    PURCHASES = []
-    ORDERS = {}
-    order_items = defaultdict(list)
+    Searches keep using the previous dataset until the new one is complete,
+    and a file without any purchase leaves it in place.
+    ``progress(rows_processed, rows_skipped)`` is called after each batch.
+    Rows that are not valid purchases are counted by reason (see
+    IngestReport) and the store's DatasetStats are gathered as batches are
+    appended, so neither needs another pass over the data.
+    Returns a processing summary; phase timings and row counts go to ``profile``.
+    """
+    append = append and INDEX is not None and len(PURCHASES) > 0
+    if append:
+        store = INDEX.store
+        first_row, first_order = len(store), len(store.order_ids)
+        known = {}
+        new_batches = []
+    else:
+        store = PurchaseStore()
+    reader = csv.reader(lines)
+    parse_started = time.perf_counter()
     
-    csv_file = io.StringIO(csv_content)
-    reader = csv.DictReader(csv_file)
-    purchase_id = 1
+    # The header is the first row with any content
+    header = next((row for row in reader if any(cell.strip() for cell in row)), None)
+    positions = _column_positions(header or [])
+    order_id_col = positions['order_id']
+    width = len(header) if header else 0
     
     rows_processed = 0
     rows_skipped = 0
+    rows_duplicate = 0
+    report = IngestReport()
     
-    for row in reader:
-        rows_processed += 1
-        
+    def order_id_of(row):
+        return row[order_id_col] if order_id_col is not None and order_id_col < len(row) else ''
+    
+    def is_item_row(row):
         # Skip empty rows or subtotal rows
-        if not row.get('order id') or row['order id'].startswith('='):
-            rows_skipped += 1
-            continue
+        order_id = order_id_of(row)
+        return bool(order_id) and not order_id.startswith('=')
+    
+    while True:
+        # Blank lines are ignored entirely, as csv.DictReader does
+        batch = [row for row in islice(reader, LOAD_BATCH_SIZE) if row]
+        if not batch:
+            break
+        first_row_number = rows_processed + 1
+        rows_processed += len(batch)
         
+        is_item = list(map(is_item_row, batch))
+        items = list(compress(batch, is_item))
+        if len(items) < len(batch):
+            for number, row in compress(enumerate(batch, first_row_number), map(not_, is_item)):
+                report.reject('subtotal' if order_id_of(row) else 'missing_order_id', number, row)
         try:
-            order_id = row['order id']
-            order_date = row['order date']
-            
-            # Parse price - handle empty prices
-            price_str = row['price'].replace('$', '').strip()
-            price = round(float(price_str), 2) if price_str and price_str != '0' else 0.0
-            
-            # Get description - handle missing column
-            description = row.get('description', '')[:100]
-            
-            # Get URLs - handle both possible column names
-            item_url = row.get('item url', row.get('item_url', ''))
-            order_url = row.get('order url', row.get('order_url', ''))
-            
-            # Get ASIN
-            asin = row.get('ASIN', '')
-            
-            # Get quantity
-            quantity_str = row.get('quantity', '1')
-            quantity = int(quantity_str) if quantity_str else 1
-            
-            purchase = {
-                'id': purchase_id,
-                'order_id': order_id,
-                'date': order_date,
-                'amount': price,
-                'description': description,
-                'item_url': item_url,
-                'order_url': order_url,
-                'asin': asin,
-                'quantity': quantity
-            }
-            
-            PURCHASES.append(purchase)
-            order_items[order_id].append(purchase)
-            purchase_id += 1
-            
-        except Exception as e:
-            print(f"Error processing row {rows_processed}: {e}")
-            print(f"Row data: {row}")
-            rows_skipped += 1
-            continue
+            columns = _parse_rows_fast(items, positions, width) if items else None
+        except Exception:
+            numbered = list(compress(enumerate(batch, first_row_number), is_item))
+            columns = _parse_rows_slow(numbered, positions, report)
+        
+        loaded = len(columns[0]) if columns else 0
+        rows_skipped += len(batch) - loaded
+        if loaded and append:
+            # The live store only changes once the whole upload has parsed
+            columns, duplicates = _drop_known_lines(store, columns, first_order, known)
+            rows_duplicate += duplicates
+            if duplicates < loaded:
+                new_batches.append(columns)
+        elif loaded:
+            store.extend(*columns)
+        if progress is not None:
+            progress(rows_processed, rows_skipped)
     
-    # Calculate order totals
-    for order_id, items in order_items.items():
-        if items:
-            order_total = sum(item['amount'] for item in items)
-            ORDERS[order_id] = {
-                'order_id': order_id,
-                'date': items[0]['date'],
-                'total': order_total,
-                'item_count': len(items),
-                'items': items,
-                'order_url': items[0]['order_url']
-            }
+    profile.add('upload.parse', time.perf_counter() - parse_started)
+    profile.count('upload.rows_parsed', rows_processed)
+    profile.count('upload.rows_skipped', rows_skipped)
+    
+    if append:
+        rows_loaded = rows_processed - rows_skipped - rows_duplicate
+        profile.count('upload.rows_duplicate', rows_duplicate)
+        profile.count('upload.items_loaded', rows_loaded)
+        if rows_loaded:
+            # The live store is changed in place, so no search may run meanwhile
+            with DATASET_LOCK.swapping():
+                if INDEX is None or INDEX.store is not store:
+                    raise RuntimeError("The dataset was replaced while this upload was read; upload it again")
+                with profile.phase('upload.finalize'):
+                    lookup = store.order_lookup
+                    grown = {lookup[order_id] for columns in new_batches for order_id in columns[0]
+                             if lookup.get(order_id, first_order) < first_order}
+                    old_order_cents = {o: store.order_cents[o] for o in grown}
+                    store.thaw()
+                    for columns in new_batches:
+                        store.extend(*columns)
+                    store.stats.add_rejects(report.counts)
+                    store.finalize_appended(first_row)
+                with profile.phase('upload.publish'):
+                    publish_dataset(store, INDEX.patched(first_row, first_order, old_order_cents))
+    else:
+        rows_loaded = len(store)
+        profile.count('upload.items_loaded', rows_loaded)
+        
+        # Group items by order; order totals are accumulated while appending
+        with profile.phase('upload.finalize'):
+            store.stats.add_rejects(report.counts)
+            store.finalize()
+        
+        # A file without a single purchase leaves the current dataset in place
+        if rows_loaded:
+            with profile.phase('upload.publish'):
+                publish_dataset(store)
     
-    print(f"CSV Processing Summary:")
-    print(f"  Total rows processed: {rows_processed}")
-    print(f"  Rows skipped: {rows_skipped}")
-    print(f"  Items loaded: {len(PURCHASES)}")
-    print(f"  Orders created: {len(ORDERS)}")
+    logger.info("Loaded CSV: %d rows processed, %d skipped, %d duplicates, %d items added; "
+                "%d items in %d orders", rows_processed, rows_skipped, rows_duplicate, rows_loaded,
+                len(PURCHASES), len(ORDERS))
+    
+    return {
+        "has_header": header is not None,
+        "rows_processed": rows_processed,
+        "rows_skipped": rows_skipped,
+        "rows_duplicate": rows_duplicate,
+        "items_added": rows_loaded,
+        "rejected": report.to_dict()
+    }
+
+def load_amazon_csv_from_string(csv_content: str, append: bool = False) -> Dict:
+    return load_amazon_csv(io.StringIO(csv_content), append=append)
 
-def calculate_probability_score(items: List[Dict], target_date: str, target_amount: float) -> float:
+class UploadJob:
+    """An uploaded CSV being loaded in the background.
+
+    The request spools the body to ``file`` and returns the job id; the
+    job's counters are updated as batches are parsed and ``to_dict`` is what
+    /api/upload/<job_id> reports. ``result`` (or ``error``) is set once done.
+    """
+
+    def __init__(self, file, append: bool = False):
+        self.id = uuid.uuid4().hex
+        self.file = file
+        self.append = append
+        self.status = 'queued'
+        self.bytes_total = file.seek(0, io.SEEK_END)
+        file.seek(0)
+        self.bytes_read = 0
+        self.rows_processed = 0
+        self.rows_skipped = 0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.saved_at = 0
+        # Held while the job finishes, so no poll reports it done before it is saved
+        self.lock = threading.RLock()
+
+    def progress(self, rows_processed: int, rows_skipped: int):
+        self.rows_processed = rows_processed
+        self.rows_skipped = rows_skipped
+        self.bytes_read = min(self.file.tell(), self.bytes_total)
+        if time.monotonic() - self.saved_at >= UPLOAD_JOB_SAVE_INTERVAL:
+            self.save()
+
+    def save(self):
+        """Publish the job's status to the shared backend, so polls to any worker see it."""
+        self.saved_at = time.monotonic()
+        if DATASET_BACKEND is not None:
+            DATASET_BACKEND.save_job(self.id, self.to_dict())
+
+    def eta_seconds(self):
+        """Seconds left at the rate bytes have been read so far, or None before any progress."""
+        if self.status != 'running' or not self.bytes_read:
+            return None
+        elapsed = time.time() - self.started_at
+        return round(elapsed * (self.bytes_total - self.bytes_read) / self.bytes_read, 1)
+
+    def to_dict(self) -> Dict:
+        with self.lock:
+            return self._to_dict()
+
+    def _to_dict(self) -> Dict:
+        job = {
+            "job_id": self.id,
+            "status": self.status,
+            "mode": "append" if self.append else "replace",
+            "rows_processed": self.rows_processed,
+            "rows_skipped": self.rows_skipped,
+            "bytes_read": self.bytes_read,
+            "bytes_total": self.bytes_total,
+            "progress": round(self.bytes_read / self.bytes_total, 3) if self.bytes_total else 0,
+            "elapsed_seconds": round((self.finished_at or time.time()) - self.started_at, 2) if self.started_at else 0,
+            "eta_seconds": self.eta_seconds()
+        }
+        if self.result is not None:
+            job["result"] = self.result
+        if self.error is not None:
+            job.update(self.error)
+        return job
+
+# Uploads replace or merge into one dataset, so they are loaded one at a
+# time, in the order they arrived, by a single background thread
+UPLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='upload')
+UPLOAD_JOBS = OrderedDict()
+UPLOAD_JOBS_LOCK = threading.Lock()
+
+def submit_upload(job: UploadJob, run: Callable[[UploadJob], None]) -> UploadJob:
+    """Register ``job`` and queue ``run(job)`` on the upload worker."""
+    with UPLOAD_JOBS_LOCK:
+        UPLOAD_JOBS[job.id] = job
+        finished = [job_id for job_id, other in UPLOAD_JOBS.items() if other.finished_at is not None]
+        for job_id in finished[:max(0, len(UPLOAD_JOBS) - MAX_UPLOAD_JOBS)]:
+            del UPLOAD_JOBS[job_id]
+    job.save()
+    UPLOAD_EXECUTOR.submit(run, job)
+    return job
+
+def calculate_probability_score(items: List[Dict], target_date: str, target_amount: float,
+                                tolerance: 'AmountTolerance' = None) -> float:
     if not items:
         return 0.0
     
     target_dt = parse_date(target_date)
     
-    dates = [parse_date(item['date']) for item in items]
-    avg_days_diff = sum(abs((d - target_dt).days) for d in dates) / len(dates)
-    date_score = max(0, 1 - (avg_days_diff / 14)) * 50
-    
+    abs_days_diffs = [abs((parse_date(item['date']) - target_dt).days) for item in items]
     order_ids = set(item['order_id'] for item in items)
-    same_order_score = 50 if len(order_ids) == 1 else 0
     
-    return round(date_score + same_order_score, 2)
+    # With a tolerance, amounts further from the target score lower
+    amount_diff, allowance = 0, 0
+    if tolerance is not None:
+        target_cents = to_cents(target_amount)
+        amount_diff = abs(sum(to_cents(item['amount']) for item in items) - target_cents)
+        allowance = tolerance.allowance(target_cents)
+    
+    return _probability_from_days(abs_days_diffs, len(order_ids), amount_diff, allowance)
+
+def _probability_from_days(abs_days_diffs: List[int], order_count: int,
+                           amount_diff: int = 0, allowance: int = 0) -> float:
+    """Score a match from its per-item absolute day offsets and distinct order count.
+
+    ``amount_diff`` is how far (in cents) the match is from the target and
+    ``allowance`` the largest difference the tolerance accepts; a match at
+    the edge of the tolerance keeps half its score, an exact one all of it.
+    """
+    avg_days_diff = sum(abs_days_diffs) / len(abs_days_diffs)
+    date_score = max(0, 1 - (avg_days_diff / 14)) * 50
+    same_order_score = 50 if order_count == 1 else 0
+    score = date_score + same_order_score
+    if allowance:
+        score *= 1 - 0.5 * min(1, amount_diff / allowance)
+    return round(score, 2)
+
+class AmountTolerance:
+    """How far a purchase amount may be from the charge it should match.
+
+    ``cents`` and ``percent`` allow that much either side of the target (the
+    larger of the two applies). A tax band of ``tax_rate_min``..``tax_rate_max``
+    percent matches pre-tax amounts, target / (1 + rate), instead, with the
+    same slack either side of the band.
+    """
+
+    def __init__(self, cents: int = 0, percent: float = 0.0,
+                 tax_rate_min: float = None, tax_rate_max: float = None):
+        if tax_rate_min is None:
+            tax_rate_min = 0.0 if tax_rate_max is not None else None
+        if tax_rate_max is None:
+            tax_rate_max = tax_rate_min
+        if min(cents, percent, tax_rate_min or 0) < 0 or (tax_rate_max or 0) < (tax_rate_min or 0):
+            raise ValueError("Tolerances must be non-negative and tax_rate_min <= tax_rate_max")
+        self.cents = cents
+        self.percent = percent
+        self.tax_rate_min = tax_rate_min
+        self.tax_rate_max = tax_rate_max
+
+    def interval(self, target_cents: int) -> tuple:
+        """Return the (lowest, highest) accepted amount in cents."""
+        slack = max(self.cents, int(round(target_cents * self.percent / 100)))
+        low = high = target_cents
+        if self.tax_rate_max is not None:
+            low = math.floor(target_cents / (1 + self.tax_rate_max / 100))
+            high = math.ceil(target_cents / (1 + self.tax_rate_min / 100))
+        return max(low - slack, 0), high + slack
+
+    def allowance(self, target_cents: int) -> int:
+        """Largest accepted distance from the target, in cents."""
+        low, high = self.interval(target_cents)
+        return max(high - target_cents, target_cents - low)
+
+def _subset_sum_tables(cents: List[int], target: int, max_items: int,
+                       budget: 'SearchBudget' = None) -> List[List[int]]:
+    """Build the bounded subset-sum reachability tables for a candidate list.
+
+    ``tables[j][i]`` is a bitmask whose bit ``s`` is set when some subset of
+    exactly ``j`` items from ``cents[i:]`` sums to ``s`` cents (for s <= target).
+    No subset has more than ``len(cents)`` items, so no more rows are built.
+    Returns None if ``budget`` runs out first.
+    """
+    n = len(cents)
+    mask = (1 << (target + 1)) - 1
+    tables = [[1] * (n + 1)]
+    for j in range(1, min(max_items, n) + 1):
+        if budget is not None and budget.expired(time.monotonic()):
+            return None
+        previous = tables[j - 1]
+        row = [0] * (n + 1)
+        for i in range(n - 1, -1, -1):
+            row[i] = row[i + 1] | ((previous[i + 1] << cents[i]) & mask)
+        tables.append(row)
+    return tables
+
+def _iter_exact_subsets(cents: List[int], target: int, size: int, tables: List[List[int]], positions: Dict[int, List[int]]):
+    """Yield index tuples of ``size`` items summing to ``target``, in lexicographic order.
+
+    Every branch is checked against the reachability tables before it is
+    entered, so work is proportional to the number of solutions rather than
+    to the number of possible combinations. The last two items are joined
+    through ``positions`` (cents -> ascending candidate indices) instead.
+    """
+    n = len(cents)
+    chosen = []
+
+    def extend(start: int, slots: int, remaining: int):
+        if slots == 1:
+            matches = positions.get(remaining, ())
+            for idx in matches[bisect_left(matches, start):]:
+                yield (*chosen, idx)
+            return
+        if slots == 2:
+            for idx in range(start, n - 1):
+                partners = positions.get(remaining - cents[idx])
+                if partners and partners[-1] > idx:
+                    chosen.append(idx)
+                    for partner in partners[bisect_right(partners, idx):]:
+                        yield (*chosen, partner)
+                    chosen.pop()
+            return
+        here = tables[slots]
+        below = tables[slots - 1]
+        for idx in range(start, n - slots + 1):
+            if not (here[idx] >> remaining) & 1:
+                break
+            c = cents[idx]
+            if c <= remaining and (below[idx + 1] >> (remaining - c)) & 1:
+                chosen.append(idx)
+                yield from extend(idx + 1, slots - 1, remaining - c)
+                chosen.pop()
+
+    yield from extend(0, size, target)
+
+class SearchBudget:
+    """Work limits for an anytime combination search.
+
+    The search stops, keeping the best combinations found so far, once
+    ``time_budget_ms`` has elapsed, ``max_solutions`` exact combinations
+    have been scored, or ``cancel()`` has been called.
+    """
+
+    def __init__(self, time_budget_ms: float = None, max_solutions: int = MAX_COMBINATION_SOLUTIONS):
+        self.started = time.monotonic()
+        self.deadline = self.started + time_budget_ms / 1000 if time_budget_ms else None
+        self.max_solutions = max_solutions
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
 
-def find_item_combinations(target_date: str, target_amount: float, days_range: int = 7, max_items: int = 5) -> List[Dict]:
-    candidates, target_dt = filter_candidates_by_date_range(PURCHASES, target_date, days_range, min_amount=0)
+    def expired(self, now: float) -> bool:
+        return self.cancelled or (self.deadline is not None and now >= self.deadline)
 
+    def elapsed_ms(self) -> float:
+        return round((time.monotonic() - self.started) * 1000, 1)
+
+# Spawned rather than forked, since the web server process runs other threads;
+# the spawned workers themselves don't start a pool
+COMBINATION_POOL = (ProcessPoolExecutor(COMBINATION_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+                    if COMBINATION_WORKERS > 1 and multiprocessing.parent_process() is None else None)
+
+def _combination_candidates(rows, target_day: int, high_cents: int, max_items: int,
+                            budget: SearchBudget = None) -> tuple:
+    """Return (candidates, tables, exhaustive) for combinations of ``rows`` totalling at most ``high_cents``.
+
+    Candidates are the rows priced within (0, high_cents], closest to
+    ``target_day`` first and capped at a window the tables can afford;
+    ``tables`` are their _subset_sum_tables (None if ``budget`` ran out
+    while building them) and ``exhaustive`` is False when the cap dropped any.
+    """
+    store_cents, store_days = INDEX.store.cents, INDEX.store.days
+    # Items priced above the target can never be part of an exact combination
+    candidates = [i for i in rows if 0 < store_cents[i] <= high_cents]
+    candidates.sort(key=lambda i: (abs(store_days[i] - target_day), i))
+
+    # The reachability tables cost roughly candidates * max_items * target bits,
+    # so very large targets get a smaller (but never below the legacy 50) window.
+    max_items = min(max_items, len(candidates))
+    limit = max(50, min(MAX_COMBINATION_CANDIDATES, COMBINATION_TABLE_BITS // ((max_items + 1) * (high_cents + 1))))
+    exhaustive = len(candidates) <= limit
+    del candidates[limit:]
+    tables = _subset_sum_tables([store_cents[i] for i in candidates], high_cents, max_items, budget)
+    return candidates, tables, exhaustive
+
+def _iter_combination_search(rows, target_day: int, target_cents: int, max_items: int, budget: SearchBudget,
+                             amount_range: tuple = None, profile: Profile = NO_PROFILE, prepared: tuple = None):
+    """Search ``rows`` for exact combinations, yielding events as it goes.
+
+    ``rows`` are store row indices already restricted to the date window;
+    each combo is a tuple of row indices, closest-to-target first. With an
+    ``amount_range`` (low, high cents) every total in the range is accepted.
+    Combinations rank by probability, then fewer items, then totals closest
+    to ``target_cents``, then closest-to-target members, so the ten returned
+    are exactly the ten an exhaustive enumeration would keep. Events:
+
+    * ``('match', probability, combo)`` when a combo enters the current top ten
+    * ``('progress', scored)`` every COMBINATION_PROGRESS_INTERVAL seconds
+    * ``('done', ranked, exhaustive, truncated_reason)`` last, with the ten
+      best (probability, combo) pairs; ``exhaustive`` is False when the
+      search was cut short, and ``truncated_reason`` says why: 'candidates'
+      when the candidate cap left purchases out, 'time' when the budget
+      (time, solutions or cancellation) ran out, otherwise None
+
+    ``prepared`` may give the _combination_candidates of ``rows`` for this
+    ``target_day``, built for a ``high_cents`` at least this search's, so
+    searches of one window can share them.
+
+    Time spent selecting candidates and building tables is charged to the
+    ``combination.filter`` phase of ``profile``, enumeration and scoring
+    (but not the consumer's work between events) to ``combination.enumerate``.
+    """
+    filter_started = time.perf_counter()
+    store = INDEX.store
+    store_cents, store_days = store.cents, store.days
+    low_cents, high_cents = amount_range or (target_cents, target_cents)
+
+    candidates, tables, exhaustive = prepared or _combination_candidates(rows, target_day, high_cents, max_items,
+                                                                         budget)
+    if tables is None:
+        profile.add('combination.filter', time.perf_counter() - filter_started)
+        yield ('done', [], False, 'time')
+        return
     if not candidates:
-        return []
+        profile.add('combination.filter', time.perf_counter() - filter_started)
+        yield ('done', [], exhaustive, None if exhaustive else 'candidates')
+        return
+    # The tables stop at one row per candidate, and so does the search
+    max_items = min(max_items, len(candidates))
+
+    cents = [store_cents[i] for i in candidates]
+    abs_diffs = [abs(store_days[i] - target_day) for i in candidates]
+    orders = [store.order_idx[i] for i in candidates]
+    n = len(candidates)
+    profile.count('combination.candidates', n)
+
+    def indexed_subsets(members: list):
+        """The (combo, total) pairs one order's candidates make, read from the index,
+        or None if the order's subsets weren't indexed."""
+        o = orders[members[0]]
+        subsets = INDEX.order_subsets(o, low_cents, high_cents)
+        if subsets is None:
+            return None
+        position = {candidates[idx]: idx for idx in members}
+        combos = []
+        for total, mask in subsets:
+            subset = INDEX.subset_rows(o, mask)
+            # Rows past the candidate cap can't be used
+            if len(subset) <= max_items and all(i in position for i in subset):
+                combos.append((tuple(sorted(position[i] for i in subset)), total))
+        return combos
+
+    search = _parallel_combination_search if COMBINATION_POOL is not None else _search_candidates
+    search = search(cents, abs_diffs, orders, tables, target_cents, (low_cents, high_cents), max_items, budget,
+                    indexed_subsets)
+    resumed = time.perf_counter()
+    profile.add('combination.filter', resumed - filter_started)
+    for event in search:
+        if event[0] == 'done':
+            break
+        profile.add('combination.enumerate', time.perf_counter() - resumed)
+        if event[0] == 'match':
+            yield ('match', event[1], tuple(candidates[i] for i in event[2]))
+        else:
+            yield event
+        resumed = time.perf_counter()
+
+    _, best, scored, expanded, stopped = event
+    ranked = [(-entry[0], tuple(candidates[i] for i in entry[-1])) for entry in best]
+    profile.add('combination.enumerate', time.perf_counter() - resumed)
+    profile.count('combination.enumerated', scored)
+    profile.count('combination.expanded', expanded)
+    # More time can't bring back purchases the cap left out, so that reason wins
+    yield ('done', ranked, exhaustive and not stopped,
+           'candidates' if not exhaustive else 'time' if stopped else None)
+
+def _search_candidates(cents: list, abs_diffs: list, orders: list, tables: list, target_cents: int,
+                       amount_range: tuple, max_items: int, budget: SearchBudget, indexed_subsets=None,
+                       handoff_after: int = None, frontier: list = None, first_items: range = None,
+                       best: list = (), shared_best: memoryview = None, slot: int = 0):
+    """The best-first search behind _iter_combination_search, over candidate positions.
+
+    ``cents``, ``abs_diffs`` and ``orders`` describe the candidates, sorted by
+    day offset, and ``tables`` are their _subset_sum_tables.
+    ``indexed_subsets(members)`` may supply the combinations of one order's
+    candidates. After ``handoff_after`` subtrees the search stops and hands
+    over the rest; a search given that ``frontier`` of (key, subtree) and
+    the ``best`` so far picks up from there, taking only the combinations
+    whose first candidate is in ``first_items``. Such a search publishes
+    the ranking of the ten best it found itself, as (-probability, size,
+    distance, total) doubles, in its ``slot`` of ``shared_best``, and
+    stops at subtrees that cannot reach the tenth best of all of them.
+    Events:
+
+    * ``('match', probability, combo)`` with a combo of candidate positions
+    * ``('progress', scored)``
+    * ``('handoff', frontier, best, scored, expanded)`` instead of ``done``
+    * ``('done', best, scored, expanded, stopped)`` with the ranking entries
+      (-probability, size, distance, total, combo) of the ten best
+    """
+    n = len(cents)
+    low_cents, high_cents = amount_range
+    allowance = max(high_cents - target_cents, target_cents - low_cents)
+    first_items = range(n) if first_items is None else first_items
+    # Candidates are sorted by day offset, so prefix[j] - prefix[i] is the
+    # smallest offset sum of (j - i) candidates taken from i onwards
+    prefix = [0, *accumulate(abs_diffs)]
+    by_cents = sorted(range(n), key=lambda i: (cents[i], i))
+    sorted_cents = [cents[i] for i in by_cents]
+    last_position = {c: idx for idx, c in enumerate(cents)}
+    low_cents = max(low_cents, 1)
+
+    def closest(slots: int, start: int, total: int):
+        """Smallest distance from the target reachable by adding ``slots`` candidates
+        from ``start`` on to ``total`` while staying in range, or None."""
+        low, high = max(low_cents - total, 0), high_cents - total
+        if high < low:
+            return None
+        window = (tables[slots][start] >> low) & ((1 << (high - low + 1)) - 1)
+        if not allowance or not window:
+            return 0 if window else None
+        want = target_cents - total - low
+        above = window >> max(want, 0)
+        below = window & ((1 << (want + 1)) - 1) if want >= 0 else 0
+        distances = []
+        if above:
+            distances.append(max(want, 0) + (above & -above).bit_length() - 1 - want)
+        if below:
+            distances.append(want - below.bit_length() + 1)
+        return min(distances)
+
+    def bound(diff_sum: int, size: int, same_order: bool, distance: int = 0) -> float:
+        """Best probability of a ``size``-item combination whose offsets sum to at least
+        ``diff_sum`` and whose total is at least ``distance`` from the target."""
+        score = max(0, 1 - (diff_sum / size / 14)) * 50 + (50 if same_order else 0)
+        if allowance:
+            score *= 1 - 0.5 * min(1, distance / allowance)
+        return round(score, 2)
+
+    def amount_floor(distance: int) -> tuple:
+        """The best (amount distance, total) ranking for totals at least ``distance`` away."""
+        return distance, target_cents - distance
+
+    def order_subsets(members: list):
+        """Every (combo, total) in the amount range made of one order's candidates."""
+        if len(members) == 1:
+            if low_cents <= cents[members[0]] <= high_cents:
+                yield (members[0],), cents[members[0]]
+            return
+        # Most orders have every subset total in the index
+        combos = indexed_subsets(members) if indexed_subsets else None
+        if combos is not None:
+            yield from combos
+            return
+        sub_cents = [cents[i] for i in members]
+        sub_tables = _subset_sum_tables(sub_cents, high_cents, min(max_items, len(members)))
+        sub_positions = defaultdict(list)
+        for idx, c in enumerate(sub_cents):
+            sub_positions[c].append(idx)
+        for size in range(1, len(sub_tables)):
+            totals = sub_tables[size][0] >> low_cents
+            while totals:
+                lowest = totals & -totals
+                totals ^= lowest
+                total = low_cents + lowest.bit_length() - 1
+                for combo in _iter_exact_subsets(sub_cents, total, size, sub_tables, sub_positions):
+                    yield tuple(members[i] for i in combo), total
+
+    def seek(slots: int, start: int, low: int, high: int):
+        """First candidate from ``start`` on that can begin ``slots`` items totalling low..high, or None."""
+        here, below = tables[slots], tables[slots - 1]
+        if high < 0:
+            return None
+        low = max(low, 0)
+        if low == high and slots == 2:
+            # Only candidates whose complement is priced somewhere survive the C-level filter
+            for idx in compress(range(start, n - 1), map(last_position.__contains__,
+                                                         map(low.__sub__, islice(cents, start, n - 1)))):
+                if last_position[low - cents[idx]] > idx:
+                    return idx
+            return None
+        mask = (1 << (high - low + 1)) - 1
+        for idx in range(start, n - slots + 1):
+            if not (here[idx] >> low) & mask:
+                return None
+            rest_low, rest_high = max(low - cents[idx], 0), high - cents[idx]
+            if rest_high >= 0 and (below[idx + 1] >> rest_low) & ((1 << (rest_high - rest_low + 1)) - 1):
+                return idx
+        return None
+
+    def seek_first(slots: int, start: int, low: int, high: int):
+        """seek() for the first candidate of a combination, kept within ``first_items``."""
+        while True:
+            k = bisect_left(first_items, start)
+            if k == len(first_items):
+                return None
+            idx = seek(slots, first_items[k], low, high)
+            if idx is None or idx in first_items:
+                return idx
+            start = idx + 1
+
+    def push_prefix(size: int, chosen: tuple, idx: int, diff_sum: int, total: int):
+        slots = size - len(chosen)
+        distance = closest(slots, idx, total)
+        push((-bound(diff_sum + prefix[idx + slots] - prefix[idx], size, False, distance), size,
+              *amount_floor(distance), (*chosen, idx)),
+             (size, chosen, idx, diff_sum, total, distance))
+
+    def expand(node: tuple):
+        """Yield the complete cross-order combinations of ``node``, queueing its child and next sibling.
+
+        ``node`` stands for every combination of ``size`` candidates that
+        starts with ``chosen`` and continues with a candidate at ``idx`` or
+        later. Unless only one slot is left, ``idx`` is the first candidate
+        that can be taken; the child takes it, the sibling moves on to the
+        next one that can.
+        """
+        size, chosen, idx, diff_sum, total, distance = node
+        slots = size - len(chosen)
+        low, high = low_cents - total, high_cents - total
+        if slots == 1:
+            # The last item: any candidate from idx on priced within range,
+            # best (smallest offset) first until none can make the top ten
+            for j in sorted(i for i in by_cents[bisect_left(sorted_cents, low):bisect_right(sorted_cents, high)]
+                            if i >= idx):
+                combo = (*chosen, j)
+                if beaten((-bound(diff_sum + abs_diffs[j], size, False, distance), size,
+                           *amount_floor(distance), combo)):
+                    return
+                if any(orders[i] != orders[chosen[0]] for i in chosen[1:] + (j,)):
+                    yield combo, total + cents[j]
+            return
+        sibling = (seek(slots, idx + 1, low, high) if chosen else seek_first(slots, idx + 1, low, high))
+        if sibling is not None:
+            push_prefix(size, chosen, sibling, diff_sum, total)
+        c = cents[idx]
+        child = idx + 1 if slots == 2 else seek(slots - 1, idx + 1, low - c, high - c)
+        push_prefix(size, (*chosen, idx), child, diff_sum + abs_diffs[idx], total + c)
+
+    # Best-first over a queue of subtrees keyed by the best ranking any of
+    # their combinations could reach: (-probability bound, size, amount
+    # distance, total, combo prefix). Single-order subsets carry the 50 point
+    # same-order bonus and are queued per order; every other subtree only
+    # covers combinations that span several orders. ``best`` holds the same
+    # keys for the ten best combinations scored, so the search ends once the
+    # next subtree could not displace the tenth.
+    queue = []
+    tick = count()
+
+    def push(key: tuple, node):
+        heapq.heappush(queue, (key, next(tick), node))
+
+    by_order = defaultdict(list)
+    for idx, order in enumerate(orders):
+        by_order[order].append(idx)
+    if frontier is None:
+        for members in by_order.values():
+            push((-bound(abs_diffs[members[0]], 1, True), 1, *amount_floor(0), (members[0],)), members)
+        frontier = [(None, (size, (), 0, 0, 0, None)) for size in range(2, min(max_items, n) + 1)]
+    for key, node in frontier:
+        if isinstance(node, list) or node[1]:
+            push(key, node)
+        else:
+            # The first item of a combination: move on to the next one this search covers
+            first = seek_first(node[0], node[2], low_cents, high_cents)
+            if first is not None:
+                push_prefix(node[0], (), first, 0, 0)
+
+    best = list(best)
+    given = {entry[-1] for entry in best}
+    # The tenth best ranking published by any part of a parallel search
+    floor = (math.inf,)
 
-    candidates.sort(key=lambda p: abs(calculate_days_diff(p['date'], target_dt)))
-    candidates = candidates[:50]
-
-    matches = []
-
-    for combo_size in range(1, min(max_items + 1, len(candidates) + 1)):
-        for combo in combinations(candidates, combo_size):
-            total = sum(item['amount'] for item in combo)
-
-            if abs(total - target_amount) == 0:
-                days_diffs = [calculate_days_diff(item['date'], target_dt) for item in combo]
-                avg_days_diff = sum(abs(d) for d in days_diffs) / len(days_diffs)
-
-                probability = calculate_probability_score(list(combo), target_date, target_amount)
-
-                matches.append({
-                    'items': [
-                        {
-                            'id': item['id'],
-                            'order_id': item['order_id'],
-                            'date': item['date'],
-                            'amount': item['amount'],
-                            'description': item['description'],
-                            'days_from_target': calculate_days_diff(item['date'], target_dt)
-                        }
-                        for item in combo
-                    ],
-                    'total_amount': round_amount(total),
-                    'item_count': len(combo),
-                    'avg_days_from_target': round(avg_days_diff, 1),
-                    'probability_score': probability,
-                    'same_order': len(set(item['order_id'] for item in combo)) == 1,
-                    'order_ids': list(set(item['order_id'] for item in combo)),
-                    'search_type': 'combination'
-                })
-
-        if matches and max(m['probability_score'] for m in matches) > 70:
+    def beaten(key: tuple) -> bool:
+        """Whether nothing ranked ``key`` or worse can make the top ten."""
+        return len(best) == 10 and key > best[-1] or key[:4] > floor
+
+    scored = expanded = 0
+    next_progress = time.monotonic() + COMBINATION_PROGRESS_INTERVAL
+    stopped = False
+
+    while queue and not stopped:
+        if expanded == handoff_after:
+            yield ('handoff', [(key, node) for key, _, node in queue], best, scored, expanded)
+            return
+        key, _, node = heapq.heappop(queue)
+        if shared_best is not None and expanded % 8 == 0:
+            floor = sorted(zip(*[iter(shared_best)] * 4))[9]
+        if beaten(key):
+            break
+        expanded += 1
+        for combo, total in (order_subsets(node) if isinstance(node, list) else expand(node)):
+            now = time.monotonic()
+            if scored >= budget.max_solutions or budget.expired(now):
+                stopped = True
+                break
+            order_count = len({orders[i] for i in combo})
+            probability = _probability_from_days([abs_diffs[i] for i in combo], order_count,
+                                                 abs(total - target_cents), allowance)
+            scored += 1
+
+            entry = (-probability, len(combo), abs(total - target_cents), total, combo)
+            if len(best) == 10:
+                if entry > best[-1]:
+                    continue
+                best.pop()
+            insort(best, entry)
+            if shared_best is not None:
+                found = array('d', [value for entry in best if entry[-1] not in given for value in entry[:4]])
+                shared_best[slot * 40:slot * 40 + len(found)] = found
+            yield ('match', probability, combo)
+        else:
+            now = time.monotonic()
+            stopped = budget.expired(now)
+        if now >= next_progress:
+            yield ('progress', scored)
+            next_progress = now + COMBINATION_PROGRESS_INTERVAL
+
+    yield ('done', best, scored, expanded, stopped)
+
+def _search_partition(cents: array, abs_diffs: array, orders: array, target_cents: int, amount_range: tuple,
+                      max_items: int, frontier: list, first_items: range, best: list, time_budget_ms: float,
+                      max_solutions: int, best_path: str, slot: int) -> tuple:
+    """Run one worker's share of a parallel combination search in a COMBINATION_POOL process.
+
+    ``best_path`` is the file of rankings the parts share, mapped into memory.
+    Returns the ``(best, scored, expanded, stopped)`` of its ``done`` event.
+    """
+    cents, abs_diffs, orders = cents.tolist(), abs_diffs.tolist(), orders.tolist()
+    tables = _subset_sum_tables(cents, amount_range[1], max_items)
+    with open(best_path, 'r+b') as f, mmap.mmap(f.fileno(), 0) as mapped:
+        shared_best = memoryview(mapped).cast('d')
+        try:
+            for event in _search_candidates(cents, abs_diffs, orders, tables, target_cents, amount_range,
+                                            max_items, SearchBudget(time_budget_ms, max_solutions),
+                                            frontier=frontier, first_items=first_items, best=best,
+                                            shared_best=shared_best, slot=slot):
+                if event[0] == 'done':
+                    return event[1:]
+        finally:
+            shared_best.release()
+
+def _parallel_combination_search(cents: list, abs_diffs: list, orders: list, tables: list, target_cents: int,
+                                 amount_range: tuple, max_items: int, budget: SearchBudget, indexed_subsets):
+    """_search_candidates spread over COMBINATION_POOL, with the same events and results.
+
+    The search starts here and, if it is still going after
+    COMBINATION_HANDOFF_EXPANSIONS subtrees, hands the rest to the
+    COMBINATION_WORKERS processes. Each takes the subtrees whose first
+    candidate is one of every COMBINATION_WORKERS-th, starting from the ten
+    best found so far. The parts share the rankings of their best finds
+    through a memory-mapped file, so each prunes about as well as a single
+    search would. Candidates are sent as typed arrays. Merging the ten best
+    of every part on their full ranking key gives the single search's ten.
+    Workers already running when the search is cancelled stop at their time
+    budget.
+    """
+    for event in _search_candidates(cents, abs_diffs, orders, tables, target_cents, amount_range, max_items,
+                                    budget, indexed_subsets, handoff_after=COMBINATION_HANDOFF_EXPANSIONS):
+        if event[0] in ('done', 'handoff'):
             break
+        yield event
+    if event[0] == 'done':
+        yield event
+        return
+    _, frontier, best, scored, expanded = event
+    stopped = False
+
+    # Subtrees that already hold a first candidate go to the worker covering it;
+    # every worker takes the ones that still have to pick it
+    workers = COMBINATION_WORKERS
+    shares = [[] for _ in range(workers)]
+    for key, node in frontier:
+        first = node[0] if isinstance(node, list) else node[1][0] if node[1] else None
+        for share in shares if first is None else (shares[first % workers],):
+            share.append((key, node))
+
+    # Slot 0 of the shared rankings holds the best found so far, slot k + 1 worker k's
+    shared = array('d', [math.inf]) * (40 * (workers + 1))
+    shared[:4 * len(best)] = array('d', [value for entry in best for value in entry[:4]])
+    with tempfile.NamedTemporaryFile(prefix='combination-', suffix='.best', delete=False) as f:
+        f.write(shared.tobytes())
+        best_path = f.name
+
+    remaining_ms = (budget.deadline - time.monotonic()) * 1000 if budget.deadline is not None else None
+    packed = (array('q', cents), array('i', abs_diffs), array('I', orders))
+    futures = [
+        COMBINATION_POOL.submit(_search_partition, *packed, target_cents, amount_range, max_items, share,
+                                range(part, len(cents), workers), best, remaining_ms,
+                                max(1, (budget.max_solutions - scored) // workers), best_path, part + 1)
+        for part, share in enumerate(shares)
+    ]
+    try:
+        pending = futures
+        while pending:
+            pending = wait(pending, timeout=COMBINATION_PROGRESS_INTERVAL).not_done
+            if budget.cancelled:
+                break
+            if pending:
+                yield ('progress', scored + sum(future.result()[1] for future in futures if future.done()))
+    finally:
+        for future in futures:
+            future.cancel()
+        os.unlink(best_path)
+
+    entries = {entry[-1]: entry for entry in best}
+    for future in futures:
+        if future.cancelled() or not future.done():
+            stopped = True
+            continue
+        part_best, part_scored, part_expanded, part_stopped = future.result()
+        entries.update((entry[-1], entry) for entry in part_best)
+        scored += part_scored
+        expanded += part_expanded
+        stopped = stopped or part_stopped
+    merged = sorted(entries.values())[:10]
+    for entry in merged:
+        if entry not in best:
+            yield ('match', -entry[0], entry[-1])
+    yield ('done', merged, scored, expanded, stopped)
+
+def _rank_combinations(rows, target_day: int, target_cents: int, max_items: int,
+                       budget: SearchBudget = None, amount_range: tuple = None, prepared: tuple = None) -> tuple:
+    """Run _iter_combination_search to completion; returns (ranked, exhaustive, truncated_reason)."""
+    for event in _iter_combination_search(rows, target_day, target_cents, max_items, budget or SearchBudget(),
+                                          amount_range, prepared=prepared):
+        if event[0] == 'done':
+            return event[1:]
+
+def _combination_match(rows: tuple, target_day: int, probability: float, target_cents: int = None,
+                       search_type: str = 'combination') -> Dict:
+    """Build a combination (or shipment) match from store row indices.
+
+    Given ``target_cents`` (tolerance searches), the match also reports its
+    ``amount_difference`` from the target.
+    """
+    store = INDEX.store
+    items = [store[i] for i in rows]
+    order_ids = list(dict.fromkeys(item.order_id for item in items))
+    days_diffs = [store.days[i] - target_day for i in rows]
+    total_cents = sum(store.cents[i] for i in rows)
+    match = {
+        'items': [
+            {
+                'id': item.id,
+                'order_id': item.order_id,
+                'date': item.date,
+                'amount': item.amount,
+                'description': item.description,
+                'days_from_target': days_diff
+            }
+            for item, days_diff in zip(items, days_diffs)
+        ],
+        'total_amount': round_amount(total_cents / 100),
+        'item_count': len(items),
+        'avg_days_from_target': round(sum(abs(d) for d in days_diffs) / len(days_diffs), 1),
+        'probability_score': probability,
+        'same_order': len(order_ids) == 1,
+        'order_ids': order_ids,
+        'search_type': search_type
+    }
+    if target_cents is not None:
+        match['amount_difference'] = round_amount((total_cents - target_cents) / 100)
+    return match
+
+def _item_match(i: int, target_day: int, target_date: str) -> Dict:
+    """Build an item match for store row ``i``."""
+    store = INDEX.store
+    return {
+        **store[i],
+        "days_from_target": store.days[i] - target_day,
+        "target_date": target_date,
+        "search_type": "item"
+    }
+
+def _order_match(o: int, target_day: int, target_date: str) -> Dict:
+    """Build an order match for store order index ``o``."""
+    store = INDEX.store
+    return {
+        **OrderRow(store, o),
+        "days_from_target": store.order_days[o] - target_day,
+        "target_date": target_date,
+        "search_type": "order"
+    }
+
+def find_item_combinations(target_date: str, target_amount: float, days_range: int = 7, max_items: int = 5,
+                           tolerance: AmountTolerance = None, profile: Profile = NO_PROFILE) -> List[Dict]:
+    return search_combinations(target_date, target_amount, days_range, max_items, tolerance=tolerance,
+                               profile=profile)[0]
+
+def search_combinations(target_date: str, target_amount: float, days_range: int = 7, max_items: int = 5,
+                        budget: SearchBudget = None, tolerance: AmountTolerance = None,
+                        profile: Profile = NO_PROFILE) -> tuple:
+    """find_item_combinations under a budget; returns (matches, exhaustive, truncated_reason)."""
+    for event in stream_combinations(target_date, target_amount, days_range, max_items, budget or SearchBudget(),
+                                     tolerance, profile):
+        if event[0] == 'done':
+            return event[1:]
+
+def stream_combinations(target_date: str, target_amount: float, days_range: int, max_items: int,
+                        budget: SearchBudget, tolerance: AmountTolerance = None, profile: Profile = NO_PROFILE):
+    """Yield the combination search's events (see _iter_combination_search) with match dicts."""
+    target_day = parse_day(target_date)
+    target_cents = to_cents(target_amount)
+    if INDEX is None or target_cents <= 0:
+        yield ('done', [], True, None)
+        return
+
+    amount_range = tolerance.interval(target_cents) if tolerance else None
+    # Only tolerance searches report how far each match is from the target
+    difference_from = target_cents if tolerance else None
+    with profile.phase('combination.filter'):
+        window = INDEX.window(target_day - days_range, target_day + days_range)
+    for event in _iter_combination_search(window, target_day, target_cents, max_items, budget, amount_range,
+                                          profile):
+        if event[0] == 'match':
+            with profile.phase('combination.build'):
+                match = _combination_match(event[2], target_day, event[1], difference_from)
+            yield ('match', match)
+        elif event[0] == 'done':
+            with profile.phase('combination.build'):
+                matches = [
+                    _combination_match(rows, target_day, probability, difference_from)
+                    for probability, rows in event[1]
+                ]
+            profile.count('combination.matches', len(matches))
+            yield ('done', matches, event[2], event[3])
+        else:
+            yield event
+
+def _tolerance_fields(match: Dict, cents: int, target_cents: int, tolerance: AmountTolerance) -> Dict:
+    """Add the ``amount_difference`` and ``probability_score`` of a tolerance search to ``match``."""
+    match["amount_difference"] = round_amount((cents - target_cents) / 100)
+    match["probability_score"] = _probability_from_days(
+        [abs(match["days_from_target"])], 1, abs(cents - target_cents), tolerance.allowance(target_cents)
+    )
+    return match
+
+def find_matching_items(target_date: str, target_amount: float, days_range: int = 7,
+                        tolerance: AmountTolerance = None, profile: Profile = NO_PROFILE,
+                        keywords: str = None) -> List[Dict]:
+    if INDEX is None:
+        return []
+    if keywords is not None:
+        return _find_keyword_items(target_date, target_amount, days_range, tolerance, profile, keywords)
+    target_day = parse_day(target_date)
+    target_cents = to_cents(target_amount)
+    if tolerance is None:
+        with profile.phase('item.filter'):
+            rows = sorted(INDEX.items_with_cents(target_cents, target_day - days_range, target_day + days_range))
+        with profile.phase('item.build'):
+            matches = [_item_match(i, target_day, target_date) for i in rows]
+        profile.count('item.matches', len(matches))
+        return matches
+
+    low, high = tolerance.interval(target_cents)
+    with profile.phase('item.filter'):
+        rows = sorted(INDEX.items_in_range(low, high, target_day - days_range, target_day + days_range))
+    cents = INDEX.store.cents
+    with profile.phase('item.build'):
+        matches = [_tolerance_fields(_item_match(i, target_day, target_date), cents[i], target_cents, tolerance)
+                   for i in rows]
+        # Stable sort: equally likely matches stay in load order
+        matches.sort(key=lambda m: -m["probability_score"])
+    profile.count('item.matches', len(matches))
+    return matches
+
+def _find_keyword_items(target_date: str, target_amount: float, days_range: int, tolerance: AmountTolerance,
+                        profile: Profile, keywords: str) -> List[Dict]:
+    """find_matching_items for purchases whose description or ASIN match ``keywords``.
+
+    ``target_amount`` may be None to match any amount. Matches report their
+    ``relevance`` (see PurchaseIndex.keyword_rows) and are ranked by it, then
+    by probability (tolerance searches), then by distance from the target date.
+    """
+    target_day = parse_day(target_date)
+    with profile.phase('item.filter'):
+        relevance = INDEX.keyword_rows(_tokens(keywords), target_day - days_range, target_day + days_range)
+        if target_amount is not None:
+            target_cents = to_cents(target_amount)
+            low, high = tolerance.interval(target_cents) if tolerance else (target_cents, target_cents)
+            cents = INDEX.store.cents
+            relevance = {i: score for i, score in relevance.items() if low <= cents[i] <= high}
+    with profile.phase('item.build'):
+        matches = []
+        for i in sorted(relevance):
+            match = _item_match(i, target_day, target_date)
+            if tolerance is not None and target_amount is not None:
+                _tolerance_fields(match, cents[i], target_cents, tolerance)
+            match["relevance"] = relevance[i]
+            matches.append(match)
+        matches.sort(key=lambda m: (-m["relevance"], -m.get("probability_score", 0), abs(m["days_from_target"])))
+    profile.count('item.matches', len(matches))
+    return matches
 
-    matches.sort(key=lambda x: x['probability_score'], reverse=True)
-    return matches[:10]
+def find_matching_orders(target_date: str, target_amount: float, days_range: int = 7,
+                         tolerance: AmountTolerance = None, profile: Profile = NO_PROFILE,
+                         keywords: str = None) -> List[Dict]:
+    """Find orders totalling the amount; given ``keywords``, only those with a purchase matching them."""
+    if INDEX is None or target_amount is None:
+        return []
+    target_day = parse_day(target_date)
+    target_cents = to_cents(target_amount)
+    wanted = None
+    if keywords is not None:
+        with profile.phase('order.filter'):
+            order_idx = INDEX.store.order_idx
+            wanted = {order_idx[i] for i in INDEX.keyword_rows(_tokens(keywords), target_day - days_range,
+                                                                target_day + days_range)}
+    if tolerance is None:
+        with profile.phase('order.filter'):
+            order_indices = sorted(o for o in INDEX.orders_with_cents(target_cents, target_day - days_range,
+                                                                      target_day + days_range)
+                                   if wanted is None or o in wanted)
+        with profile.phase('order.build'):
+            matches = [_order_match(o, target_day, target_date) for o in order_indices]
+        profile.count('order.matches', len(matches))
+        return matches
+
+    low, high = tolerance.interval(target_cents)
+    with profile.phase('order.filter'):
+        order_indices = sorted(o for o in INDEX.orders_in_range(low, high, target_day - days_range,
+                                                                target_day + days_range)
+                               if wanted is None or o in wanted)
+    order_cents = INDEX.store.order_cents
+    with profile.phase('order.build'):
+        matches = [
+            _tolerance_fields(_order_match(o, target_day, target_date), order_cents[o], target_cents, tolerance)
+            for o in order_indices
+        ]
+        matches.sort(key=lambda m: -m["probability_score"])
+    profile.count('order.matches', len(matches))
+    return matches
+
+def find_matching_shipments(target_date: str, target_amount: float, days_range: int = 7,
+                            tolerance: AmountTolerance = None, profile: Profile = NO_PROFILE) -> List[Dict]:
+    """Find partial shipments: two or more items, but not all, of one order adding up to the amount.
+
+    Read from the subset totals of each order in the window (worked out
+    once per order, see PurchaseIndex) instead of searched for. Returns the
+    ten best, ranked like combinations.
+    """
+    if INDEX is None:
+        return []
+    target_day = parse_day(target_date)
+    target_cents = to_cents(target_amount)
+    low, high = tolerance.interval(target_cents) if tolerance else (target_cents, target_cents)
+    allowance = tolerance.allowance(target_cents) if tolerance else 0
+    store = INDEX.store
+    with profile.phase('shipment.filter'):
+        shipments = INDEX.shipments_in_range(low, high, target_day - days_range, target_day + days_range)
+    with profile.phase('shipment.build'):
+        ranked = []
+        for o, mask in shipments:
+            rows = INDEX.subset_rows(o, mask)
+            total = sum(store.cents[i] for i in rows)
+            probability = _probability_from_days([abs(store.days[i] - target_day) for i in rows], 1,
+                                                 abs(total - target_cents), allowance)
+            ranked.append((-probability, len(rows), abs(total - target_cents), total, rows))
+        ranked.sort()
+        matches = [_combination_match(rows, target_day, -score, target_cents if tolerance else None, 'shipment')
+                   for score, _, _, _, rows in ranked[:10]]
+    profile.count('shipment.matches', len(matches))
+    return matches
+
+def parse_statement_date(value: str) -> int:
+    """Parse a statement date (YYYY-MM-DD or MM/DD/YYYY) into a day ordinal."""
+    value = str(value).strip()
+    try:
+        return parse_day(value)
+    except ValueError:
+        return datetime.strptime(value, "%m/%d/%Y").toordinal()
+
+def parse_statement_amount(value) -> int:
+    """Parse a statement amount into positive cents.
+
+    Accepts numbers or strings such as "$1,234.56", "-12.00" or "(12.00)";
+    the sign is ignored since charges and refunds both match purchases.
+    """
+    if not isinstance(value, (int, float)):
+        value = str(value).replace('$', '').replace(',', '').strip().strip('()')
+    return abs(to_cents(parse_amount(value)))
+
+def parse_statement_csv(lines: Iterable[str]) -> List[Dict]:
+    """Read (date, amount) transactions from a bank or card statement CSV.
+
+    The date and amount columns are the first headers named (or containing)
+    "date" and "amount", case-insensitively. Rows without an amount are skipped.
+    """
+    reader = csv.reader(lines)
+    header = next((row for row in reader if any(cell.strip() for cell in row)), None)
+    if header is None:
+        return []
+
+    names = [name.strip().lower() for name in header]
+
+    def column(word):
+        if word in names:
+            return names.index(word)
+        return next((position for position, name in enumerate(names) if word in name), None)
+
+    date_col, amount_col = column('date'), column('amount')
+    if date_col is None or amount_col is None:
+        raise ValueError("Statement CSV needs a date column and an amount column")
+
+    transactions = []
+    for row in reader:
+        if len(row) <= max(date_col, amount_col) or not row[amount_col].strip():
+            continue
+        transactions.append({'date': row[date_col], 'amount': row[amount_col]})
+    return transactions
+
+def reconcile_transactions(transactions: List[Dict], days_range: int = 7, max_items: int = 3,
+                           assign: bool = False, time_budget_ms: float = RECONCILE_TIME_BUDGET_MS) -> List[Dict]:
+    """Match every statement transaction against the loaded purchases in one pass.
+
+    ``transactions`` are dicts with ``date`` and ``amount`` (extra keys are
+    echoed back). They are swept in date order over the day-sorted index so
+    each transaction's candidate window is a slice of one moving window, and
+    transactions on the same day share its combination candidates and
+    tables. Item, order and combination matches are merged per transaction
+    (a match covering the same purchases is only listed once) and ranked by
+    probability score. With ``assign`` set, transactions are greedily given
+    their best match whose purchases are not already claimed by a
+    higher-scoring match, so no purchase is assigned to two charges.
 
-def find_matching_items(target_date: str, target_amount: float, days_range: int = 7) -> List[Dict]:
-    target_dt, start_date, end_date = get_date_range(target_date, days_range)
-    target_amount = round_amount(target_amount)
+    The combination searches, tables included, share ``time_budget_ms``
+    (see RECONCILE_SEARCH_SHARES). A result's ``exhaustive`` is False when
+    its search was cut short, or never ran, for lack of time
+    (``truncated_reason`` 'time'), or when the candidate cap left purchases
+    out ('candidates').
+    """
+    parsed = [(parse_statement_date(t['date']), parse_statement_amount(t['amount'])) for t in transactions]
+    results = [
+        {
+            "transaction": {**t, "index": position, "amount": cents / 100},
+            "matches": [],
+            "assigned": None,
+            "exhaustive": True,
+            "truncated_reason": None
+        }
+        for position, (t, (_, cents)) in enumerate(zip(transactions, parsed))
+    ]
+    if INDEX is None or not transactions:
+        return results
 
-    matching_items = []
+    store = INDEX.store
+    day_keys, by_day = INDEX.day_keys, INDEX.by_day
+    lo = hi = 0
+    claims = {}
+    deadline = time.monotonic() + time_budget_ms / 1000
+    searches_left = sum(1 for _, cents in parsed if cents > 0)
+    # Each day's combination candidates and tables are built once, for its
+    # largest amount, which covers every smaller one
+    day_high = {}
+    for day, cents in parsed:
+        day_high[day] = max(day_high.get(day, 0), cents)
+    prepared_day = prepared = None
 
-    for purchase in PURCHASES:
-        purchase_date = parse_date(purchase["date"])
-        purchase_amount = round_amount(purchase["amount"])
+    for position in sorted(range(len(parsed)), key=lambda p: parsed[p][0]):
+        target_day, target_cents = parsed[position]
+        target_date = date.fromordinal(target_day).isoformat()
 
-        if start_date <= purchase_date <= end_date and purchase_amount == target_amount:
-            matching_items.append({
-                **purchase,
-                "days_from_target": calculate_days_diff(purchase["date"], target_dt),
-                "target_date": target_date,
-                "search_type": "item"
-            })
+        # Slide the shared window forward to [target_day - range, target_day + range]
+        while lo < len(day_keys) and day_keys[lo] < target_day - days_range:
+            lo += 1
+        hi = max(hi, lo)
+        while hi < len(day_keys) and day_keys[hi] <= target_day + days_range:
+            hi += 1
+        if target_day != prepared_day and day_high[target_day] > 0 and time.monotonic() < deadline:
+            prepared_day = target_day
+            prepared = _combination_candidates(by_day[lo:hi], target_day, day_high[target_day], max_items,
+                                               SearchBudget((deadline - time.monotonic()) * 1000))
 
-    return matching_items
+        candidates = []
+        seen = set()
 
-def find_matching_orders(target_date: str, target_amount: float, days_range: int = 7) -> List[Dict]:
-    target_dt, start_date, end_date = get_date_range(target_date, days_range)
-    target_amount = round_amount(target_amount)
+        # Match dicts touch the packed string columns, so only the kept ones are built
+        def add(rows, score, build):
+            key = frozenset(rows)
+            if key not in seen:
+                seen.add(key)
+                candidates.append((score, len(candidates), key, rows, build))
 
-    matching_orders = []
+        if target_cents > 0:
+            for o in INDEX.orders_with_cents(target_cents, target_day - days_range, target_day + days_range):
+                score = _probability_from_days([abs(store.order_days[o] - target_day)], 1)
+                add(tuple(store.order_rows(o)), score,
+                    lambda o=o: _order_match(o, target_day, target_date))
+            for i in sorted(INDEX.items_with_cents(target_cents, target_day - days_range, target_day + days_range)):
+                score = _probability_from_days([abs(store.days[i] - target_day)], 1)
+                add((i,), score, lambda i=i: _item_match(i, target_day, target_date))
+            remaining_ms = (deadline - time.monotonic()) * 1000
+            ranked, exhaustive, truncated_reason = [], False, 'time'
+            if remaining_ms > 0 and prepared_day == target_day:
+                budget = SearchBudget(remaining_ms * min(1, RECONCILE_SEARCH_SHARES / searches_left))
+                ranked, exhaustive, truncated_reason = _rank_combinations(
+                    by_day[lo:hi], target_day, target_cents, max_items, budget, prepared=prepared)
+            searches_left -= 1
+            results[position]["exhaustive"] = exhaustive
+            results[position]["truncated_reason"] = truncated_reason
+            for probability, rows in ranked:
+                add(rows, probability,
+                    lambda rows=rows, probability=probability: _combination_match(rows, target_day, probability))
 
-    for order_id, order in ORDERS.items():
-        order_date = parse_date(order["date"])
-        order_total = round_amount(order["total"])
+        candidates.sort(key=lambda c: (-c[0], c[1]))
+        del candidates[RECONCILE_MATCHES_PER_TRANSACTION:]
+        matches = []
+        for score, _, _, rows, build in candidates:
+            match = build()
+            match['probability_score'] = score
+            match['purchase_ids'] = sorted(i + 1 for i in rows)
+            matches.append(match)
+        results[position]["matches"] = matches
+        claims[position] = [(score, key) for score, _, key, _, _ in candidates]
 
-        if start_date <= order_date <= end_date and order_total == target_amount:
-            matching_orders.append({
-                **order,
-                "days_from_target": calculate_days_diff(order["date"], target_dt),
-                "target_date": target_date,
-                "search_type": "order"
-            })
+    if assign:
+        ranked = sorted(
+            (-score, position, rank)
+            for position, options in claims.items()
+            for rank, (score, _) in enumerate(options)
+        )
+        claimed = set()
+        for _, position, rank in ranked:
+            if results[position]["assigned"] is not None:
+                continue
+            rows = claims[position][rank][1]
+            if claimed.isdisjoint(rows):
+                claimed |= rows
+                results[position]["assigned"] = results[position]["matches"][rank]
 
-    return matching_orders
+    return results
 
 # Routes
+@app.before_request
+def sync_before_request():
+    sync_dataset()
+    expire_dataset()
+
+def _profile_requested() -> bool:
+    return request.args.get('profile', '').lower() in ('1', 'true', 'yes')
+
+def _request_profile() -> Profile:
+    """Profile for this request: recording when metrics are on or ?profile=1 asks for the breakdown."""
+    return Profile(METRICS_ENABLED or _profile_requested())
+
+def _record_profile(profile: Profile, request_type: str = None):
+    if METRICS_ENABLED:
+        METRICS.record(profile, request_type)
+
+def _reads_dataset(view):
+    """Run ``view`` holding DATASET_LOCK for reading, so an upload can't swap the dataset mid-search."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with DATASET_LOCK.reading():
+            return view(*args, **kwargs)
+    return wrapper
+
 @app.route('/')
 def index():
     """Serve the main page from templates/index.html"""
@@ -241,104 +3132,652 @@ def index():
 
 @app.route('/api/upload', methods=['POST'])
 def upload_csv():
-    """Handle CSV file upload"""
+    """Accept a CSV upload and load it in the background
+
+    The body is spooled to a temporary file and a job id is returned at
+    once (202); poll /api/upload/<job_id> for progress and the result.
+    Searches are served from the previous dataset until the job swaps the
+    new one in.
+    """
     try:
-        if 'file' not in request.files:
-            return jsonify({"error": "No file provided"}), 400
-        
-        file = request.files['file']
-        
-        if file.filename == '':
-            return jsonify({"error": "No file selected"}), 400
+        if request.mimetype in ('text/csv', 'application/octet-stream'):
+            # Raw CSV body
+            stream = request.stream
+        else:
+            if 'file' not in request.files:
+                return jsonify({"error": "No file provided"}), 400
             
-        if not file.filename.endswith('.csv'):
-            return jsonify({"error": "File must be a CSV"}), 400
-        
-        # Read file content - try different encodings
-        try:
-            csv_content = file.read().decode('utf-8-sig')  # Handles BOM
-        except UnicodeDecodeError:
-            file.seek(0)
-            csv_content = file.read().decode('latin-1')  # Fallback
+            file = request.files['file']
+            
+            if file.filename == '':
+                return jsonify({"error": "No file selected"}), 400
+                
+            if not file.filename.endswith('.csv'):
+                return jsonify({"error": "File must be a CSV"}), 400
+            
+            stream = file.stream
         
-        # Remove BOM if present
-        if csv_content.startswith('\ufeff'):
-            csv_content = csv_content[1:]
+        # mode=append merges the upload into the loaded dataset instead of replacing it
+        append = (request.args.get('mode') or request.form.get('mode', '')).lower() == 'append'
         
-        # Check if file is empty
-        if not csv_content.strip():
+        spool = tempfile.TemporaryFile()
+        shutil.copyfileobj(stream, spool, UPLOAD_CHUNK_SIZE)
+        if not spool.tell():
+            spool.close()
             return jsonify({"error": "CSV file is empty"}), 400
         
-        # Load the CSV
-        load_amazon_csv_from_string(csv_content)
+        job = submit_upload(UploadJob(spool, append), partial(
+            _run_upload_job, profile=_request_profile(), include_profile=_profile_requested()))
+        return jsonify({
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": url_for('upload_status', job_id=job.id)
+        }), 202
+    
+    except Exception as e:
+        logger.exception("Upload error")
+        return jsonify({"error": f"Error processing file: {str(e)}"}), 500
+
+def _run_upload_job(job: UploadJob, profile: Profile, include_profile: bool):
+    """Load a spooled upload; runs on the upload worker."""
+    job.started_at = time.time()
+    job.status = 'running'
+    try:
+        job.save()
+        with job.file:
+            # Decode incrementally (UTF-8 with optional BOM, latin-1 fallback) and load
+            summary = read_csv_stream(
+                job.file, lambda lines: load_amazon_csv(lines, profile, job.append, job.progress))
+        job.bytes_read = job.bytes_total
+        _record_profile(profile)
         
-        if len(PURCHASES) == 0:
-            return jsonify({
+        if not summary["has_header"]:
+            job.error = {"error": "CSV file is empty"}
+        elif not summary["items_added"] + summary["rows_duplicate"]:
+            job.error = {
                 "error": "No valid data found in CSV. Please check the file format.",
                 "hint": "Make sure your CSV has columns: order id, order date, price, description, etc."
-            }), 400
-        
-        return jsonify({
-            "message": "CSV uploaded successfully",
-            "total_items": len(PURCHASES),
-            "total_orders": len(ORDERS),
-            "date_range": {
-                "earliest": min(p['date'] for p in PURCHASES) if PURCHASES else None,
-                "latest": max(p['date'] for p in PURCHASES) if PURCHASES else None
             }
-        })
+        else:
+            job.result = {
+                "message": "CSV uploaded successfully",
+                "mode": "append" if job.append else "replace",
+                "items_added": summary["items_added"],
+                "duplicates_skipped": summary["rows_duplicate"],
+                "total_items": len(PURCHASES),
+                "total_orders": len(ORDERS),
+                "date_range": PURCHASES.stats.summary["date_range"],
+                "rejected": summary["rejected"]
+            }
+            if include_profile:
+                job.result["profile"] = profile.to_dict()
     
     except Exception as e:
-        import traceback
-        print("Upload error:")
-        print(traceback.format_exc())
-        return jsonify({"error": f"Error processing file: {str(e)}"}), 500
+        logger.exception("Upload error")
+        job.error = {"error": f"Error processing file: {str(e)}"}
+    
+    with job.lock:
+        job.finished_at = time.time()
+        job.status = 'failed' if job.error else 'done'
+        try:
+            job.save()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("Could not save upload job status: %s", e)
+
+@app.route('/api/upload/<job_id>', methods=['GET'])
+def upload_status(job_id):
+    """Progress of a background upload: rows processed and skipped, ETA, and the result once done
+
+    Jobs accepted by another worker are read from the shared backend.
+    """
+    job = UPLOAD_JOBS.get(job_id)
+    if job is not None:
+        return jsonify(job.to_dict())
+    job = DATASET_BACKEND.load_job(job_id) if DATASET_BACKEND is not None else None
+    if job is None:
+        return jsonify({"error": "Unknown upload job"}), 404
+    return jsonify(job)
+
+def _search_args():
+    """Read the search query parameters (None when date, or both amount and q, are missing).
+
+    Raises ValueError for an invalid date, amount, max_combo_items or
+    tolerance, or a ``q`` without a word to search for.
+    """
+    target_date = request.args.get('date')
+    target_amount = request.args.get('amount')
+    keywords = request.args.get('q', '').strip() or None
+    # A keyword search may leave out the amount
+    if not target_date or not (target_amount or keywords):
+        return None
+    
+    target_amount = parse_amount(target_amount) if target_amount else None
+    parse_date(target_date)
+    if keywords is not None and not _tokens(keywords):
+        raise ValueError("q has no searchable words")
+    max_combo_items = _max_combo_items(request.args.get('max_combo_items', 5, type=int))
+    
+    return {
+        "target_date": target_date,
+        "target_amount": target_amount,
+        "q": keywords,
+        "search_range_days": request.args.get('days_range', 7, type=int),
+        "search_type": request.args.get('search_type', 'all').lower(),
+        "max_combo_items": max_combo_items,
+        "time_budget_ms": min(request.args.get('time_budget_ms', COMBINATION_TIME_BUDGET_MS, type=int),
+                              MAX_COMBINATION_TIME_BUDGET_MS),
+        **_tolerance_args()
+    }
+
+def _max_combo_items(value: int) -> int:
+    """Check a max_combo_items option; raises ValueError outside 1..MAX_COMBO_ITEMS."""
+    if not 1 <= value <= MAX_COMBO_ITEMS:
+        raise ValueError(f"max_combo_items must be between 1 and {MAX_COMBO_ITEMS}")
+    return value
+
+def _tolerance_args() -> Dict:
+    """Read the tolerance query parameters.
+
+    Raises ValueError for one that isn't a finite number or is above its
+    limit: the cents of MAX_AMOUNT, or 100 percent.
+    """
+    args = {}
+    for name, parse, most in (('tolerance_cents', int, MAX_AMOUNT * 100), ('tolerance_pct', float, 100),
+                              ('tax_rate_min', float, 100), ('tax_rate_max', float, 100)):
+        value = request.args.get(name, '')
+        kind = "a whole number of cents" if parse is int else "a number"
+        try:
+            args[name] = parse(value) if value != '' else None
+        except ValueError:
+            raise ValueError(f"{name} must be {kind}") from None
+        if args[name] is not None and not (math.isfinite(args[name]) and args[name] <= most):
+            raise ValueError(f"{name} must be {kind} of at most {most:,}")
+    args['tolerance_cents'] = args['tolerance_cents'] or 0
+    args['tolerance_pct'] = args['tolerance_pct'] or 0.0
+    return args
+
+def _search_tolerance(query: Dict):
+    """Return the AmountTolerance a search query asks for, or None for exact matching."""
+    if query["target_amount"] is None:
+        return None
+    tolerance = AmountTolerance(query["tolerance_cents"], query["tolerance_pct"],
+                                query["tax_rate_min"], query["tax_rate_max"])
+    target_cents = to_cents(query["target_amount"])
+    return tolerance if tolerance.interval(target_cents) != (target_cents, target_cents) else None
+
+def _search_cache_key(query: Dict, tolerance) -> tuple:
+    # Equivalent queries (same day, cents, accepted amounts and options) share one cache entry
+    search_type = query["search_type"]
+    target_cents = to_cents(query["target_amount"]) if query["target_amount"] is not None else None
+    keywords = tuple(sorted(set(_tokens(query["q"])))) if query["q"] else None
+    return (
+        DATASET_VERSION, parse_day(query["target_date"]), target_cents,
+        tolerance.interval(target_cents) if tolerance else None, query["search_range_days"], search_type,
+        query["max_combo_items"] if search_type in ['combination', 'all'] and not keywords else None, keywords
+    )
+
+MATCH_LISTS = ("item_matches", "order_matches", "combination_matches", "shipment_matches")
+
+def _response_args(cache_key: tuple):
+    """Read the parameters shaping a search response: fields, limit, cursor and lean.
+
+    Raises ValueError for an invalid limit, or a cursor from another search
+    or an older dataset.
+    """
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+    limit = request.args.get('limit')
+    limit = int(limit) if limit else None
+    offsets = [0] * len(MATCH_LISTS)
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            check, cursor_limit, offsets = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            offsets = [int(offset) for offset in offsets]
+        except (ValueError, TypeError):
+            raise ValueError("Invalid cursor")
+        if check != _cursor_check(cache_key):
+            raise ValueError("Cursor is from a different search or an older dataset; search again")
+        limit = limit or cursor_limit
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be at least 1")
+    return {
+        "fields": [field for field in fields if not field.startswith('items.')],
+        "item_fields": [field[len('items.'):] for field in fields if field.startswith('items.')],
+        "limit": limit,
+        "offsets": offsets,
+        "lean": request.args.get('lean', '').lower() in ('1', 'true')
+    }
+
+def _cursor_check(cache_key: tuple) -> int:
+    # Ties a cursor to the search (and dataset version) that issued it
+    return zlib.crc32(repr(cache_key).encode('utf-8'))
+
+def _page_matches(results: Dict, cache_key: tuple, limit: int, offsets: list):
+    """Cut each match list in ``results`` to ``limit`` matches from its offset.
+
+    Sets ``next_cursor`` to the cursor of the next page, or None after the last.
+    """
+    next_offsets = []
+    more = False
+    for key, offset in zip(MATCH_LISTS, offsets):
+        matches = results[key]
+        results[key] = matches[offset:offset + limit]
+        next_offsets.append(min(offset + limit, len(matches)))
+        more = more or offset + limit < len(matches)
+    token = json.dumps([_cursor_check(cache_key), limit, next_offsets], separators=(',', ':')).encode('utf-8')
+    results["next_cursor"] = base64.urlsafe_b64encode(token).decode('ascii').rstrip('=') if more else None
+
+def _lean_matches(results: Dict):
+    """Replace the purchases in each match by their ids, listed once in ``results['purchases']``.
+
+    Item matches keep their ``id``; order, combination and shipment matches
+    get ``item_ids`` in place of ``items``.
+    """
+    purchase_keys = set(PurchaseRow.KEYS)
+    purchases = {}
+    # Item and order matches already hold whole purchases; combination items
+    # only some fields, so those are read from the store
+    for key in MATCH_LISTS:
+        lean = []
+        for match in results[key]:
+            items = match["items"] if "items" in match else [match]
+            for item in items:
+                if item["id"] not in purchases or item.keys() >= purchase_keys:
+                    purchases[item["id"]] = item
+            if "items" in match:
+                match = {k: v for k, v in match.items() if k != "items"}
+                match["item_ids"] = [item["id"] for item in items]
+            else:
+                match = {k: v for k, v in match.items() if k == "id" or k not in purchase_keys}
+            lean.append(match)
+        results[key] = lean
+    store = INDEX.store
+    results["purchases"] = {
+        str(i): {k: item[k] for k in PurchaseRow.KEYS} if item.keys() >= purchase_keys else store[i - 1].to_dict()
+        for i, item in sorted(purchases.items())
+    }
+
+def _project_matches(results: Dict, fields: list, item_fields: list):
+    """Keep only ``fields`` of each match and ``item_fields`` of the purchases inside them."""
+    def purchase(item: Dict) -> Dict:
+        return {k: item[k] for k in item_fields if k in item} if item_fields else item
+
+    for key in MATCH_LISTS:
+        projected = []
+        for match in results[key]:
+            kept = {k: match[k] for k in fields if k in match} if fields else dict(match)
+            if "items" in match and (item_fields or "items" in kept):
+                kept["items"] = [purchase(item) for item in match["items"]]
+            projected.append(kept)
+        results[key] = projected
+    if "purchases" in results and item_fields:
+        results["purchases"] = {i: purchase(item) for i, item in results["purchases"].items()}
+
+def _json_response(payload) -> Response:
+    """Encode ``payload`` with orjson, gzip-compressed when the client accepts it and it is large enough."""
+    body = orjson.dumps(payload)
+    response = Response(body, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if len(body) >= RESPONSE_COMPRESS_MIN_BYTES and request.accept_encodings['gzip'] > 0:
+        response.set_data(gzip.compress(body, RESPONSE_COMPRESS_LEVEL, mtime=0))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
 
 @app.route('/api/purchases/search', methods=['GET'])
+@_reads_dataset
 def search_purchases():
     """Search for purchases"""
     try:
-        target_date = request.args.get('date')
-        target_amount = request.args.get('amount')
-        days_range = request.args.get('days_range', 7, type=int)
-        search_type = request.args.get('search_type', 'all').lower()
-        max_combo_items = request.args.get('max_combo_items', 5, type=int)
+        try:
+            query = _search_args()
+            if query is None:
+                return jsonify({"error": "Missing parameters"}), 400
+            tolerance = _search_tolerance(query)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        if not target_date or not target_amount:
-            return jsonify({"error": "Missing parameters"}), 400
+        target_date = query["target_date"]
+        target_amount = query["target_amount"]
+        days_range = query["search_range_days"]
+        search_type = query["search_type"]
+        max_combo_items = query["max_combo_items"]
+        keywords = query["q"]
         
-        target_amount = float(target_amount)
-        parse_date(target_date)
+        profile = _request_profile()
         
         results = {
-            "query": {
-                "target_date": target_date,
-                "target_amount": target_amount,
-                "search_range_days": days_range,
-                "search_type": search_type,
-                "max_combo_items": max_combo_items
-            },
+            "query": query,
             "item_matches": [],
             "order_matches": [],
-            "combination_matches": []
+            "combination_matches": [],
+            "shipment_matches": []
         }
         
-        if search_type in ['item', 'all']:
-            results["item_matches"] = find_matching_items(target_date, target_amount, days_range)
+        cache_key = _search_cache_key(query, tolerance)
+        try:
+            shape = _response_args(cache_key)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        matches = SEARCH_CACHE.get(cache_key)
+        cache_hit = matches is not None
+        if not cache_hit:
+            matches = {}
+            
+            if search_type in ['item', 'all']:
+                matches["item_matches"] = find_matching_items(target_date, target_amount, days_range, tolerance,
+                                                              profile, keywords)
+            
+            if search_type in ['order', 'all']:
+                matches["order_matches"] = find_matching_orders(target_date, target_amount, days_range, tolerance,
+                                                                profile, keywords)
+            
+            # Combination search already covers shipments, so 'all' leaves them out;
+            # keyword searches cover single purchases and orders only
+            if search_type == 'shipment' and keywords is None:
+                matches["shipment_matches"] = find_matching_shipments(target_date, target_amount, days_range,
+                                                                      tolerance, profile)
+            
+            if search_type in ['combination', 'all'] and keywords is None:
+                (matches["combination_matches"], matches["combinations_exhaustive"],
+                 matches["combinations_truncated_reason"]) = search_combinations(
+                    target_date, target_amount, days_range, max_combo_items, SearchBudget(query["time_budget_ms"]),
+                    tolerance, profile
+                )
+            
+            # Results cut short by the time budget may differ next time, so aren't kept
+            if matches.get("combinations_exhaustive", True):
+                SEARCH_CACHE.put(cache_key, matches)
+        results.update(matches)
+        
+        results["total_matches"] = sum(len(results[key]) for key in MATCH_LISTS)
+        
+        with profile.phase('serialize'):
+            # Cached match lists are shared, so each step builds new lists and dicts
+            if shape["limit"] is not None:
+                _page_matches(results, cache_key, shape["limit"], shape["offsets"])
+            if shape["lean"]:
+                _lean_matches(results)
+            if shape["fields"] or shape["item_fields"]:
+                _project_matches(results, shape["fields"], shape["item_fields"])
+            response = _json_response(results)
+        _record_profile(profile, search_type)
+        if _profile_requested():
+            # The serialize phase is the time taken to encode the response without its profile
+            results["profile"] = {**profile.to_dict(), "cached": cache_hit}
+            response = _json_response(results)
+        return response
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _sse(event: str, data) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {orjson.dumps(data).decode('utf-8')}\n\n"
+
+@app.route('/api/purchases/search/stream', methods=['GET'])
+def stream_search_purchases():
+    """Search for purchases, streaming matches as server-sent events
+
+    Events: ``item_matches``, ``order_matches`` and ``shipment_matches`` (complete lists),
+    ``combination`` (a combination that entered the current top ten),
+    ``progress`` and finally ``done`` with the ranked combinations, whether
+    the search was exhaustive and, if not, its ``truncated_reason``. An
+    upload that changes the orders mid-search ends it with ``search_error``.
+    Closing the connection cancels the search.
+    """
+    try:
+        query = _search_args()
+        if query is None:
+            return jsonify({"error": "Missing parameters"}), 400
+        tolerance = _search_tolerance(query)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    target_date = query["target_date"]
+    target_amount = query["target_amount"]
+    days_range = query["search_range_days"]
+    search_type = query["search_type"]
+    keywords = query["q"]
+    budget = SearchBudget(query["time_budget_ms"])
+    cache_key = _search_cache_key(query, tolerance)
+    profile = _request_profile()
+    include_profile = _profile_requested()
+    
+    def events():
+        # Each step of the search runs under the read lock, which is released
+        # while the event goes out, so a slow client can't hold off uploads
+        steps = search_events()
+        version = cache_key[0]
+        try:
+            while True:
+                with DATASET_LOCK.reading():
+                    # Row numbers found so far belong to the dataset the search began on
+                    changed = DATASET_VERSION != version
+                    event = None if changed else next(steps, None)
+                if changed:
+                    yield _sse('search_error', {"error": "The orders changed during the search; search again"})
+                if event is None:
+                    return
+                yield event
+        finally:
+            steps.close()
+    
+    def search_events():
+        matches = SEARCH_CACHE.get(cache_key)
+        cached = matches is not None
+        if not cached:
+            matches = {}
+        try:
+            yield _sse('query', query)
+            
+            if search_type in ['item', 'all']:
+                if not cached:
+                    matches["item_matches"] = find_matching_items(target_date, target_amount, days_range, tolerance,
+                                                                  profile, keywords)
+                yield _sse('item_matches', matches["item_matches"])
+            
+            if search_type in ['order', 'all']:
+                if not cached:
+                    matches["order_matches"] = find_matching_orders(target_date, target_amount, days_range,
+                                                                    tolerance, profile, keywords)
+                yield _sse('order_matches', matches["order_matches"])
+            
+            if search_type == 'shipment' and keywords is None:
+                if not cached:
+                    matches["shipment_matches"] = find_matching_shipments(target_date, target_amount, days_range,
+                                                                          tolerance, profile)
+                yield _sse('shipment_matches', matches["shipment_matches"])
+            
+            if search_type in ['combination', 'all'] and keywords is None and not cached:
+                combinations = stream_combinations(target_date, target_amount, days_range, query["max_combo_items"],
+                                                   budget, tolerance, profile)
+                for event in combinations:
+                    if event[0] == 'match':
+                        yield _sse('combination', event[1])
+                    elif event[0] == 'progress':
+                        yield _sse('progress', {"scored": event[1], "elapsed_ms": budget.elapsed_ms()})
+                    else:
+                        (matches["combination_matches"], matches["combinations_exhaustive"],
+                         matches["combinations_truncated_reason"]) = event[1:]
+                if matches["combinations_exhaustive"]:
+                    SEARCH_CACHE.put(cache_key, matches)
+            elif not cached:
+                SEARCH_CACHE.put(cache_key, matches)
+            
+            combination_matches = matches.get("combination_matches", [])
+            done = {
+                "combination_matches": combination_matches,
+                "exhaustive": matches.get("combinations_exhaustive", True),
+                "truncated_reason": matches.get("combinations_truncated_reason"),
+                "total_matches": sum(len(matches.get(key, [])) for key in (
+                    "item_matches", "order_matches", "combination_matches", "shipment_matches")),
+                "elapsed_ms": budget.elapsed_ms()
+            }
+            _record_profile(profile, search_type)
+            if include_profile:
+                done["profile"] = {**profile.to_dict(), "cached": cached}
+            yield _sse('done', done)
+        except Exception as e:
+            yield _sse('search_error', {"error": str(e)})
+        finally:
+            # Reached via GeneratorExit when the client disconnects
+            budget.cancel()
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _json_transactions(transactions) -> List[Dict]:
+    """Read a JSON statement: a list of {date, amount} objects or [date, amount] pairs.
+
+    Raises ValueError for any other shape.
+    """
+    if not isinstance(transactions, list):
+        raise ValueError("expected a list of transactions")
+    parsed = []
+    for t in transactions:
+        if isinstance(t, list) and len(t) == 2:
+            t = {"date": t[0], "amount": t[1]}
+        if not isinstance(t, dict):
+            raise ValueError(f"expected {{date, amount}} or [date, amount], got {t!r}")
+        parsed.append(t)
+    return parsed
+
+@app.route('/api/reconcile', methods=['POST'])
+@_reads_dataset
+def reconcile():
+    """Match a whole statement of (date, amount) transactions in one call"""
+    try:
+        options = request.args
+        if request.is_json:
+            payload = request.get_json()
+            if isinstance(payload, dict):
+                options = {**request.args, **payload}
+                transactions = payload.get('transactions', [])
+            else:
+                transactions = payload
+            try:
+                transactions = _json_transactions(transactions)
+            except ValueError as e:
+                return jsonify({"error": f"Invalid transaction: {e}"}), 400
+        elif request.mimetype in ('text/csv', 'application/octet-stream'):
+            transactions = read_csv_stream(io.BytesIO(request.get_data()), parse_statement_csv)
+        elif 'file' in request.files:
+            transactions = read_csv_stream(request.files['file'].stream, parse_statement_csv)
+        else:
+            return jsonify({"error": "Provide a statement CSV or a JSON list of transactions"}), 400
         
-        if search_type in ['order', 'all']:
-            results["order_matches"] = find_matching_orders(target_date, target_amount, days_range)
+        if not transactions:
+            return jsonify({"error": "No transactions provided"}), 400
+        if len(transactions) > MAX_RECONCILE_TRANSACTIONS:
+            return jsonify({"error": f"At most {MAX_RECONCILE_TRANSACTIONS} transactions per request"}), 400
         
-        if search_type in ['combination', 'all']:
-            results["combination_matches"] = find_item_combinations(target_date, target_amount, days_range, max_combo_items)
+        try:
+            days_range = int(options.get('days_range', 7))
+            max_combo_items = _max_combo_items(int(options.get('max_combo_items', 3)))
+            time_budget_ms = float(options.get('time_budget_ms', RECONCILE_TIME_BUDGET_MS))
+            if not math.isfinite(time_budget_ms):
+                raise ValueError("time_budget_ms must be a number")
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid option: {e}"}), 400
+        assign = str(options.get('assign', 'false')).lower() in ('1', 'true', 'yes')
+        time_budget_ms = min(time_budget_ms, MAX_RECONCILE_TIME_BUDGET_MS)
         
-        results["total_matches"] = len(results["item_matches"]) + len(results["order_matches"]) + len(results["combination_matches"])
+        try:
+            results = reconcile_transactions(transactions, days_range, max_combo_items, assign, time_budget_ms)
+        except (KeyError, TypeError, ValueError, OverflowError) as e:
+            return jsonify({"error": f"Invalid transaction: {e}"}), 400
         
-        return jsonify(results)
+        return jsonify({
+            "query": {
+                "search_range_days": days_range,
+                "max_combo_items": max_combo_items,
+                "assign": assign,
+                "time_budget_ms": time_budget_ms
+            },
+            "results": results,
+            "summary": {
+                "transactions": len(results),
+                "matched": sum(1 for r in results if r["matches"]),
+                "assigned": sum(1 for r in results if r["assigned"] is not None),
+                "exhaustive": all(r["exhaustive"] for r in results)
+            }
+        })
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics (text exposition format) for this worker process"""
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+# Gzipped /api/dataset body of the dataset served: (DATASET_VERSION, etag, body)
+_DATASET_EXPORT = None
+
+def _encode_dataset() -> Dict:
+    """Return the loaded dataset as parallel columns, for searching it in the browser.
+
+    Per row: ``cents``, ``days`` (since 1970-01-01), ``orders`` (index into
+    the order columns) and ``descriptions`` (index into ``strings``, which
+    lists each distinct description once). Per order: ``order_ids``,
+    ``order_cents`` and ``order_days``. These are the fields match cards show.
+    """
+    epoch = date(1970, 1, 1).toordinal()
+    if INDEX is None:
+        columns = ("cents", "days", "orders", "descriptions", "strings", "order_ids", "order_cents", "order_days")
+        return {"version": DATASET_VERSION, **{name: [] for name in columns}}
+    store = INDEX.store
+    strings = {}
+    descriptions = [strings.setdefault(description, len(strings))
+                    for description in map(store.descriptions.__getitem__, range(len(store)))]
+    return {
+        "version": DATASET_VERSION,
+        "cents": store.cents.tolist(),
+        "days": [day - epoch for day in store.days],
+        "orders": store.order_idx.tolist(),
+        "descriptions": descriptions,
+        "strings": list(strings),
+        "order_ids": list(store.order_ids),
+        "order_cents": store.order_cents.tolist(),
+        "order_days": [day - epoch for day in store.order_days]
+    }
+
+@app.route('/api/dataset', methods=['GET'])
+@_reads_dataset
+def export_dataset():
+    """Serve the loaded dataset in compact columnar form (see _encode_dataset)
+
+    Encoded and compressed once per dataset version. Clients revalidate with
+    the ETag and get 304 Not Modified until the next upload.
+    """
+    global _DATASET_EXPORT
+    export = _DATASET_EXPORT
+    if export is None or export[0] != DATASET_VERSION:
+        body = gzip.compress(orjson.dumps(_encode_dataset()), DATASET_EXPORT_COMPRESS_LEVEL, mtime=0)
+        export = _DATASET_EXPORT = (DATASET_VERSION, f'{DATASET_VERSION}-{zlib.crc32(body):08x}', body)
+    _, etag, body = export
+    if request.accept_encodings['gzip'] > 0:
+        response = Response(body, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(gzip.decompress(body), mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Weak: the gzipped and plain bodies share it
+    response.set_etag(etag, weak=True)
+    return response.make_conditional(request)
+
+@app.route('/api/dataset', methods=['DELETE'])
+def delete_dataset():
+    """Delete the uploaded orders, from the shared store too when there is one"""
+    clear_dataset()
+    return jsonify({"message": "Dataset deleted", "dataset_version": DATASET_VERSION})
+
+def _dataset_stats() -> Dict:
+    """Statistics of the loaded dataset, gathered when it was loaded (see DatasetStats)"""
+    return (INDEX.store.stats if INDEX is not None else DatasetStats()).summary
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -346,9 +3785,25 @@ def health_check():
         "status": "healthy",
         "data_loaded": len(PURCHASES) > 0,
         "total_items": len(PURCHASES),
-        "total_orders": len(ORDERS)
+        "total_orders": len(ORDERS),
+        "dataset_store": DATASET_STORE,
+        "dataset_version": DATASET_VERSION,
+        "search_cache": SEARCH_CACHE.stats(),
+        "stats": _dataset_stats(),
+        "snapshot": {
+            "schema_version": SNAPSHOT_SCHEMA_VERSION,
+            "bytes": DATASET_BACKEND.size,
+            "age_seconds": round(time.time() - DATASET_BACKEND.created_at, 1),
+            "load_ms": DATASET_LOAD_MS
+        } if isinstance(DATASET_BACKEND, SnapshotDatasetBackend) and DATASET_BACKEND.created_at else None
     })
 
+@app.route('/api/stats', methods=['GET'])
+def dataset_stats():
+    """Date range, per-month totals, price histogram, order sizes and rejected rows of the loaded dataset"""
+    return jsonify({"dataset_version": DATASET_VERSION, **_dataset_stats()})
+
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     port = int(os.environ.get('PORT', 4333))
     app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
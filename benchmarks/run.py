@@ -0,0 +1,252 @@
+"""
+Benchmark harness for loading and searching order histories.
+
+For each dataset size it generates a synthetic export (see synthetic.py),
+then measures:
+
+* parse throughput of load_amazon_csv_from_string, and its peak traced
+  memory (in a second, tracemalloc-instrumented load)
+* latency percentiles of find_matching_items, find_matching_orders and
+  find_item_combinations over a fixed mix of hits and misses, for each
+  days_range (and max_combo_items for combinations)
+
+Results are written as JSON and compared with a stored baseline; any
+timing or memory metric more than --threshold above the baseline is
+reported and makes the run exit with status 1.
+
+Usage:
+    python benchmarks/run.py                       # 10k and 100k rows
+    python benchmarks/run.py --sizes 1000000 --queries 10
+    python benchmarks/run.py --update-baseline     # store this run as the baseline
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+from synthetic import generate_rows, to_csv  # noqa: E402
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def load(csv_text: str) -> float:
+    """Load ``csv_text`` into the app, returning the elapsed seconds."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        app.load_amazon_csv_from_string(csv_text)
+        return time.perf_counter() - started
+
+
+def measure_memory(csv_text: str) -> dict:
+    """Peak and retained traced memory of one load."""
+    app.install_dataset(app.PurchaseStore(), app.DATASET_VERSION + 1)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        with contextlib.redirect_stdout(io.StringIO()):
+            app.load_amazon_csv_from_string(csv_text)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"peak_memory_bytes": peak - before, "retained_bytes": retained - before}
+
+
+def build_queries(rows: list, count: int, seed: int) -> dict:
+    """Pick search targets from the generated rows: hits for each search type plus misses."""
+    rng = random.Random(seed)
+    items = [(row[2], float(row[6][1:])) for row in rows if not row[0].startswith("=")]
+    priced = [item for item in items if item[1] > 0]
+
+    order_totals = defaultdict(float)
+    order_dates = {}
+    for row in rows:
+        if not row[0].startswith("="):
+            order_totals[row[0]] += float(row[6][1:])
+            order_dates[row[0]] = row[2]
+    orders = [(order_dates[order_id], round(total, 2)) for order_id, total in order_totals.items() if total > 0]
+
+    # Combination targets: two or three items bought within a few days of each other
+    by_day = defaultdict(list)
+    for day, price in priced:
+        by_day[day].append(price)
+    days = sorted(by_day)
+
+    def combination():
+        anchor = rng.choice(days)
+        anchor_date = date.fromisoformat(anchor)
+        nearby = [
+            price
+            for offset in range(-3, 4)
+            for price in by_day.get((anchor_date + timedelta(days=offset)).isoformat(), [])
+        ]
+        return anchor, round(sum(rng.sample(nearby, min(len(nearby), rng.choice([2, 3])))), 2)
+
+    def miss():
+        return rng.choice(days), round(rng.uniform(1, 300), 2)
+
+    half = max(1, count // 2)
+    return {
+        "items": [rng.choice(priced) for _ in range(half)] + [miss() for _ in range(count - half)],
+        "orders": [rng.choice(orders) for _ in range(half)] + [miss() for _ in range(count - half)],
+        "combinations": [combination() for _ in range(half)] + [miss() for _ in range(count - half)],
+    }
+
+
+def percentiles(samples: list) -> dict:
+    ordered = sorted(samples)
+
+    def at(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+
+    return {
+        "queries": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered), 3),
+        "p50_ms": at(0.5),
+        "p90_ms": at(0.9),
+        "p99_ms": at(0.99),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def time_queries(search, queries: list) -> dict:
+    samples = []
+    for target_date, amount in queries:
+        started = time.perf_counter()
+        search(target_date, amount)
+        samples.append((time.perf_counter() - started) * 1000)
+    return percentiles(samples)
+
+
+def benchmark_size(size: int, args) -> dict:
+    rows = generate_rows(size, args.seed)
+    csv_text = to_csv(rows)
+    queries = build_queries(rows, args.queries, args.seed)
+
+    result = {"rows": size, "csv_bytes": len(csv_text.encode("utf-8"))}
+    if not args.skip_memory:
+        result["parse"] = measure_memory(csv_text)
+    else:
+        result["parse"] = {}
+
+    seconds = min(load(csv_text) for _ in range(args.repeat))
+    result["parse"].update({"seconds": round(seconds, 4), "rows_per_second": round(size / seconds)})
+
+    search = {}
+    for days_range in args.days:
+        search[f"items/days={days_range}"] = time_queries(
+            lambda d, a: app.find_matching_items(d, a, days_range), queries["items"])
+        search[f"orders/days={days_range}"] = time_queries(
+            lambda d, a: app.find_matching_orders(d, a, days_range), queries["orders"])
+        for max_items in args.max_items:
+            search[f"combinations/days={days_range}/max_items={max_items}"] = time_queries(
+                lambda d, a: app.find_item_combinations(d, a, days_range, max_items), queries["combinations"])
+    result["search"] = search
+    return result
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    """Flatten nested results to {"10000/search/items/days=7/p50_ms": value}."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}/{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        else:
+            flat[name] = value
+    return flat
+
+
+def compare(current: dict, baseline: dict, threshold: float, min_ms: float) -> list:
+    """Return (metric, baseline, current) for every metric that got worse by more than ``threshold``.
+
+    Only lower-is-better metrics (times and memory) are compared;
+    latency differences under ``min_ms`` are treated as noise.
+    """
+    current_flat = flatten(current["sizes"])
+    regressions = []
+    for metric, before in flatten(baseline["sizes"]).items():
+        after = current_flat.get(metric)
+        if after is None or not metric.endswith(("_ms", "seconds", "_bytes")) or metric.endswith("csv_bytes"):
+            continue
+        if metric.endswith("_ms") and after - before < min_ms:
+            continue
+        if after > before * (1 + threshold):
+            regressions.append((metric, before, after))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000", help="comma-separated row counts")
+    parser.add_argument("--days", default="3,7,14", help="comma-separated days_range values")
+    parser.add_argument("--max-items", default="2,3,5", help="comma-separated max_combo_items values")
+    parser.add_argument("--queries", type=int, default=30, help="searches per measurement (half hits, half misses)")
+    parser.add_argument("--repeat", type=int, default=3, help="loads per size; the fastest is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-memory", action="store_true", help="skip the tracemalloc load")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="write this run to --baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, as a fraction")
+    parser.add_argument("--min-ms", type=float, default=0.5, help="ignore latency changes smaller than this")
+    args = parser.parse_args(argv)
+    args.days = [int(value) for value in args.days.split(",")]
+    args.max_items = [int(value) for value in args.max_items.split(",")]
+
+    results = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "queries": args.queries,
+        },
+        "sizes": {},
+    }
+    for size in (int(value) for value in args.sizes.split(",")):
+        print(f"Benchmarking {size} rows...", file=sys.stderr)
+        results["sizes"][str(size)] = result = benchmark_size(size, args)
+        parse = result["parse"]
+        print(f"  parse: {parse['seconds']:.3f}s ({parse['rows_per_second']} rows/s), "
+              f"peak memory {parse.get('peak_memory_bytes', 0) / 1e6:.1f} MB", file=sys.stderr)
+        for name, stats in result["search"].items():
+            print(f"  {name}: p50 {stats['p50_ms']} ms, p99 {stats['p99_ms']} ms", file=sys.stderr)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Updated baseline {args.baseline}", file=sys.stderr)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against (run with --update-baseline)", file=sys.stderr)
+        return 0
+
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.threshold, args.min_ms)
+    for metric, before, after in regressions:
+        print(f"REGRESSION {metric}: {before} -> {after}", file=sys.stderr)
+    if not regressions:
+        print("No regressions against the baseline", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Deterministic synthetic Amazon order-history exports.
+
+Produces CSVs in the Amazon Order History Reporter layout with the quirks
+real exports have: multi-item orders, popular and repeated prices,
+re-ordered products, zero-price lines, quantities above one, quoted
+descriptions with commas or non-ASCII text, and "=" subtotal rows.
+The same (items, seed) always yields byte-identical output.
+
+Usage: python benchmarks/synthetic.py 100000 > orders.csv
+"""
+
+import csv
+import io
+import random
+import string
+import sys
+from datetime import date, timedelta
+from typing import List
+
+
+HEADER = ["order id", "order url", "order date", "quantity", "description",
+          "item url", "price", "subscribe & save", "ASIN"]
+
+# Prices that show up again and again across real histories
+COMMON_PRICES = [0.99, 2.99, 4.99, 5.99, 7.99, 9.99, 12.99, 14.99, 15.99, 19.99,
+                 24.99, 29.99, 34.99, 39.99, 49.99]
+
+# Share of items at a zero price (free add-ons, promotions)
+ZERO_PRICE_RATE = 0.02
+# Share of items taken from COMMON_PRICES rather than a random price
+COMMON_PRICE_RATE = 0.4
+# Share of items that re-order a product bought earlier (same ASIN and price)
+REORDER_RATE = 0.15
+# Share of orders followed by an "=" subtotal row
+SUBTOTAL_ROW_RATE = 0.03
+# Weights for orders of 1, 2, ... 8 items
+ORDER_SIZE_WEIGHTS = [50, 22, 12, 7, 4, 2, 2, 1]
+
+ADJECTIVES = ["Wireless", "Stainless", "Organic", "Compact", "Heavy Duty", "Kids'", "Premium",
+              "Replacement", "Waterproof", "Café", "Adjustable", "Rechargeable", "Mini", "XL"]
+NOUNS = ["Charger", "Water Bottle", "Coffee Beans", "Desk Lamp", "Phone Case", "Notebook",
+         "Batteries (24 Pack)", "Dog Treats", "Yoga Mat", "HDMI Cable", "Paper Towels",
+         "Screwdriver Set", "Vitamin D3", "Headphones", "Storage Bins"]
+SUFFIXES = ["", "", "", ", Black", ", 2-Pack", ' 12"', " - Large", " (Renewed)", ", Blue/Green"]
+
+
+def _asin(rng: random.Random) -> str:
+    return "B0" + "".join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(8))
+
+
+def _order_id(rng: random.Random) -> str:
+    return f"1{rng.randint(10, 14)}-{rng.randint(0, 9999999):07d}-{rng.randint(0, 9999999):07d}"
+
+
+def _price(rng: random.Random) -> float:
+    roll = rng.random()
+    if roll < ZERO_PRICE_RATE:
+        return 0.0
+    if roll < ZERO_PRICE_RATE + COMMON_PRICE_RATE:
+        return rng.choice(COMMON_PRICES)
+    return round(min(500.0, max(0.5, rng.lognormvariate(3.0, 0.9))), 2)
+
+
+def generate_rows(items: int, seed: int = 0, end: date = date(2025, 12, 31), days: int = 730) -> List[List[str]]:
+    """Return the data rows (without header) of an export with ``items`` purchase lines.
+
+    Orders are spread uniformly over the ``days`` days ending at ``end`` and
+    listed newest first, as the exports are. Subtotal rows come on top of
+    the ``items`` purchase lines.
+    """
+    rng = random.Random(seed)
+    orders = []
+    products = []
+    remaining = items
+
+    while remaining > 0:
+        size = min(remaining, rng.choices(range(1, len(ORDER_SIZE_WEIGHTS) + 1), ORDER_SIZE_WEIGHTS)[0])
+        remaining -= size
+        order_id = _order_id(rng)
+        order_date = end - timedelta(days=rng.randrange(days))
+
+        lines = []
+        for _ in range(size):
+            if products and rng.random() < REORDER_RATE:
+                asin, description, price = rng.choice(products)
+            else:
+                asin = _asin(rng)
+                description = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}{rng.choice(SUFFIXES)}"
+                price = _price(rng)
+                products.append((asin, description, price))
+            quantity = 1 if rng.random() < 0.9 else rng.randint(2, 4)
+            lines.append((asin, description, price, quantity))
+        orders.append((order_date, order_id, lines))
+
+    orders.sort(key=lambda order: order[0], reverse=True)
+
+    rows = []
+    for order_date, order_id, lines in orders:
+        order_url = f"https://www.amazon.com/gp/your-account/order-details?orderID={order_id}"
+        for asin, description, price, quantity in lines:
+            rows.append([
+                order_id, order_url, order_date.isoformat(), str(quantity), description,
+                f"https://www.amazon.com/dp/{asin}", f"${price:.2f}",
+                "1" if rng.random() < 0.05 else "0", asin,
+            ])
+        if rng.random() < SUBTOTAL_ROW_RATE:
+            rows.append(["=SUBTOTAL", "", "", "", "", "", "", "", ""])
+    rows.append(["=TOTAL", "", "", "", "", "", "", "", ""])
+    return rows
+
+
+def to_csv(rows: List[List[str]]) -> str:
+    """Render rows (header added) as CSV text."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(HEADER)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def generate_csv(items: int, seed: int = 0) -> str:
+    """Return a complete synthetic export with ``items`` purchase lines."""
+    return to_csv(generate_rows(items, seed))
+
+
+if __name__ == "__main__":
+    sys.stdout.write(generate_csv(int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+                                  int(sys.argv[2]) if len(sys.argv) > 2 else 0))
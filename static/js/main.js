@@ -11,40 +11,98 @@ const env = nunjucks.configure("/static/templates", {
 
 let dataLoaded = false;
 
+// How often to poll a background upload job for progress
+const UPLOAD_POLL_MS = 500;
+
+function formatUploadProgress(job) {
+  if (job.status === "queued") return "⏳ Waiting for the previous upload...";
+  const percent = Math.round(job.progress * 100);
+  const eta = job.eta_seconds != null ? `, about ${Math.ceil(job.eta_seconds)}s left` : "";
+  return `⏳ Processing... ${percent}% (${job.rows_processed.toLocaleString()} rows${eta})`;
+}
+
+// Poll an upload job until it finishes; resolves with its result
+async function waitForUpload(statusUrl) {
+  while (true) {
+    const response = await fetch(statusUrl);
+    const job = await response.json();
+    if (!response.ok) throw new Error(job.error || "Upload failed");
+    if (job.status === "done") return job.result;
+    if (job.status === "failed") throw new Error(job.error || "Upload failed");
+    document.getElementById("dataStatus").textContent = formatUploadProgress(job);
+    await new Promise((resolve) => setTimeout(resolve, UPLOAD_POLL_MS));
+  }
+}
+
 document
   .getElementById("csvFile")
   .addEventListener("change", async (e) => {
     const file = e.target.files[0];
     if (!file) return;
 
-    const formData = new FormData();
-    formData.append("file", file);
-
-    document.getElementById("dataStatus").textContent = "⏳ Processing...";
+    document.getElementById("dataStatus").textContent = "⏳ Uploading...";
+    const append = document.getElementById("appendUpload").checked;
+    // Let the same file be picked again (e.g. after appending a newer export)
+    e.target.value = "";
 
     try {
-      const response = await fetch("/api/upload", {
+      // Send the raw file; the server loads it in the background
+      const response = await fetch(append ? "/api/upload?mode=append" : "/api/upload", {
         method: "POST",
-        body: formData,
+        headers: { "Content-Type": "text/csv" },
+        body: file,
       });
 
-      const data = await response.json();
-
-      if (response.ok) {
-        dataLoaded = true;
-        document.getElementById("uploadSection").classList.add("loaded");
-        document.getElementById("dataStatus").textContent =
-          `✅ Loaded ${data.total_items} items from ${data.total_orders} orders`;
-        document.getElementById("searchForm").classList.add("active");
-        document.getElementById("date").valueAsDate = new Date();
-      } else {
-        throw new Error(data.error || "Upload failed");
+      const job = await response.json();
+      if (!response.ok) {
+        throw new Error(job.error || "Upload failed");
       }
+      const data = await waitForUpload(job.status_url);
+
+      dataLoaded = true;
+      document.getElementById("uploadSection").classList.add("loaded");
+      document.getElementById("dataStatus").textContent =
+        data.mode === "append"
+          ? `✅ Added ${data.items_added} new items (${data.duplicates_skipped} already loaded), ` +
+            `${data.total_items} items from ${data.total_orders} orders in total`
+          : `✅ Loaded ${data.total_items} items from ${data.total_orders} orders`;
+      document.getElementById("searchForm").classList.add("active");
+      document.getElementById("date").valueAsDate = new Date();
+      searchWorker?.postMessage({ type: "reload" });
     } catch (error) {
       document.getElementById("dataStatus").textContent = `❌ ${error.message}`;
     }
   });
 
+// EventSource of the streaming search in progress, if any
+let activeSearch = null;
+// Bumped by every search and cancel, so a late in-browser result is dropped
+let searchGeneration = 0;
+
+// Worker that searches a downloaded copy of the dataset, started on first use
+let searchWorker = null;
+let workerRequests = 0;
+const pendingWorkerSearches = new Map();
+
+// Search in the browser; resolves with the results, or null if the server must run it
+function localSearch(query) {
+  if (!searchWorker) {
+    searchWorker = new Worker(new URL("./searchWorker.js", import.meta.url), { type: "module" });
+    searchWorker.addEventListener("message", (e) => {
+      const { id, results, error } = e.data;
+      const resolve = pendingWorkerSearches.get(id);
+      pendingWorkerSearches.delete(id);
+      // On error, fall back to the server
+      resolve?.(error ? null : results);
+    });
+  }
+  const id = ++workerRequests;
+  return new Promise((resolve) => {
+    pendingWorkerSearches.set(id, resolve);
+    searchWorker.postMessage({ type: "search", id, query });
+  });
+}
+
 async function searchPurchases() {
   if (!dataLoaded) {
     alert("Please upload a CSV file first!");
@@ -55,18 +113,46 @@ async function searchPurchases() {
   const amount = document.getElementById("amount").value;
   const days_range = document.getElementById("days_range").value;
   const max_combo = document.getElementById("max_combo").value;
+  const tolerance_cents = Math.round((parseFloat(document.getElementById("tolerance").value) || 0) * 100);
   const search_type = document.querySelector(
     'input[name="search_type"]:checked'
   ).value;
 
+  // A new search replaces any that is still running
+  cancelSearch();
+
+  document.getElementById("loadingText").textContent = "🔍 Searching...";
   document.getElementById("loading").classList.add("active");
   document.getElementById("results").classList.remove("active");
   document.getElementById("error").classList.remove("active");
 
+  if (document.getElementById("browserSearch").checked && window.Worker) {
+    const generation = searchGeneration;
+    const results = await localSearch({
+      date,
+      amount: parseFloat(amount),
+      days_range: parseInt(days_range, 10),
+      search_type,
+      max_combo_items: parseInt(max_combo, 10),
+      tolerance_cents,
+    });
+    if (generation !== searchGeneration) return;
+    if (results) {
+      document.getElementById("loading").classList.remove("active");
+      displayResults(results);
+      return;
+    }
+  }
+
+  const query = `date=${date}&amount=${amount}&days_range=${days_range}&search_type=${search_type}&max_combo_items=${max_combo}&tolerance_cents=${tolerance_cents}`;
+
+  if (window.EventSource) {
+    streamSearch(query);
+    return;
+  }
+
   try {
-    const response = await fetch(
-      `/api/purchases/search?date=${date}&amount=${amount}&days_range=${days_range}&search_type=${search_type}&max_combo_items=${max_combo}`
-    );
+    const response = await fetch(`/api/purchases/search?${query}`);
 
     const data = await response.json();
     document.getElementById("loading").classList.remove("active");
@@ -75,15 +161,92 @@ async function searchPurchases() {
 
     displayResults(data);
   } catch (error) {
-    document.getElementById("loading").classList.remove("active");
-    const errorDiv = document.getElementById("error");
-    errorDiv.textContent = error.message;
-    errorDiv.classList.add("active");
+    showError(error.message);
   }
 }
 
-// Make searchPurchases available globally for the onclick handler
+function streamSearch(query) {
+  const source = new EventSource(`/api/purchases/search/stream?${query}`);
+  activeSearch = source;
+
+  const data = { item_matches: [], order_matches: [], shipment_matches: [], combination_matches: [] };
+  const totalMatches = () =>
+    data.item_matches.length + data.order_matches.length + data.shipment_matches.length +
+    data.combination_matches.length;
+
+  // Matches arrive as they are found; show what we have so far
+  const showPartial = () => displayResults({ ...data, total_matches: totalMatches() });
+
+  source.addEventListener("item_matches", (e) => {
+    data.item_matches = JSON.parse(e.data);
+    showPartial();
+  });
+  source.addEventListener("order_matches", (e) => {
+    data.order_matches = JSON.parse(e.data);
+    showPartial();
+  });
+  source.addEventListener("shipment_matches", (e) => {
+    data.shipment_matches = JSON.parse(e.data);
+    showPartial();
+  });
+  source.addEventListener("combination", (e) => {
+    // Keep the current top ten; the sort is stable so ties stay in discovery order
+    data.combination_matches.push(JSON.parse(e.data));
+    data.combination_matches.sort((a, b) => b.probability_score - a.probability_score);
+    data.combination_matches.splice(10);
+    showPartial();
+  });
+  source.addEventListener("progress", (e) => {
+    const progress = JSON.parse(e.data);
+    document.getElementById("loadingText").textContent =
+      `🔍 Searching... ${progress.scored.toLocaleString()} combinations checked`;
+  });
+  source.addEventListener("done", (e) => {
+    const final = JSON.parse(e.data);
+    finishSearch(source);
+    displayResults({
+      ...data,
+      combination_matches: final.combination_matches,
+      combinations_exhaustive: final.exhaustive,
+      combinations_truncated_reason: final.truncated_reason,
+      total_matches: final.total_matches,
+    });
+  });
+  source.addEventListener("search_error", (e) => {
+    finishSearch(source);
+    showError(JSON.parse(e.data).error);
+  });
+  source.onerror = () => {
+    // Without this the browser would reconnect and restart the search
+    if (activeSearch === source) {
+      finishSearch(source);
+      showError("Search connection lost");
+    }
+  };
+}
+
+function finishSearch(source) {
+  source.close();
+  if (activeSearch === source) activeSearch = null;
+  document.getElementById("loading").classList.remove("active");
+}
+
+function cancelSearch() {
+  searchGeneration++;
+  if (activeSearch) finishSearch(activeSearch);
+  document.getElementById("loading").classList.remove("active");
+}
+
+function showError(message) {
+  document.getElementById("loading").classList.remove("active");
+  const errorDiv = document.getElementById("error");
+  errorDiv.textContent = message;
+  errorDiv.classList.add("active");
+}
+
+// Make searchPurchases and cancelSearch available globally for the onclick handlers
 window.searchPurchases = searchPurchases;
+window.cancelSearch = cancelSearch;
 
 function displayResults(data) {
   const resultsDiv = document.getElementById("results");
@@ -92,10 +255,14 @@ function displayResults(data) {
   const templateData = {
     hasItemMatches: data.item_matches?.length > 0,
     hasOrderMatches: data.order_matches?.length > 0,
+    hasShipments: data.shipment_matches?.length > 0,
     hasCombinations: data.combination_matches?.length > 0,
     noMatches: data.total_matches === 0,
+    incomplete: data.combinations_exhaustive === false,
+    truncatedReason: data.combinations_truncated_reason,
     item_matches: data.item_matches?.map(enrichMatch),
     order_matches: data.order_matches?.map(enrichMatch),
+    shipment_matches: data.shipment_matches?.map(enrichMatch),
     combination_matches: data.combination_matches?.map(enrichMatch)
   };
 
@@ -0,0 +1,35 @@
+import { decodeDataset, searchDataset } from "./utils/localSearch.js";
+
+// Last decoded dataset and its ETag
+let dataset = null;
+let etag = null;
+// Pending /api/dataset fetch, if the dataset is missing or may be out of date
+let loading = null;
+
+async function loadDataset() {
+  const response = await fetch("/api/dataset", { headers: etag ? { "If-None-Match": etag } : {} });
+  if (response.status === 304) return dataset;
+  if (!response.ok) throw new Error("Could not load the dataset");
+  const data = await response.json();
+  etag = response.headers.get("ETag");
+  dataset = decodeDataset(data);
+  return dataset;
+}
+
+self.addEventListener("message", async (e) => {
+  const message = e.data;
+  if (message.type === "reload") {
+    // An upload finished; revalidate before the next search
+    loading = null;
+    return;
+  }
+  if (message.type !== "search") return;
+  if (!loading) loading = loadDataset();
+  try {
+    const results = searchDataset(await loading, message.query);
+    self.postMessage({ id: message.id, results });
+  } catch (error) {
+    loading = null;
+    self.postMessage({ id: message.id, error: error.message });
+  }
+});
@@ -22,6 +22,16 @@ export function formatDaysText(days_from_target) {
   return `${days_from_target}d after`;
 }
 
+/**
+ * Format how far a tolerance match is from the searched amount
+ * @param {number} amount_difference - Match amount minus target amount
+ * @returns {string} Formatted text like "$0.50 over", "$1.25 under"
+ */
+export function formatAmountDifference(amount_difference) {
+  const text = `$${formatAmount(Math.abs(amount_difference))}`;
+  return amount_difference > 0 ? `${text} over` : `${text} under`;
+}
+
 /**
  * Get CSS class based on probability score
  * @param {number} probability_score - Probability score (0-100)
@@ -73,6 +83,11 @@ export function enrichMatch(match, index) {
     enriched.daysText = formatDaysText(match.days_from_target);
   }
 
+  // Tolerance matches that are not exact say how far off they are
+  if (match.amount_difference) {
+    enriched.amountDiffText = formatAmountDifference(match.amount_difference);
+  }
+
   // Add probability classes for combinations
   if (match.probability_score !== undefined) {
     enriched.probClass = addProbabilityClass(match.probability_score);
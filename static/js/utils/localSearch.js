@@ -0,0 +1,280 @@
+/**
+ * In-browser search over the compact dataset served by /api/dataset
+ *
+ * Item, order and combination searches give the same matches, in the same
+ * shape, as /api/purchases/search, so enrichMatch and the match-card
+ * template render them unchanged.
+ */
+
+// Combination searches over more subsets than this are left to the server
+export const LOCAL_COMBINATION_LIMIT = 200000;
+
+// Mirror the server's candidate window (MAX_COMBINATION_CANDIDATES, COMBINATION_TABLE_BITS)
+const MAX_COMBINATION_CANDIDATES = 1000;
+const COMBINATION_TABLE_BITS = 256 * 1024 * 1024;
+
+const DAY_MS = 86400000;
+
+/**
+ * Round like Python's round(), which sends exact halves to the even neighbour
+ * @param {number} value - Number to round
+ * @param {number} digits - Decimal places to keep
+ * @returns {number} Rounded number
+ */
+export function roundHalfEven(value, digits) {
+  const scale = 10 ** digits;
+  const scaled = value * scale;
+  const floor = Math.floor(scaled);
+  if (scaled - floor === 0.5 && (floor + 0.5) / scale === value) {
+    return (floor % 2 === 0 ? floor : floor + 1) / scale;
+  }
+  return Number(value.toFixed(digits));
+}
+
+/**
+ * Convert a YYYY-MM-DD date to days since 1970-01-01
+ * @param {string} date - Date string
+ * @returns {number} Day number
+ */
+export function dayNumber(date) {
+  return Math.round(Date.parse(date) / DAY_MS);
+}
+
+/**
+ * Convert days since 1970-01-01 to a YYYY-MM-DD date
+ * @param {number} day - Day number
+ * @returns {string} Date string
+ */
+export function dateString(day) {
+  return new Date(day * DAY_MS).toISOString().slice(0, 10);
+}
+
+/**
+ * Score a match from its items' day offsets, like the server's _probability_from_days
+ * @param {number[]} absDaysDiffs - Absolute day offset of each item
+ * @param {number} orderCount - Number of distinct orders
+ * @param {number} amountDiff - Distance from the target in cents
+ * @param {number} allowance - Largest distance the tolerance accepts, in cents
+ * @returns {number} Probability score (0-100)
+ */
+export function probabilityFromDays(absDaysDiffs, orderCount, amountDiff = 0, allowance = 0) {
+  const avgDaysDiff = absDaysDiffs.reduce((sum, days) => sum + days, 0) / absDaysDiffs.length;
+  const dateScore = Math.max(0, 1 - avgDaysDiff / 14) * 50;
+  let score = dateScore + (orderCount === 1 ? 50 : 0);
+  if (allowance) {
+    score *= 1 - 0.5 * Math.min(1, amountDiff / allowance);
+  }
+  return roundHalfEven(score, 2);
+}
+
+/**
+ * Prepare a /api/dataset response for searching
+ * @param {Object} data - Parsed /api/dataset JSON
+ * @returns {Object} The columns plus rows sorted by day and each order's rows
+ */
+export function decodeDataset(data) {
+  const byDay = data.days.map((_, i) => i).sort((a, b) => data.days[a] - data.days[b] || a - b);
+  const orderRows = data.order_ids.map(() => []);
+  data.orders.forEach((order, i) => orderRows[order].push(i));
+  return { ...data, byDay, dayKeys: byDay.map((i) => data.days[i]), orderRows };
+}
+
+function lowerBound(keys, value) {
+  let lo = 0;
+  let hi = keys.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (keys[mid] < value) lo = mid + 1;
+    else hi = mid;
+  }
+  return lo;
+}
+
+// Rows dated within [startDay, endDay], in (day, id) order
+function windowRows(dataset, startDay, endDay) {
+  return dataset.byDay.slice(lowerBound(dataset.dayKeys, startDay), lowerBound(dataset.dayKeys, endDay + 1));
+}
+
+function purchase(dataset, i) {
+  return {
+    id: i + 1,
+    order_id: dataset.order_ids[dataset.orders[i]],
+    date: dateString(dataset.days[i]),
+    amount: dataset.cents[i] / 100,
+    description: dataset.strings[dataset.descriptions[i]],
+  };
+}
+
+function compareKeys(a, b) {
+  for (let k = 0; k < 4; k++) {
+    if (a[k] !== b[k]) return a[k] < b[k] ? -1 : 1;
+  }
+  const [x, y] = [a[4], b[4]];
+  for (let k = 0; k < Math.min(x.length, y.length); k++) {
+    if (x[k] !== y[k]) return x[k] - y[k];
+  }
+  return x.length - y.length;
+}
+
+function subsetCount(n, maxItems) {
+  let total = 0;
+  let ways = 1;
+  for (let size = 1; size <= Math.min(n, maxItems); size++) {
+    ways = (ways * (n - size + 1)) / size;
+    total += ways;
+  }
+  return total;
+}
+
+function searchItems(dataset, search) {
+  const { targetDay, targetCents, low, high, tolerant, allowance, date } = search;
+  const matches = [];
+  for (const i of windowRows(dataset, targetDay - search.daysRange, targetDay + search.daysRange)) {
+    const cents = dataset.cents[i];
+    if (cents < low || cents > high) continue;
+    const match = { ...purchase(dataset, i), days_from_target: dataset.days[i] - targetDay, target_date: date,
+      search_type: "item" };
+    if (tolerant) {
+      match.amount_difference = (cents - targetCents) / 100;
+      match.probability_score = probabilityFromDays([Math.abs(match.days_from_target)], 1,
+        Math.abs(cents - targetCents), allowance);
+    }
+    matches.push(match);
+  }
+  matches.sort((a, b) => a.id - b.id);
+  // Stable sort: equally likely matches stay in load order
+  if (tolerant) matches.sort((a, b) => b.probability_score - a.probability_score);
+  return matches;
+}
+
+function searchOrders(dataset, search) {
+  const { targetDay, targetCents, low, high, tolerant, allowance, date } = search;
+  const matches = [];
+  dataset.order_ids.forEach((orderId, o) => {
+    const cents = dataset.order_cents[o];
+    const daysFromTarget = dataset.order_days[o] - targetDay;
+    if (cents < low || cents > high || Math.abs(daysFromTarget) > search.daysRange) return;
+    const match = {
+      order_id: orderId,
+      date: dateString(dataset.order_days[o]),
+      total: cents / 100,
+      item_count: dataset.orderRows[o].length,
+      items: dataset.orderRows[o].map((i) => purchase(dataset, i)),
+      days_from_target: daysFromTarget,
+      target_date: date,
+      search_type: "order",
+    };
+    if (tolerant) {
+      match.amount_difference = (cents - targetCents) / 100;
+      match.probability_score = probabilityFromDays([Math.abs(daysFromTarget)], 1, Math.abs(cents - targetCents),
+        allowance);
+    }
+    matches.push(match);
+  });
+  if (tolerant) matches.sort((a, b) => b.probability_score - a.probability_score);
+  return matches;
+}
+
+// The ten best combinations, or null when there are too many to try here
+function searchCombinations(dataset, search) {
+  const { targetDay, targetCents, low, high, tolerant, allowance, maxItems } = search;
+  const candidates = windowRows(dataset, targetDay - search.daysRange, targetDay + search.daysRange)
+    .filter((i) => dataset.cents[i] > 0 && dataset.cents[i] <= high)
+    .sort((a, b) => Math.abs(dataset.days[a] - targetDay) - Math.abs(dataset.days[b] - targetDay) || a - b);
+  const limit = Math.max(50, Math.min(MAX_COMBINATION_CANDIDATES,
+    Math.floor(COMBINATION_TABLE_BITS / ((maxItems + 1) * (high + 1)))));
+  const exhaustive = candidates.length <= limit;
+  candidates.splice(limit);
+  if (subsetCount(candidates.length, maxItems) > LOCAL_COMBINATION_LIMIT) return null;
+
+  const cents = candidates.map((i) => dataset.cents[i]);
+  const absDiffs = candidates.map((i) => Math.abs(dataset.days[i] - targetDay));
+  const best = [];
+  const chosen = [];
+  const visit = (start, total) => {
+    for (let p = start; p < candidates.length; p++) {
+      const sum = total + cents[p];
+      if (sum > high) continue;
+      chosen.push(p);
+      if (sum >= low) {
+        const orderCount = new Set(chosen.map((q) => dataset.orders[candidates[q]])).size;
+        const distance = Math.abs(sum - targetCents);
+        const probability = probabilityFromDays(chosen.map((q) => absDiffs[q]), orderCount, distance, allowance);
+        const entry = [-probability, chosen.length, distance, sum, [...chosen]];
+        if (best.length < 10 || compareKeys(entry, best[best.length - 1]) < 0) {
+          const at = best.findIndex((other) => compareKeys(entry, other) < 0);
+          best.splice(at === -1 ? best.length : at, 0, entry);
+          best.splice(10);
+        }
+      }
+      if (chosen.length < maxItems) visit(p + 1, sum);
+      chosen.pop();
+    }
+  };
+  visit(0, 0);
+
+  const matches = best.map(([negProbability, , , total, positions]) => {
+    const items = positions.map((p) => ({
+      ...purchase(dataset, candidates[p]),
+      days_from_target: dataset.days[candidates[p]] - targetDay,
+    }));
+    const orderIds = [...new Set(items.map((item) => item.order_id))];
+    const match = {
+      items,
+      total_amount: total / 100,
+      item_count: items.length,
+      avg_days_from_target: roundHalfEven(
+        items.reduce((sum, item) => sum + Math.abs(item.days_from_target), 0) / items.length, 1),
+      probability_score: -negProbability,
+      same_order: orderIds.length === 1,
+      order_ids: orderIds,
+      search_type: "combination",
+    };
+    if (tolerant) match.amount_difference = (total - targetCents) / 100;
+    return match;
+  });
+  return { matches, exhaustive };
+}
+
+/**
+ * Search a decoded dataset like /api/purchases/search
+ * @param {Object} dataset - Result of decodeDataset
+ * @param {Object} query - date, amount, days_range, search_type, max_combo_items and tolerance_cents
+ * @returns {Object|null} The search response fields, or null for searches (or input) the server must handle
+ */
+export function searchDataset(dataset, query) {
+  const searchType = query.search_type || "all";
+  if (!["all", "item", "order", "combination"].includes(searchType)) return null;
+  // Let the server report invalid input
+  if (!Number.isFinite(query.amount) || Number.isNaN(dayNumber(query.date))) return null;
+  const targetCents = Math.round(query.amount * 100);
+  const slack = query.tolerance_cents || 0;
+  const low = Math.max(targetCents - slack, 0);
+  const high = targetCents + slack;
+  const search = {
+    date: query.date,
+    targetDay: dayNumber(query.date),
+    targetCents,
+    daysRange: Number.isInteger(query.days_range) ? query.days_range : 7,
+    maxItems: Number.isInteger(query.max_combo_items) ? query.max_combo_items : 5,
+    low,
+    high,
+    tolerant: slack > 0,
+    allowance: Math.max(high - targetCents, targetCents - low),
+  };
+
+  const results = { item_matches: [], order_matches: [], combination_matches: [], shipment_matches: [] };
+  if (["all", "combination"].includes(searchType)) {
+    const combinations = targetCents > 0 ? searchCombinations(dataset, search) : { matches: [], exhaustive: true };
+    if (combinations === null) return null;
+    results.combination_matches = combinations.matches;
+    results.combinations_exhaustive = combinations.exhaustive;
+    // Searches here have no time limit, so only the candidate cap can cut them short
+    results.combinations_truncated_reason = combinations.exhaustive ? null : "candidates";
+  }
+  if (["all", "item"].includes(searchType)) results.item_matches = searchItems(dataset, search);
+  if (["all", "order"].includes(searchType)) results.order_matches = searchOrders(dataset, search);
+  results.total_matches = results.item_matches.length + results.order_matches.length +
+    results.combination_matches.length;
+  return results;
+}
@@ -0,0 +1,23 @@
+"""
+Shared fixtures for the test suite.
+"""
+
+import time
+
+import pytest
+
+
+@pytest.fixture
+def upload():
+    """POST to /api/upload and wait for the background job; returns (post response, final job status)"""
+    def post_and_wait(client, url='/api/upload', **kwargs):
+        response = client.post(url, **kwargs)
+        if response.status_code != 202:
+            return response, None
+        deadline = time.monotonic() + 10
+        while True:
+            job = client.get(response.json['status_url']).json
+            if job['status'] in ('done', 'failed') or time.monotonic() > deadline:
+                return response, job
+            time.sleep(0.01)
+    return post_and_wait
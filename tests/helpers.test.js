@@ -5,6 +5,7 @@ import { describe, test, expect } from '@jest/globals';
 import {
   formatAmount,
   formatDaysText,
+  formatAmountDifference,
   addProbabilityClass,
   addProbabilityBadge,
   enrichItem,
@@ -59,6 +60,13 @@ describe('formatDaysText', () => {
   });
 });
 
+describe('formatAmountDifference', () => {
+  test('should format amounts over and under the target', () => {
+    expect(formatAmountDifference(0.5)).toBe('$0.50 over');
+    expect(formatAmountDifference(-1.25)).toBe('$1.25 under');
+  });
+});
+
 describe('addProbabilityClass', () => {
   test('should return "high-probability" for scores >= 70', () => {
     expect(addProbabilityClass(70)).toBe('high-probability');
@@ -137,6 +145,11 @@ describe('enrichItem', () => {
 });
 
 describe('enrichMatch', () => {
+  test('should describe the amount difference of tolerance matches', () => {
+    expect(enrichMatch({ amount: 10.5, amount_difference: 0.5 }, 0).amountDiffText).toBe('$0.50 over');
+    expect(enrichMatch({ amount: 10, amount_difference: 0 }, 0).amountDiffText).toBeUndefined();
+  });
+
   test('should add index to match', () => {
     const match = { total: 50.00 };
     const enriched = enrichMatch(match, 0);
@@ -0,0 +1,100 @@
+/**
+ * Tests for the in-browser search
+ */
+import { describe, test, expect } from '@jest/globals';
+import {
+  roundHalfEven,
+  dayNumber,
+  dateString,
+  probabilityFromDays,
+  decodeDataset,
+  searchDataset
+} from '../static/js/utils/localSearch.js';
+
+// Two orders: Cable + Plug on 2025-11-10, Lamp on 2025-11-12
+const day = dayNumber('2025-11-10');
+const dataset = decodeDataset({
+  version: 1,
+  cents: [1000, 500, 1500],
+  days: [day, day, day + 2],
+  orders: [0, 0, 1],
+  descriptions: [0, 1, 2],
+  strings: ['Cable', 'Plug', 'Lamp'],
+  order_ids: ['111-0000001', '111-0000002'],
+  order_cents: [1500, 1500],
+  order_days: [day, day + 2]
+});
+
+const search = (query) => searchDataset(dataset, {
+  date: '2025-11-10', amount: 15, days_range: 7, search_type: 'all', max_combo_items: 3, tolerance_cents: 0,
+  ...query
+});
+
+describe('roundHalfEven', () => {
+  test('should round exact halves to the even neighbour like Python', () => {
+    expect(roundHalfEven(2.5, 0)).toBe(2);
+    expect(roundHalfEven(3.5, 0)).toBe(4);
+    expect(roundHalfEven(0.125, 2)).toBe(0.12);
+  });
+
+  test('should round other values to the nearest', () => {
+    expect(roundHalfEven(92.857142, 2)).toBe(92.86);
+    expect(roundHalfEven(1.005, 2)).toBe(1);
+  });
+});
+
+describe('dayNumber and dateString', () => {
+  test('should convert dates to day numbers and back', () => {
+    expect(dayNumber('1970-01-02')).toBe(1);
+    expect(dateString(dayNumber('2024-02-29'))).toBe('2024-02-29');
+  });
+});
+
+describe('probabilityFromDays', () => {
+  test('should score closer dates and single orders higher', () => {
+    expect(probabilityFromDays([0], 1)).toBe(100);
+    expect(probabilityFromDays([2], 1)).toBe(92.86);
+    expect(probabilityFromDays([0, 14], 2)).toBe(25);
+  });
+
+  test('should halve the score at the edge of the tolerance', () => {
+    expect(probabilityFromDays([0], 1, 50, 50)).toBe(50);
+  });
+});
+
+describe('searchDataset', () => {
+  test('should find items, orders and combinations in the server response shape', () => {
+    const results = search({});
+
+    expect(results.item_matches).toEqual([{
+      id: 3, order_id: '111-0000002', date: '2025-11-12', amount: 15, description: 'Lamp',
+      days_from_target: 2, target_date: '2025-11-10', search_type: 'item'
+    }]);
+    expect(results.order_matches.map((match) => match.order_id)).toEqual(['111-0000001', '111-0000002']);
+    expect(results.order_matches[0].items.map((item) => item.description)).toEqual(['Cable', 'Plug']);
+    expect(results.combination_matches.map((match) => match.probability_score)).toEqual([100, 92.86]);
+    expect(results.combination_matches[0]).toMatchObject({
+      total_amount: 15, item_count: 2, same_order: true, order_ids: ['111-0000001'], search_type: 'combination'
+    });
+    expect(results.combinations_exhaustive).toBe(true);
+    expect(results.total_matches).toBe(5);
+  });
+
+  test('should rank matches within the tolerance by probability', () => {
+    const results = search({ amount: 15.5, search_type: 'item', tolerance_cents: 100 });
+
+    expect(results.item_matches).toHaveLength(1);
+    expect(results.item_matches[0].amount_difference).toBe(-0.5);
+    expect(results.item_matches[0].probability_score).toBe(69.64);
+  });
+
+  test('should only search within the date range', () => {
+    expect(search({ days_range: 1, search_type: 'item' }).item_matches).toEqual([]);
+  });
+
+  test('should leave shipment searches and invalid input to the server', () => {
+    expect(search({ search_type: 'shipment' })).toBeNull();
+    expect(search({ amount: NaN })).toBeNull();
+    expect(search({ date: '' })).toBeNull();
+  });
+});
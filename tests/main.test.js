@@ -61,21 +61,20 @@ describe('CSV File Upload', () => {
     });
 
     // Simulate the event handler
-    const formData = new FormData();
-    formData.append('file', mockFile);
-
     dataStatus.textContent = '⏳ Processing...';
 
     const response = await fetch('/api/upload', {
       method: 'POST',
-      body: formData
+      headers: { 'Content-Type': 'text/csv' },
+      body: mockFile
     });
 
     const data = await response.json();
 
     expect(global.fetch).toHaveBeenCalledWith('/api/upload', {
       method: 'POST',
-      body: expect.any(FormData)
+      headers: { 'Content-Type': 'text/csv' },
+      body: mockFile
     });
 
     expect(data.total_items).toBe(100);
@@ -141,6 +140,55 @@ describe('CSV File Upload', () => {
   });
 });
 
+describe('Background Upload Jobs', () => {
+  // Mirrors formatUploadProgress / waitForUpload in main.js
+  function formatUploadProgress(job) {
+    if (job.status === 'queued') return '⏳ Waiting for the previous upload...';
+    const percent = Math.round(job.progress * 100);
+    const eta = job.eta_seconds != null ? `, about ${Math.ceil(job.eta_seconds)}s left` : '';
+    return `⏳ Processing... ${percent}% (${job.rows_processed.toLocaleString()} rows${eta})`;
+  }
+
+  async function waitForUpload(statusUrl, onProgress) {
+    while (true) {
+      const response = await fetch(statusUrl);
+      const job = await response.json();
+      if (!response.ok) throw new Error(job.error || 'Upload failed');
+      if (job.status === 'done') return job.result;
+      if (job.status === 'failed') throw new Error(job.error || 'Upload failed');
+      onProgress(formatUploadProgress(job));
+    }
+  }
+
+  test('should report progress until the job is done', async () => {
+    const running = { status: 'running', progress: 0.42, rows_processed: 1200, eta_seconds: 3.2 };
+    const done = { status: 'done', result: { total_items: 100, total_orders: 20 } };
+    global.fetch
+      .mockResolvedValueOnce({ ok: true, json: async () => running })
+      .mockResolvedValueOnce({ ok: true, json: async () => done });
+    const updates = [];
+
+    const result = await waitForUpload('/api/upload/abc', (text) => updates.push(text));
+
+    expect(global.fetch).toHaveBeenCalledWith('/api/upload/abc');
+    expect(updates).toEqual(['⏳ Processing... 42% (1,200 rows, about 4s left)']);
+    expect(result.total_items).toBe(100);
+  });
+
+  test('should surface a failed job', async () => {
+    global.fetch.mockResolvedValueOnce({
+      ok: true,
+      json: async () => ({ status: 'failed', error: 'CSV file is empty' })
+    });
+
+    await expect(waitForUpload('/api/upload/abc', () => {})).rejects.toThrow('CSV file is empty');
+  });
+
+  test('should describe a queued job', () => {
+    expect(formatUploadProgress({ status: 'queued' })).toBe('⏳ Waiting for the previous upload...');
+  });
+});
+
 describe('Search Functionality', () => {
   test('should prevent search without uploaded data', () => {
     const dataLoaded = false;
@@ -231,6 +279,67 @@ describe('Search Functionality', () => {
   });
 });
 
+describe('Streaming Search', () => {
+  test('should open an event stream with the search parameters', () => {
+    const MockEventSource = jest.fn(function () {
+      this.addEventListener = jest.fn();
+      this.close = jest.fn();
+    });
+    global.EventSource = MockEventSource;
+
+    const query = 'date=2024-01-15&amount=31.23&days_range=7&search_type=all&max_combo_items=5';
+    const source = new EventSource(`/api/purchases/search/stream?${query}`);
+    source.close();
+
+    expect(MockEventSource).toHaveBeenCalledWith(`/api/purchases/search/stream?${query}`);
+    expect(source.close).toHaveBeenCalled();
+  });
+
+  test('should keep the ten best streamed combinations in score order', () => {
+    const combinations = [];
+
+    for (const score of [40, 90, 40, 75, 10, 60, 55, 80, 20, 30, 95, 50]) {
+      combinations.push({ probability_score: score });
+      combinations.sort((a, b) => b.probability_score - a.probability_score);
+      combinations.splice(10);
+    }
+
+    expect(combinations.map(c => c.probability_score)).toEqual([95, 90, 80, 75, 60, 55, 50, 40, 40, 30]);
+  });
+
+  test('should flag results from a search that hit its time limit', () => {
+    const data = { total_matches: 1, combination_matches: [{ total: 31.23 }], combinations_exhaustive: false };
+
+    const templateData = {
+      incomplete: data.combinations_exhaustive === false
+    };
+
+    expect(templateData.incomplete).toBe(true);
+  });
+
+  test('should pass on why the combination search was cut short', () => {
+    const data = {
+      total_matches: 1,
+      combination_matches: [{ total: 31.23 }],
+      combinations_exhaustive: false,
+      combinations_truncated_reason: 'candidates'
+    };
+
+    const templateData = {
+      incomplete: data.combinations_exhaustive === false,
+      truncatedReason: data.combinations_truncated_reason
+    };
+
+    expect(templateData.incomplete).toBe(true);
+    expect(templateData.truncatedReason).toBe('candidates');
+  });
+
+  test('should have a stop button in the loading indicator', () => {
+    expect(document.querySelector('#loading .cancel-button')).toBeTruthy();
+    expect(document.getElementById('loadingText')).toBeTruthy();
+  });
+});
+
 describe('Display Results', () => {
   test('should handle empty results', () => {
     const data = {
@@ -334,13 +443,14 @@ describe('Actual HTML Structure', () => {
 
   test('should have all search type radio buttons from actual HTML', () => {
     const radioButtons = document.querySelectorAll('input[name="search_type"]');
-    expect(radioButtons.length).toBe(4);
+    expect(radioButtons.length).toBe(5);
 
     const values = Array.from(radioButtons).map(rb => rb.value);
     expect(values).toContain('all');
     expect(values).toContain('combination');
     expect(values).toContain('item');
     expect(values).toContain('order');
+    expect(values).toContain('shipment');
   });
 
   test('should have Quick Start instructions from actual HTML', () => {
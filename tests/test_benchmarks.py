@@ -0,0 +1,68 @@
+"""
+Test suite for the benchmark data generator and regression check.
+
+Tests cover determinism of the synthetic exports, that they load like
+real ones, and the baseline comparison.
+Run with: pytest tests/test_benchmarks.py -v
+"""
+
+import os
+import sys
+
+import pytest
+import app
+from app import load_amazon_csv_from_string
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from synthetic import generate_csv, generate_rows, to_csv  # noqa: E402
+import run  # noqa: E402
+
+
+class TestSyntheticExports:
+    """Test suite for benchmarks/synthetic.py"""
+
+    def test_same_seed_same_bytes(self):
+        """Test that generation is deterministic per seed"""
+        assert generate_csv(500, seed=3) == generate_csv(500, seed=3)
+        assert generate_csv(500, seed=3) != generate_csv(500, seed=4)
+
+    def test_loads_every_item(self):
+        """Test that subtotal rows are skipped and zero-price lines kept"""
+        rows = generate_rows(2000, seed=1)
+        items = [row for row in rows if not row[0].startswith("=")]
+
+        load_amazon_csv_from_string(to_csv(rows))
+
+        assert len(items) == 2000
+        assert len(rows) > len(items)
+        assert len(app.PURCHASES) == 2000
+        assert len(app.ORDERS) == len({row[0] for row in items})
+        assert any(row[6] == "$0.00" for row in items)
+
+
+class TestBaselineComparison:
+    """Test suite for run.compare"""
+
+    @pytest.fixture
+    def baseline(self):
+        return {"sizes": {"10000": {
+            "csv_bytes": 100,
+            "parse": {"seconds": 1.0, "rows_per_second": 10000, "peak_memory_bytes": 1000},
+            "search": {"items/days=7": {"queries": 10, "p50_ms": 2.0, "p99_ms": 0.1}},
+        }}}
+
+    def test_slowdown_is_reported(self, baseline):
+        """Test that metrics above the threshold are regressions and the rest are not"""
+        current = {"sizes": {"10000": {
+            "csv_bytes": 900,
+            "parse": {"seconds": 1.2, "rows_per_second": 1, "peak_memory_bytes": 2000},
+            "search": {"items/days=7": {"queries": 90, "p50_ms": 4.0, "p99_ms": 0.3}},
+        }}}
+
+        regressions = run.compare(current, baseline, threshold=0.25, min_ms=0.5)
+
+        assert [metric for metric, _, _ in regressions] == [
+            "10000/parse/peak_memory_bytes",
+            "10000/search/items/days=7/p50_ms",
+        ]
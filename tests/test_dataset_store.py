@@ -0,0 +1,243 @@
+"""
+Test suite for sharing the loaded dataset between processes.
+
+Tests cover PurchaseStore serialization, the SQLite dataset backend and
+memory-mapped snapshot files.
+Run with: pytest tests/test_dataset_store.py -v
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+import app
+from app import load_amazon_csv_from_string, PurchaseStore, SQLiteDatasetBackend, SnapshotDatasetBackend
+
+
+HEADER = "order id,order url,order date,quantity,description,item url,price,subscribe & save,ASIN"
+
+
+@pytest.fixture
+def history_csv():
+    """Enough rows to fill compressed string blocks, plus an order with two urls"""
+    rows = [
+        f"111-{i // 3},https://www.amazon.com/o{i // 3},2025-10-{i % 28 + 1:02d},{i % 4 + 1},Item {i} é,"
+        f"https://www.amazon.com/i{i},${i % 50 + 1}.{i % 100:02d},0,A{i}"
+        for i in range(300)
+    ]
+    rows.append("111-0,https://www.amazon.com/other,2025-10-01,1,,https://www.amazon.com/x,$1.00,0,")
+    return "\n".join([HEADER, *rows])
+
+
+@pytest.fixture
+def shared(tmp_path, monkeypatch):
+    """Point the app at a fresh SQLite backend"""
+    backend = SQLiteDatasetBackend(str(tmp_path / "purchases.db"))
+    monkeypatch.setattr(app, "DATASET_BACKEND", backend)
+    return backend
+
+
+def combination_worker_state():
+    """What a combination search worker process has loaded"""
+    return app.DATASET_VERSION, len(app.PURCHASES), app.COMBINATION_POOL
+
+
+def restart_worker(monkeypatch):
+    """Forget this process's dataset, as a fresh worker would"""
+    monkeypatch.setattr(app, "PURCHASES", [])
+    monkeypatch.setattr(app, "ORDERS", {})
+    monkeypatch.setattr(app, "INDEX", None)
+    monkeypatch.setattr(app, "DATASET_VERSION", 0)
+
+
+class TestStoreParts:
+    """Test suite for PurchaseStore.to_parts / from_parts"""
+
+    def test_round_trip(self, history_csv):
+        """Test that every row and order survives serialization"""
+        load_amazon_csv_from_string(history_csv)
+        original = app.PURCHASES
+        copy = PurchaseStore.from_parts(original.to_parts())
+
+        assert [row.to_dict() for row in copy] == [row.to_dict() for row in original]
+        assert [dict(copy.orders[o]) for o in copy.orders] == [dict(original.orders[o]) for o in original.orders]
+
+
+class TestSQLiteBackend:
+    """Test suite for the shared SQLite dataset backend"""
+
+    def test_other_worker_sees_upload(self, shared, history_csv, monkeypatch):
+        """Test that a worker with no data picks up a published upload"""
+        load_amazon_csv_from_string(history_csv)
+        restart_worker(monkeypatch)
+
+        response = app.app.test_client().get('/api/health')
+
+        assert response.json['data_loaded'] is True
+        assert response.json['total_items'] == 301
+        assert response.json['dataset_version'] == shared.version()
+        assert len(app.find_matching_items("2025-10-01", 1.00, days_range=0)) == 2
+
+    def test_newer_upload_replaces_dataset(self, shared, history_csv, monkeypatch):
+        """Test that a stale worker switches to the latest published dataset"""
+        load_amazon_csv_from_string(history_csv)
+        stale_version = app.DATASET_VERSION
+        SQLiteDatasetBackend(shared.path).publish(PurchaseStore().to_parts())
+
+        app.app.test_client().get('/api/health')
+
+        assert app.DATASET_VERSION == stale_version + 1
+        assert len(app.PURCHASES) == 0
+
+    def test_request_from_another_thread(self, shared, history_csv):
+        """Test that a request served by a thread other than the one that connected works"""
+        load_amazon_csv_from_string(history_csv)
+        responses = []
+        thread = threading.Thread(target=lambda: responses.append(app.app.test_client().get('/api/health')))
+        thread.start()
+        thread.join()
+
+        assert responses[0].status_code == 200
+        assert responses[0].json['total_items'] == 301
+
+    def test_upload_job(self, shared, history_csv, upload, monkeypatch):
+        """Test that an upload job loads on its own thread and any worker can poll it"""
+        client = app.app.test_client()
+        response, job = upload(client, data=history_csv.encode('utf-8'), content_type='text/csv')
+
+        assert job['status'] == 'done'
+        assert job['result']['total_items'] == 301
+        assert SQLiteDatasetBackend(shared.path).fetch()[0] == app.DATASET_VERSION
+
+        # A worker that didn't accept the upload reads the job from the database
+        monkeypatch.setattr(app, "UPLOAD_JOBS", {})
+        polled = client.get(response.json['status_url'])
+
+        assert polled.status_code == 200
+        assert polled.json == job
+
+    def test_combination_workers_skip_the_dataset(self, shared, history_csv, monkeypatch):
+        """Test that spawned combination workers don't load the shared dataset or start pools"""
+        load_amazon_csv_from_string(history_csv)
+        monkeypatch.setenv("DATASET_STORE", "sqlite")
+        monkeypatch.setenv("DATASET_PATH", shared.path)
+        monkeypatch.setenv("COMBINATION_WORKERS", "2")
+
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            assert pool.submit(combination_worker_state).result(timeout=60) == (0, 0, None)
+
+    def test_file_is_private(self, shared):
+        """Test that only the server's user can read the database"""
+        shared.version()
+
+        assert os.stat(shared.path).st_mode & 0o777 == 0o600
+
+    def test_delete(self, shared, history_csv):
+        """Test that DELETE /api/dataset removes the shared copy too"""
+        load_amazon_csv_from_string(history_csv)
+        version = app.DATASET_VERSION
+
+        response = app.app.test_client().delete('/api/dataset')
+
+        assert response.status_code == 200
+        assert SQLiteDatasetBackend(shared.path).fetch() == (version + 1, {})
+        assert len(app.PURCHASES) == 0
+
+    def test_other_worker_sees_delete(self, shared, history_csv):
+        """Test that a worker drops its dataset once another worker deleted it"""
+        load_amazon_csv_from_string(history_csv)
+        SQLiteDatasetBackend(shared.path).clear()
+
+        health = app.app.test_client().get('/api/health').json
+
+        assert health['data_loaded'] is False
+        assert health['dataset_version'] == shared.version()
+        assert app.find_matching_items("2025-10-01", 1.00, days_range=0) == []
+
+
+class TestSnapshotBackend:
+    """Test suite for the memory-mapped snapshot backend"""
+
+    @pytest.fixture
+    def snapshot(self, tmp_path, monkeypatch):
+        """Point the app at a fresh snapshot file"""
+        backend = SnapshotDatasetBackend(str(tmp_path / "purchases.snapshot"))
+        monkeypatch.setattr(app, "DATASET_BACKEND", backend)
+        return backend
+
+    def test_restart_maps_snapshot(self, snapshot, history_csv, monkeypatch):
+        """Test that a restarted worker serves the snapshot, indexes included"""
+        load_amazon_csv_from_string(history_csv)
+        expected = [row.to_dict() for row in app.PURCHASES]
+        stats = app.PURCHASES.stats.summary
+        restart_worker(monkeypatch)
+
+        health = app.app.test_client().get('/api/health').json
+
+        assert [row.to_dict() for row in app.PURCHASES] == expected
+        assert health['stats'] == stats
+        assert isinstance(app.INDEX.by_day, memoryview)
+        assert health['snapshot']['schema_version'] == app.SNAPSHOT_SCHEMA_VERSION
+        assert health['snapshot']['load_ms'] is not None
+        assert app.find_matching_orders("2025-10-01", 7.03, days_range=0)[0]['order_id'] == '111-0'
+
+    def test_append_to_mapped_snapshot(self, snapshot, history_csv, monkeypatch):
+        """Test that a worker serving a snapshot can append to it and publish the result"""
+        load_amazon_csv_from_string(history_csv)
+        restart_worker(monkeypatch)
+        app.app.test_client().get('/api/health')
+
+        load_amazon_csv_from_string("\n".join([
+            HEADER, "111-0,https://www.amazon.com/o0,2025-10-01,1,Extra,https://www.amazon.com/e,$2.00,0,E1"
+        ]), append=True)
+        restart_worker(monkeypatch)
+        app.app.test_client().get('/api/health')
+
+        assert len(app.PURCHASES) == 302
+        assert app.find_matching_orders("2025-10-01", 9.03, days_range=0)[0]['order_id'] == '111-0'
+
+    def test_file_is_private(self, snapshot, history_csv):
+        """Test that only the server's user can read the snapshot"""
+        load_amazon_csv_from_string(history_csv)
+
+        assert os.stat(snapshot.path).st_mode & 0o777 == 0o600
+
+    def test_expired_snapshot_is_deleted(self, snapshot, history_csv, monkeypatch):
+        """Test that the first request after DATASET_RETENTION_HOURS deletes the upload"""
+        monkeypatch.setattr(app, "DATASET_RETENTION_HOURS", 1)
+        load_amazon_csv_from_string(history_csv)
+        leftover = f"{snapshot.path}.123.tmp"
+        open(leftover, 'wb').close()
+        snapshot.created_at -= 2 * 3600
+
+        health = app.app.test_client().get('/api/health').json
+
+        assert health['data_loaded'] is False
+        assert app.read_snapshot(snapshot.path)[2] == {}
+        assert not os.path.exists(leftover)
+
+    def test_upload_job_from_other_worker(self, snapshot, history_csv, upload, monkeypatch):
+        """Test that a worker that didn't accept an upload can report its job"""
+        client = app.app.test_client()
+        response, job = upload(client, data=history_csv.encode('utf-8'), content_type='text/csv')
+        monkeypatch.setattr(app, "UPLOAD_JOBS", {})
+
+        assert client.get(response.json['status_url']).json == job
+        assert client.get('/api/upload/..%2Fpurchases').status_code == 404
+
+    def test_corrupt_snapshot_is_ignored(self, snapshot, history_csv, monkeypatch):
+        """Test that a snapshot failing its checksum is not loaded"""
+        load_amazon_csv_from_string(history_csv)
+        with open(snapshot.path, 'r+b') as f:
+            f.seek(-1, 2)
+            last = f.read(1)
+            f.seek(-1, 2)
+            f.write(bytes([last[0] ^ 0xFF]))
+        restart_worker(monkeypatch)
+
+        response = app.app.test_client().get('/api/health')
+
+        assert response.status_code == 200
+        assert response.json['data_loaded'] is False
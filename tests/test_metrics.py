@@ -0,0 +1,103 @@
+"""
+Test suite for hot-path instrumentation.
+
+Tests cover Profile, the Prometheus text rendered by /api/metrics and the
+per-request ?profile=1 breakdown.
+Run with: pytest tests/test_metrics.py -v
+"""
+
+import pytest
+import app
+from app import load_amazon_csv_from_string, Metrics, Profile, NO_PROFILE
+
+
+HEADER = "order id,order url,order date,quantity,description,item url,price,subscribe & save,ASIN"
+
+
+@pytest.fixture
+def client():
+    """Flask test client"""
+    return app.app.test_client()
+
+
+@pytest.fixture(autouse=True)
+def metrics(monkeypatch):
+    """Fresh process-wide metrics and a small dataset"""
+    fresh = Metrics()
+    monkeypatch.setattr(app, "METRICS", fresh)
+    load_amazon_csv_from_string("\n".join([
+        HEADER,
+        "111-1,https://www.amazon.com/o1,2025-11-01,1,Cable,https://www.amazon.com/i1,$10.00,0,A1",
+        "111-2,https://www.amazon.com/o2,2025-11-03,1,Lamp,https://www.amazon.com/i2,$20.00,0,A2",
+        "=SUBTOTAL,,,,,,,,",
+    ]))
+    return fresh
+
+
+class TestProfile:
+    """Test suite for Profile"""
+
+    def test_disabled_profile_records_nothing(self):
+        """Test that the default profile stays empty whatever the code reports"""
+        app.find_item_combinations("2025-11-02", 30.00, days_range=3)
+
+        assert NO_PROFILE.to_dict() == {"phases_ms": {}, "counters": {}}
+
+    def test_combination_counters(self):
+        """Test candidates, expanded subtrees, enumerated combinations and matches"""
+        profile = Profile()
+
+        matches = app.find_item_combinations("2025-11-02", 30.00, days_range=3, profile=profile)
+
+        assert len(matches) == 1
+        assert profile.counters == {"combination.candidates": 2, "combination.enumerated": 1,
+                                    "combination.expanded": 4, "combination.matches": 1}
+        assert set(profile.phases) == {"combination.filter", "combination.enumerate", "combination.build"}
+
+
+class TestMetricsEndpoint:
+    """Test suite for /api/metrics and ?profile=1"""
+
+    def test_search_observed_per_search_type(self, client, metrics):
+        """Test latency histograms and counters after a search"""
+        client.get('/api/purchases/search?date=2025-11-01&amount=10.00&max_combo_items=2')
+
+        text = client.get('/api/metrics').data.decode()
+
+        assert 'purchase_search_requests_total{search_type="all"} 1' in text
+        for search_type in ("item", "order", "combination"):
+            assert f'purchase_search_duration_seconds_count{{search_type="{search_type}"}} 1' in text
+            assert f'purchase_search_duration_seconds_bucket{{search_type="{search_type}",le="+Inf"}} 1' in text
+        assert 'purchase_search_matches_total{search_type="item"} 1' in text
+
+    def test_upload_counters(self, client, upload):
+        """Test rows parsed and skipped by an upload"""
+        body = "\n".join([HEADER, "111-9,u,2025-11-05,1,Pen,u,$1.00,0,A9", "=TOTAL,,,,,,,,"])
+        response, job = upload(client, '/api/upload?profile=1', data=body, content_type='text/csv')
+
+        assert job["result"]["profile"]["counters"] == {
+            "upload.rows_parsed": 2, "upload.rows_skipped": 1, "upload.items_loaded": 1
+        }
+        text = client.get('/api/metrics').data.decode()
+        assert 'purchase_upload_rows_parsed_total 2' in text
+        assert 'purchase_upload_duration_seconds_count 1' in text
+
+    def test_profile_breakdown_inline(self, client):
+        """Test that ?profile=1 adds the phases, and only when asked"""
+        url = '/api/purchases/search?date=2025-11-01&amount=10.00&search_type=item'
+
+        plain = client.get(url).json
+        profiled = client.get(url + '&profile=1').json
+
+        assert "profile" not in plain
+        assert profiled["profile"]["cached"] is True
+        assert "serialize" in profiled["profile"]["phases_ms"]
+
+    def test_disabled_metrics(self, client, metrics, monkeypatch):
+        """Test that METRICS_ENABLED=0 stops aggregation but still honours ?profile=1"""
+        monkeypatch.setattr(app, "METRICS_ENABLED", False)
+
+        response = client.get('/api/purchases/search?date=2025-11-01&amount=10.00&search_type=item&profile=1')
+
+        assert response.json["profile"]["counters"] == {"item.matches": 1}
+        assert metrics.requests == {}
@@ -0,0 +1,136 @@
+"""
+Test suite for batch statement reconciliation.
+
+Tests cover reconcile_transactions and the /api/reconcile endpoint
+(JSON and CSV statements, global assignment).
+Run with: pytest tests/test_reconcile.py -v
+"""
+
+import pytest
+import app
+from app import load_amazon_csv_from_string, reconcile_transactions
+
+
+@pytest.fixture
+def client():
+    """Flask test client"""
+    return app.app.test_client()
+
+
+@pytest.fixture(autouse=True)
+def purchases():
+    """Two single-item orders with the same price and one two-item order"""
+    load_amazon_csv_from_string("""order id,order url,order date,quantity,description,item url,price,subscribe & save,ASIN
+111-1,https://www.amazon.com/o1,2025-11-01,1,Cable,https://www.amazon.com/i1,$10.00,0,A1
+111-2,https://www.amazon.com/o2,2025-11-03,1,Cable,https://www.amazon.com/i2,$10.00,0,A2
+111-3,https://www.amazon.com/o3,2025-11-10,1,Lamp,https://www.amazon.com/i3,$20.00,0,A3
+111-3,https://www.amazon.com/o3,2025-11-10,1,Bulb,https://www.amazon.com/i4,$5.50,0,A4""")
+
+
+class TestReconcileTransactions:
+    """Test suite for reconcile_transactions"""
+
+    def test_order_listed_once(self):
+        """Test that an order is not repeated as a combination of its items"""
+        results = reconcile_transactions([{'date': '2025-11-10', 'amount': 25.50}])
+        matches = results[0]['matches']
+
+        assert [m['purchase_ids'] for m in matches] == [[3, 4]]
+        assert matches[0]['search_type'] == 'order'
+
+    def test_results_keep_input_order(self):
+        """Test that results are returned in statement order, not date order"""
+        results = reconcile_transactions([
+            {'date': '2025-11-10', 'amount': 20.00},
+            {'date': '2025-11-01', 'amount': 10.00},
+        ])
+
+        assert [r['transaction']['index'] for r in results] == [0, 1]
+        assert results[0]['matches'][0]['purchase_ids'] == [3]
+
+    def test_assignment_does_not_reuse_purchases(self):
+        """Test that two equal charges are assigned to different purchases"""
+        results = reconcile_transactions([
+            {'date': '2025-11-02', 'amount': 10.00},
+            {'date': '2025-11-03', 'amount': 10.00},
+        ], assign=True)
+
+        assigned = [r['assigned']['purchase_ids'] for r in results]
+        assert sorted(assigned) == [[1], [2]]
+        assert assigned[1] == [2]
+
+    def test_same_day_transactions_share_candidates(self):
+        """Test that transactions on one day get the matches they would get on their own"""
+        statement = [{'date': '2025-11-05', 'amount': 15.50}, {'date': '2025-11-05', 'amount': 30.00}]
+        together = reconcile_transactions(statement, max_items=3)
+        alone = [reconcile_transactions([t], max_items=3)[0] for t in statement]
+
+        assert [r['matches'] for r in together] == [r['matches'] for r in alone]
+        assert together[0]['matches'][0]['purchase_ids'] == [2, 4]
+
+    def test_time_budget(self):
+        """Test that an exhausted budget skips combinations and says so"""
+        results = reconcile_transactions([
+            {'date': '2025-11-10', 'amount': 20.00},
+            {'date': '2025-11-05', 'amount': 15.50},
+        ], time_budget_ms=0)
+
+        assert [r['exhaustive'] for r in results] == [False, False]
+        assert [r['truncated_reason'] for r in results] == ['time', 'time']
+        assert results[0]['matches'][0]['purchase_ids'] == [3]
+        assert results[1]['matches'] == []
+
+    def test_statement_amount_formats(self):
+        """Test negative, parenthesised and currency-formatted amounts"""
+        assert app.parse_statement_amount('-$1,234.56') == 123456
+        assert app.parse_statement_amount('(12.00)') == 1200
+        assert app.parse_statement_amount(-5.5) == 550
+
+
+class TestReconcileEndpoint:
+    """Test suite for the /api/reconcile endpoint"""
+
+    def test_json_pairs(self, client):
+        """Test a JSON body of [date, amount] pairs"""
+        response = client.post('/api/reconcile', json={
+            'transactions': [['2025-11-10', 20.00], ['11/01/2025', 10.00]],
+            'assign': True,
+        })
+
+        assert response.status_code == 200
+        assert response.json['summary'] == {'transactions': 2, 'matched': 2, 'assigned': 2, 'exhaustive': True}
+
+    def test_csv_statement(self, client):
+        """Test a raw statement CSV with extra columns"""
+        body = "Posting Date,Description,Amount\n11/10/2025,AMAZON MKTPL,-25.50\n11/20/2025,OTHER,-1.00\n"
+        response = client.post('/api/reconcile', data=body, content_type='text/csv')
+
+        assert response.status_code == 200
+        results = response.json['results']
+        assert results[0]['matches'][0]['order_id'] == '111-3'
+        assert results[1]['matches'] == []
+
+    @pytest.mark.parametrize("option", ['days_range=x', 'max_combo_items=x', 'time_budget_ms=nan'])
+    def test_bad_option(self, client, option):
+        """Test that options that aren't numbers are rejected"""
+        response = client.post(f'/api/reconcile?{option}', json=[['2025-11-10', 20.00]])
+
+        assert response.status_code == 400
+        assert response.json['error'].startswith('Invalid option')
+
+    def test_max_combo_items_is_capped(self, client):
+        """Test that a statement can't ask for combinations larger than MAX_COMBO_ITEMS"""
+        response = client.post(f'/api/reconcile?max_combo_items={app.MAX_COMBO_ITEMS + 1}',
+                               json=[['2025-11-10', 20.00]])
+
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize("payload", [
+        [], [{'date': 'soon', 'amount': 1}], [5], [['2025-01-01']], {'transactions': 'abc'},
+        [['2025-01-01', '1e300']], [['2025-01-01', 'inf']], [{'date': '2025-01-01'}],
+    ])
+    def test_bad_input(self, client, payload):
+        """Test that empty or invalid statements are rejected"""
+        response = client.post('/api/reconcile', json=payload)
+
+        assert response.status_code == 400
@@ -7,12 +7,27 @@ Or simply: pytest
 """
 
 import pytest
+import app
 from app import (
     load_amazon_csv_from_string,
     find_matching_items,
     find_matching_orders,
     find_item_combinations,
+    search_combinations,
+    PackedStrings,
+    SearchBudget,
+    AmountTolerance,
+    Profile,
+    calculate_probability_score,
 )
+import gzip
+import itertools
+import json
+import multiprocessing
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 
 
 # Fixtures for test data
@@ -102,6 +117,15 @@ class TestItemSearch:
         # Purchase date is 2025-11-26, target is 2025-11-24, so diff should be 2
         assert results[0]['days_from_target'] == 2
 
+    @pytest.mark.parametrize("days_range,expected", [(5, 0), (6, 1)])
+    def test_date_window_is_inclusive(self, basic_items_csv, days_range, expected):
+        """Test that items exactly days_range away are inside the window"""
+        load_amazon_csv_from_string(basic_items_csv)
+        # Test Item 4 and 5 ($25.00) are dated 2025-11-20, six days before target
+        results = find_matching_items("2025-11-26", 25.00, days_range=days_range)
+
+        assert len(results) == expected * 2
+
     @pytest.mark.parametrize("price", [36.65, 35.81, 15.97, 10.00, 25.00])
     def test_floating_point_precision(self, basic_items_csv, price):
         """Test various decimal prices that could have floating-point issues"""
@@ -169,6 +193,760 @@ class TestCombinationSearch:
         assert same_order_matches[0]['probability_score'] >= 50, \
             "Same order combinations should have score >= 50"
 
+    def test_find_three_item_combination(self, combination_test_csv):
+        """Test finding a combination that needs three items"""
+        load_amazon_csv_from_string(combination_test_csv)
+        # 36.65 + 10.00 + 25.00 = 71.65
+        results = find_item_combinations("2025-11-26", 71.65, days_range=7, max_items=5)
+
+        assert len(results) == 1
+        assert results[0]['item_count'] == 3
+        assert results[0]['total_amount'] == 71.65
+
+    def test_combination_beyond_fifty_candidates(self):
+        """Test that matches are found when more than 50 items share the window"""
+        header = "order id,order url,order date,quantity,description,item url,price,subscribe & save,ASIN"
+        filler = [
+            f"200-{i:07d},https://www.amazon.com/o{i},2025-11-26,1,Filler {i},https://www.amazon.com/i{i},$1.00,0,F{i}"
+            for i in range(120)
+        ]
+        pair = [
+            "300-0000001,https://www.amazon.com/p,2025-11-20,1,Far Item A,https://www.amazon.com/a,$123.45,0,FARA",
+            "300-0000001,https://www.amazon.com/p,2025-11-20,1,Far Item B,https://www.amazon.com/b,$76.55,0,FARB",
+        ]
+        load_amazon_csv_from_string("\n".join([header] + filler + pair))
+        results = find_item_combinations("2025-11-26", 200.00, days_range=7, max_items=2)
+
+        assert len(results) == 1
+        assert {item['description'] for item in results[0]['items']} == {'Far Item A', 'Far Item B'}
+        assert results[0]['same_order']
+
+
+class TestToleranceSearch:
+    """Test suite for matching amounts within a tolerance"""
+
+    def test_interval(self):
+        """Test the accepted cents interval for each kind of tolerance"""
+        assert AmountTolerance(cents=50).interval(10000) == (9950, 10050)
+        assert AmountTolerance(cents=50, percent=1).interval(10000) == (9900, 10100)
+        # A 5-10% tax band accepts pre-tax amounts of 90.91..95.24
+        assert AmountTolerance(tax_rate_min=5, tax_rate_max=10).interval(10000) == (9090, 9524)
+        # The cents slack widens the band itself, not a range stretched back to the target
+        assert AmountTolerance(cents=10, tax_rate_min=5, tax_rate_max=10).interval(10000) == (9080, 9534)
+
+    def test_item_within_tolerance(self, basic_items_csv):
+        """Test that items near the amount are found, closest first"""
+        load_amazon_csv_from_string(basic_items_csv)
+        # 35.81 is 0.19 away from 36.00, 36.65 is 0.65 away
+        results = find_matching_items("2025-11-26", 36.00, days_range=7, tolerance=AmountTolerance(cents=100))
+
+        assert [r['amount'] for r in results] == [35.81, 36.65]
+        assert results[0]['amount_difference'] == -0.19
+        assert results[0]['probability_score'] > results[1]['probability_score']
+
+    def test_order_with_tax(self, multi_item_order_csv):
+        """Test matching a charge that includes sales tax"""
+        load_amazon_csv_from_string(multi_item_order_csv)
+        # 46.65 plus 8% tax is 50.38
+        results = find_matching_orders("2025-11-26", 50.38, days_range=7,
+                                       tolerance=AmountTolerance(tax_rate_min=6, tax_rate_max=9))
+
+        assert [r['total'] for r in results] == [46.65]
+
+    def test_combination_within_tolerance(self, combination_test_csv):
+        """Test that combinations whose total is close to the target are found"""
+        load_amazon_csv_from_string(combination_test_csv)
+        # 36.65 + 10.00 = 46.65 is 0.35 under 47.00
+        results = find_item_combinations("2025-11-26", 47.00, days_range=7, max_items=2,
+                                         tolerance=AmountTolerance(cents=50))
+
+        assert results[0]['total_amount'] == 46.65
+        assert results[0]['amount_difference'] == -0.35
+        assert results[0]['probability_score'] < 100
+
+    def test_exact_match_scores_unchanged(self, combination_test_csv):
+        """Test that an exact match inside a tolerance keeps its full score"""
+        load_amazon_csv_from_string(combination_test_csv)
+        exact = find_item_combinations("2025-11-26", 46.65, days_range=7, max_items=2)
+        tolerant = find_item_combinations("2025-11-26", 46.65, days_range=7, max_items=2,
+                                          tolerance=AmountTolerance(cents=50))
+
+        assert tolerant[0]['probability_score'] == exact[0]['probability_score']
+
+    def test_search_endpoint_tolerance(self, basic_items_csv):
+        """Test the tolerance query parameters of the search endpoint"""
+        load_amazon_csv_from_string(basic_items_csv)
+        response = app.app.test_client().get(
+            '/api/purchases/search?date=2025-11-26&amount=36.00&days_range=7&search_type=item&tolerance_pct=2'
+        )
+
+        assert [r['amount'] for r in response.json['item_matches']] == [35.81, 36.65]
+
+    @pytest.mark.parametrize("path", ['/api/purchases/search', '/api/purchases/search/stream'])
+    @pytest.mark.parametrize("tolerance", ['tolerance_cents=5.5', 'tolerance_cents=abc', 'tolerance_pct=x',
+                                           'tolerance_cents=-1', 'tolerance_pct=inf', 'tolerance_pct=nan',
+                                           'tax_rate_max=inf', 'tolerance_cents=1000000000000'])
+    def test_invalid_tolerance_is_rejected(self, basic_items_csv, path, tolerance):
+        """Test that both search endpoints answer 400 for a tolerance they can't use"""
+        load_amazon_csv_from_string(basic_items_csv)
+
+        response = app.app.test_client().get(f'{path}?date=2025-11-26&amount=36.00&{tolerance}')
+
+        assert response.status_code == 400
+        assert response.json['error']
+
+
+class TestAnytimeCombinationSearch:
+    """Test suite for budgeted and streamed combination search"""
+
+    @pytest.fixture
+    def dense_csv(self):
+        """Many same-priced items, so there are far more exact pairs than the top ten"""
+        header = "order id,order url,order date,quantity,description,item url,price,subscribe & save,ASIN"
+        rows = [
+            f"200-{i:07d},https://www.amazon.com/o{i},2025-11-{20 + i % 7:02d},1,Item {i},https://www.amazon.com/i{i},$5.00,0,A{i}"
+            for i in range(40)
+        ]
+        return "\n".join([header] + rows)
+
+    def test_unlimited_budget_is_exhaustive(self, dense_csv):
+        """Test that a search that runs to completion says so"""
+        load_amazon_csv_from_string(dense_csv)
+        matches, exhaustive, truncated_reason = search_combinations("2025-11-23", 10.00, days_range=7, max_items=2)
+
+        assert exhaustive
+        assert truncated_reason is None
+        assert matches == find_item_combinations("2025-11-23", 10.00, days_range=7, max_items=2)
+
+    def test_work_budget_stops_search(self, dense_csv):
+        """Test that a spent budget returns the best matches so far, marked incomplete"""
+        load_amazon_csv_from_string(dense_csv)
+        matches, exhaustive, truncated_reason = search_combinations(
+            "2025-11-23", 10.00, days_range=7, max_items=2, budget=SearchBudget(max_solutions=3)
+        )
+
+        assert not exhaustive
+        assert truncated_reason == 'time'
+        assert len(matches) == 3
+
+    def test_cancelled_search(self, dense_csv):
+        """Test that a cancelled budget stops before scoring anything"""
+        load_amazon_csv_from_string(dense_csv)
+        budget = SearchBudget()
+        budget.cancel()
+
+        matches, exhaustive, truncated_reason = search_combinations(
+            "2025-11-23", 10.00, days_range=7, max_items=2, budget=budget
+        )
+
+        assert (matches, exhaustive, truncated_reason) == ([], False, 'time')
+
+    def test_candidate_cap_is_reported(self, dense_csv, monkeypatch):
+        """Test that a search limited by the candidate cap says so rather than blaming the time limit"""
+        header, *rows = dense_csv.split("\n")
+        load_amazon_csv_from_string("\n".join([header, *rows, *(row.replace("200-", "201-") for row in rows)]))
+        # Leaves the window the floor of 50 of the 80 purchases
+        monkeypatch.setattr(app, "COMBINATION_TABLE_BITS", 0)
+
+        matches, exhaustive, truncated_reason = search_combinations("2025-11-23", 10.00, days_range=7, max_items=2)
+
+        assert matches
+        assert (exhaustive, truncated_reason) == (False, 'candidates')
+
+    def test_stream_endpoint(self, combination_test_csv):
+        """Test that the SSE endpoint streams partial results and ends with the ranked list"""
+        load_amazon_csv_from_string(combination_test_csv)
+        response = app.app.test_client().get(
+            '/api/purchases/search/stream?date=2025-11-26&amount=46.65&days_range=7&search_type=all&max_combo_items=3'
+        )
+        events = [
+            (block.split('\n')[0][len('event: '):], json.loads(block.split('\n')[1][len('data: '):]))
+            for block in response.get_data(as_text=True).strip().split('\n\n')
+        ]
+        names = [name for name, _ in events]
+        done = events[-1][1]
+
+        assert response.mimetype == 'text/event-stream'
+        assert names[:3] == ['query', 'item_matches', 'order_matches']
+        assert 'combination' in names
+        assert names[-1] == 'done'
+        assert done['exhaustive'] is True
+        assert done['truncated_reason'] is None
+        assert done['combination_matches'] == find_item_combinations("2025-11-26", 46.65, 7, 3)
+
+    @pytest.mark.parametrize("path", ['/api/purchases/search', '/api/purchases/search/stream'])
+    @pytest.mark.parametrize("amount", ['inf', 'nan', '1e300', '1000000.01'])
+    def test_amount_out_of_range(self, path, amount):
+        """Test that both search endpoints answer 400 for an amount that isn't a finite charge"""
+        response = app.app.test_client().get(f'{path}?date=2025-11-26&amount={amount}')
+
+        assert response.status_code == 400
+        assert 'Amounts' in response.json['error']
+
+    @pytest.mark.parametrize("path", ['/api/purchases/search', '/api/purchases/search/stream'])
+    def test_max_combo_items_is_capped(self, path):
+        """Test that both search endpoints reject more items per combination than MAX_COMBO_ITEMS"""
+        response = app.app.test_client().get(
+            f'{path}?date=2025-11-26&amount=46.65&max_combo_items={app.MAX_COMBO_ITEMS + 1}'
+        )
+
+        assert response.status_code == 400
+        assert 'max_combo_items' in response.json['error']
+
+    def test_tables_stop_at_one_row_per_candidate(self, combination_test_csv):
+        """Test that a max_items beyond the candidate count builds no extra tables and finds the same matches"""
+        load_amazon_csv_from_string(combination_test_csv)
+
+        assert len(app._subset_sum_tables([100, 200], 300, 100000)) == 3
+        assert search_combinations("2025-11-26", 46.65, 7, 100000) == search_combinations("2025-11-26", 46.65, 7, 20)
+
+    def test_budget_bounds_table_building(self):
+        """Test that the tables stop once the budget is spent"""
+        budget = SearchBudget()
+        budget.cancel()
+
+        assert app._subset_sum_tables([500] * 40, 1000, 5, budget) is None
+
+    def test_slow_client_does_not_block_uploads(self, combination_test_csv):
+        """Test that an upload goes ahead while a stream waits on its client, and the stream then stops"""
+        load_amazon_csv_from_string(combination_test_csv)
+        response = app.app.test_client().get(
+            '/api/purchases/search/stream?date=2025-11-26&amount=46.65&days_range=7&search_type=all',
+            buffered=False
+        )
+        chunks = iter(response.response)
+        assert next(chunks).startswith(b'event: query')
+
+        upload = threading.Thread(target=load_amazon_csv_from_string, args=(combination_test_csv,))
+        upload.start()
+        upload.join(timeout=5)
+        rest = b''.join(chunks).decode('utf-8')
+        response.close()
+
+        assert not upload.is_alive()
+        assert rest.startswith('event: search_error')
+        assert 'event: done' not in rest
+
+    def test_stream_rejects_missing_parameters(self):
+        """Test that invalid stream requests fail before streaming starts"""
+        response = app.app.test_client().get('/api/purchases/search/stream?date=2025-11-26')
+
+        assert response.status_code == 400
+
+
+class TestBranchAndBoundSearch:
+    """Test suite for the best-first combination search"""
+
+    HEADER = "order id,order url,order date,quantity,description,item url,price,subscribe & save,ASIN"
+
+    def exhaustive_top_ten(self, target_date, amount, days_range, max_items, tolerance=None):
+        """Score every combination in the window and rank them the way the search documents"""
+        target = datetime.strptime(target_date, "%Y-%m-%d")
+        low, high = tolerance.interval(round(amount * 100)) if tolerance else (round(amount * 100),) * 2
+        window = [item for item in app.PURCHASES
+                  if abs((datetime.strptime(item['date'], "%Y-%m-%d") - target).days) <= days_range
+                  and 0 < round(item['amount'] * 100) <= high]
+        window.sort(key=lambda item: (abs((datetime.strptime(item['date'], "%Y-%m-%d") - target).days), item['id']))
+        ranked = []
+        for size in range(1, max_items + 1):
+            for positions in itertools.combinations(range(len(window)), size):
+                items = [window[i] for i in positions]
+                total = sum(round(item['amount'] * 100) for item in items)
+                if low <= total <= high:
+                    score = calculate_probability_score(items, target_date, amount, tolerance)
+                    ranked.append((-score, size, abs(total - round(amount * 100)), total, positions,
+                                   [item['id'] for item in items]))
+        return [(-entry[0], entry[-1]) for entry in sorted(ranked)[:10]]
+
+    @pytest.mark.parametrize("seed", range(4))
+    @pytest.mark.parametrize("tolerance", [None, AmountTolerance(cents=40)])
+    def test_same_top_ten_as_exhaustive_search(self, seed, tolerance):
+        """Test the ranked results against scoring every combination"""
+        rng = random.Random(seed)
+        rows = []
+        for order in range(25):
+            day = 15 + rng.randrange(12)
+            for line in range(rng.choice([1, 1, 2, 3])):
+                price = rng.choice([4.99, 5.00, 9.99, 10.00, 12.50, 15.01, 20.00])
+                rows.append(f"300-{order:07d},u,2025-11-{day:02d},1,Item {order}/{line},u,${price:.2f},0,A{order}")
+        load_amazon_csv_from_string("\n".join([self.HEADER] + rows))
+
+        for amount in (15.00, 19.99, 25.00, 30.01):
+            results = find_item_combinations("2025-11-20", amount, days_range=5, max_items=3, tolerance=tolerance)
+
+            assert [(r['probability_score'], [item['id'] for item in r['items']]) for r in results] == \
+                self.exhaustive_top_ten("2025-11-20", amount, 5, 3, tolerance)
+
+    def test_larger_same_order_combination_is_not_skipped(self):
+        """Test that a good two-item match no longer hides a better three-item one"""
+        load_amazon_csv_from_string("\n".join([
+            self.HEADER,
+            "100-1,u,2025-11-23,1,Cable,u,$10.00,0,A1",
+            "100-1,u,2025-11-23,1,Lamp,u,$20.00,0,A2",
+            "100-2,u,2025-11-26,1,Pen,u,$5.00,0,A3",
+            "100-2,u,2025-11-26,1,Pad,u,$10.00,0,A4",
+            "100-2,u,2025-11-26,1,Ink,u,$15.00,0,A5",
+        ]))
+
+        results = find_item_combinations("2025-11-26", 30.00, days_range=7, max_items=3)
+
+        assert [r['item_count'] for r in results[:2]] == [3, 2]
+        assert results[0]['probability_score'] == 100
+
+    def test_explores_a_fraction_of_the_solutions(self):
+        """Test that most of the 34,220 exact triples are pruned without being scored"""
+        load_amazon_csv_from_string("\n".join([self.HEADER] + [
+            f"200-{i:07d},u,2025-11-{20 + i % 7:02d},1,Item {i},u,$5.00,0,A{i}" for i in range(60)
+        ]))
+        profile = Profile()
+
+        matches, exhaustive, _ = search_combinations("2025-11-23", 15.00, days_range=7, max_items=3, profile=profile)
+
+        assert exhaustive
+        assert len(matches) == 10
+        assert profile.counters["combination.enumerated"] < 100
+
+
+class TestShipmentSearch:
+    """Test suite for partial-shipment search"""
+
+    @pytest.fixture
+    def shipment_csv(self):
+        """One four-item order and an unrelated order two days later"""
+        return "\n".join([
+            TestBranchAndBoundSearch.HEADER,
+            "100-1,u,2025-11-20,1,Cable,u,$10.00,0,A1",
+            "100-1,u,2025-11-20,1,Lamp,u,$20.00,0,A2",
+            "100-1,u,2025-11-20,1,Pen,u,$5.00,0,A3",
+            "100-1,u,2025-11-20,1,Desk,u,$99.00,0,A4",
+            "100-2,u,2025-11-22,1,Mug,u,$25.00,0,A5",
+        ])
+
+    def test_finds_part_of_one_order(self, shipment_csv):
+        """Test that only same-order subsets of two or more items match"""
+        load_amazon_csv_from_string(shipment_csv)
+
+        results = app.find_matching_shipments("2025-11-21", 30.00, days_range=3)
+
+        assert [[item['description'] for item in r['items']] for r in results] == [["Cable", "Lamp"]]
+        assert results[0]['search_type'] == 'shipment'
+        assert results[0]['same_order'] is True
+        assert results[0]['probability_score'] == 96.43
+
+    def test_whole_order_and_single_items_are_not_shipments(self, shipment_csv):
+        """Test that those are left to order and item search"""
+        load_amazon_csv_from_string(shipment_csv)
+
+        assert app.find_matching_shipments("2025-11-20", 134.00) == []
+        assert app.find_matching_shipments("2025-11-20", 20.00) == []
+        assert app.find_matching_shipments("2025-11-20", 30.00, days_range=0) != []
+        assert app.find_matching_shipments("2025-11-25", 30.00, days_range=4) == []
+
+    def test_within_tolerance(self, shipment_csv):
+        """Test shipments with tax on top of the item prices"""
+        load_amazon_csv_from_string(shipment_csv)
+
+        results = app.find_matching_shipments("2025-11-20", 32.40, tolerance=AmountTolerance(percent=10))
+
+        assert [r['total_amount'] for r in results] == [30.00, 35.00]
+        assert results[0]['amount_difference'] == -2.40
+
+    def test_endpoint(self, shipment_csv):
+        """Test search_type=shipment, which 'all' leaves to combination search"""
+        load_amazon_csv_from_string(shipment_csv)
+        client = app.app.test_client()
+
+        shipments = client.get('/api/purchases/search?date=2025-11-20&amount=30.00&search_type=shipment').json
+        everything = client.get('/api/purchases/search?date=2025-11-20&amount=30.00').json
+
+        assert len(shipments['shipment_matches']) == 1
+        assert shipments['total_matches'] == 1
+        assert everything['shipment_matches'] == []
+        assert everything['combination_matches'][0]['same_order'] is True
+
+    def test_appended_lines_update_shipments(self, shipment_csv):
+        """Test that an order's new lines join its shipments after an append"""
+        load_amazon_csv_from_string(shipment_csv)
+        load_amazon_csv_from_string("\n".join([
+            TestBranchAndBoundSearch.HEADER, "100-2,u,2025-11-22,1,Tray,u,$7.00,0,A6",
+            "100-2,u,2025-11-22,1,Fork,u,$3.00,0,A7",
+        ]), append=True)
+
+        results = app.find_matching_shipments("2025-11-22", 32.00, days_range=0)
+
+        assert [[item['description'] for item in r['items']] for r in results] == [["Mug", "Tray"]]
+
+    def test_combinations_of_orders_too_large_to_index(self, shipment_csv, monkeypatch):
+        """Test that combination search still covers orders with no precomputed subsets"""
+        monkeypatch.setattr(app, "SHIPMENT_MAX_LINES", 3)
+        load_amazon_csv_from_string(shipment_csv)
+
+        results = find_item_combinations("2025-11-20", 35.00, days_range=0, max_items=3)
+
+        assert app.find_matching_shipments("2025-11-20", 35.00, days_range=0) == []
+        assert [item['description'] for item in results[0]['items']] == ["Cable", "Lamp", "Pen"]
+
+
+# Storage Tests
+class TestKeywordSearch:
+    """Test suite for keyword search over descriptions and ASINs"""
+
+    @pytest.fixture
+    def keyword_csv(self):
+        """Toner and cables around 2025-11-20, and toner bought a month earlier"""
+        return "\n".join([
+            TestBranchAndBoundSearch.HEADER,
+            "100-1,u,2025-11-20,1,Black Toner Cartridge,u,$45.99,0,B00TONER01",
+            "100-1,u,2025-11-20,1,HDMI Cable 6ft,u,$9.99,0,B00HDMI001",
+            "100-2,u,2025-11-22,1,High Speed HDMI Cable,u,$12.50,0,B00HDMI002",
+            "100-3,u,2025-11-18,1,Toners & Inks Sampler,u,$19.99,0,B00SAMPLE1",
+            "100-4,u,2025-10-20,1,Color Toner Cartridge,u,$45.99,0,B00TONER02",
+        ])
+
+    def test_prefix_and_whole_word_matches(self, keyword_csv):
+        """Test that whole words rank above prefixes and the date window applies"""
+        load_amazon_csv_from_string(keyword_csv)
+
+        results = find_matching_items("2025-11-20", None, days_range=7, keywords="toner")
+
+        assert [r['description'] for r in results] == ["Black Toner Cartridge", "Toners & Inks Sampler"]
+        assert [r['relevance'] for r in results] == [2, 1]
+
+    def test_every_term_must_match(self, keyword_csv):
+        """Test that terms are combined with AND, in any case, and that ASINs are searchable"""
+        load_amazon_csv_from_string(keyword_csv)
+
+        assert [r['description'] for r in find_matching_items("2025-11-20", None, keywords="hdmi SPEED")] == \
+            ["High Speed HDMI Cable"]
+        assert [r['asin'] for r in find_matching_items("2025-11-20", None, keywords="b00hdmi")] == \
+            ["B00HDMI001", "B00HDMI002"]
+        assert find_matching_items("2025-11-20", None, keywords="toner hdmi") == []
+        assert find_matching_items("2025-11-20", None, keywords="!!") == []
+
+    def test_amount_and_tolerance_filters(self, keyword_csv):
+        """Test that an amount narrows keyword matches to that price"""
+        load_amazon_csv_from_string(keyword_csv)
+
+        exact = find_matching_items("2025-11-20", 45.99, days_range=60, keywords="cartridge")
+        near = find_matching_items("2025-11-20", 12.00, tolerance=AmountTolerance(cents=60), keywords="cable")
+
+        assert [r['asin'] for r in exact] == ["B00TONER01", "B00TONER02"]
+        assert [r['asin'] for r in near] == ["B00HDMI002"]
+        assert near[0]['amount_difference'] == 0.50
+
+    def test_endpoint(self, keyword_csv):
+        """Test q= with and without an amount"""
+        load_amazon_csv_from_string(keyword_csv)
+        client = app.app.test_client()
+
+        keyword_only = client.get('/api/purchases/search?date=2025-11-20&q=cable').json
+        with_amount = client.get('/api/purchases/search?date=2025-11-20&q=toner&amount=55.98').json
+
+        assert [r['asin'] for r in keyword_only['item_matches']] == ["B00HDMI001", "B00HDMI002"]
+        assert keyword_only['query']['target_amount'] is None
+        assert keyword_only['order_matches'] == []
+        assert keyword_only['combination_matches'] == []
+        assert [r['order_id'] for r in with_amount['order_matches']] == ["100-1"]
+        assert client.get('/api/purchases/search?date=2025-11-20').status_code == 400
+
+    @pytest.mark.parametrize("path", ['/api/purchases/search', '/api/purchases/search/stream'])
+    def test_query_without_words(self, keyword_csv, path):
+        """Test that a q of punctuation alone is rejected rather than matching nothing"""
+        load_amazon_csv_from_string(keyword_csv)
+
+        response = app.app.test_client().get(f'{path}?date=2025-11-20&amount=55.98&q=--%2F%21')
+
+        assert response.status_code == 400
+        assert response.json['error'] == "q has no searchable words"
+
+    def test_appended_purchases_are_searchable(self, keyword_csv):
+        """Test that an append adds new words and new rows for existing ones"""
+        load_amazon_csv_from_string(keyword_csv)
+        load_amazon_csv_from_string("\n".join([
+            TestBranchAndBoundSearch.HEADER,
+            "100-5,u,2025-11-19,1,Toner Drum,u,$80.00,0,B00DRUM001",
+        ]), append=True)
+
+        assert [r['asin'] for r in find_matching_items("2025-11-20", None, keywords="toner")] == \
+            ["B00TONER01", "B00DRUM001", "B00SAMPLE1"]
+        assert len(find_matching_items("2025-11-20", None, keywords="drum")) == 1
+
+
+@pytest.fixture(scope="module")
+def combination_pool():
+    """Two spawned workers, shared by the parallel search tests"""
+    pool = ProcessPoolExecutor(2, mp_context=multiprocessing.get_context("spawn"))
+    yield pool
+    pool.shutdown(cancel_futures=True)
+
+
+class TestParallelCombinationSearch:
+    """Test suite for the multi-process combination search"""
+
+    @pytest.fixture
+    def workers(self, combination_pool, monkeypatch):
+        """Hand the search to the pool after only a few expanded branches"""
+        def use_pool():
+            monkeypatch.setattr(app, "COMBINATION_POOL", combination_pool)
+            monkeypatch.setattr(app, "COMBINATION_WORKERS", 2)
+            monkeypatch.setattr(app, "COMBINATION_HANDOFF_EXPANSIONS", 8)
+        return use_pool
+
+    @pytest.mark.parametrize("tolerance", [None, AmountTolerance(cents=40)])
+    def test_same_top_ten_as_serial_search(self, workers, tolerance):
+        """Test that splitting the search across processes does not change the ranking"""
+        rng = random.Random(7)
+        rows = []
+        for order in range(60):
+            day = 10 + rng.randrange(20)
+            for line in range(rng.choice([1, 1, 2, 3, 4])):
+                price = rng.choice([4.99, 5.00, 7.25, 9.99, 10.00, 12.50, 15.01, 20.00])
+                rows.append(f"300-{order:07d},u,2025-11-{day:02d},1,Item {order}/{line},u,${price:.2f},0,A{order}")
+        load_amazon_csv_from_string("\n".join([TestBranchAndBoundSearch.HEADER] + rows))
+        amounts = (25.00, 30.01, 42.49)
+        serial = [search_combinations("2025-11-20", amount, days_range=10, max_items=4, tolerance=tolerance)
+                  for amount in amounts]
+
+        workers()
+        parallel = [search_combinations("2025-11-20", amount, days_range=10, max_items=4, tolerance=tolerance)
+                    for amount in amounts]
+
+        assert parallel == serial
+
+    def test_streams_every_match_it_returns(self, workers):
+        """Test that the matches found by workers are streamed before the final ranking"""
+        load_amazon_csv_from_string("\n".join([TestBranchAndBoundSearch.HEADER] + [
+            f"200-{i:07d},u,2025-11-{20 + i % 7:02d},1,Item {i},u,$5.00,0,A{i}" for i in range(40)
+        ]))
+        workers()
+
+        events = list(app.stream_combinations("2025-11-23", 15.00, 7, 3, SearchBudget(), None, app.NO_PROFILE))
+
+        streamed = {tuple(item['id'] for item in event[1]['items']) for event in events if event[0] == 'match'}
+        assert events[-1][0] == 'done'
+        assert events[-1][2] is True
+        assert {tuple(item['id'] for item in match['items']) for match in events[-1][1]} <= streamed
+
+
+class TestPurchaseStore:
+    """Test suite for the columnar purchase store"""
+
+    def test_item_match_has_all_purchase_fields(self, basic_items_csv):
+        """Test that row views unpack into the full set of purchase fields"""
+        load_amazon_csv_from_string(basic_items_csv)
+        result = find_matching_items("2025-11-26", 36.65, days_range=7)[0]
+
+        assert result['id'] == 1
+        assert result['order_id'] == '112-4070994-2049014'
+        assert result['item_url'] == 'https://www.amazon.com/test1'
+        assert result['order_url'] == 'https://www.amazon.com/test1'
+        assert result['asin'] == 'TEST1'
+        assert result['quantity'] == 1
+
+    def test_order_match_items_are_plain_dicts(self, multi_item_order_csv):
+        """Test that order matches embed their items as serializable dicts"""
+        load_amazon_csv_from_string(multi_item_order_csv)
+        order = find_matching_orders("2025-11-26", 46.65, days_range=7)[0]
+
+        assert [item['description'] for item in order['items']] == ['Test Item 1', 'Test Item 2']
+        assert all(isinstance(item, dict) for item in order['items'])
+        # Rows keep their own order url when it differs from the order's first row
+        assert order['items'][1]['order_url'] == 'https://www.amazon.com/test2'
+
+    def test_store_len_and_row_access(self, basic_items_csv):
+        """Test sequence access on the loaded store"""
+        load_amazon_csv_from_string(basic_items_csv)
+
+        assert len(app.PURCHASES) == 6
+        assert app.PURCHASES[-1]['description'] == 'Test Item 6'
+        assert app.PURCHASES[2].amount == 35.81
+        assert len(app.ORDERS) == 4
+
+    def test_packed_strings_across_blocks(self):
+        """Test reading values from compressed blocks and the pending tail"""
+        column = PackedStrings()
+        values = [f"value {i} \u00e9" for i in range(PackedStrings.BLOCK_SIZE * 2 + 5)]
+        for value in values:
+            column.append(value)
+
+        assert len(column) == len(values)
+        assert [column[i] for i in range(len(values))] == values
+
+
+class TestSearchCache:
+    """Test suite for the search endpoint's result cache"""
+
+    URL = '/api/purchases/search?date=2025-11-26&amount=36.65&days_range=7&search_type=all&max_combo_items=3'
+
+    def test_repeat_query_hits_cache(self, basic_items_csv):
+        """Test that an equivalent query is answered from the cache"""
+        load_amazon_csv_from_string(basic_items_csv)
+        client = app.app.test_client()
+        before = app.SEARCH_CACHE.stats()
+
+        first = client.get(self.URL).json
+        second = client.get(self.URL.replace('36.65', '36.650')).json
+        stats = app.SEARCH_CACHE.stats()
+
+        assert second['item_matches'] == first['item_matches']
+        assert second['query']['target_amount'] == 36.65
+        assert stats['misses'] == before['misses'] + 1
+        assert stats['hits'] == before['hits'] + 1
+
+    def test_upload_invalidates_cache(self, basic_items_csv):
+        """Test that results from a previous upload are never served"""
+        load_amazon_csv_from_string(basic_items_csv)
+        client = app.app.test_client()
+        assert client.get(self.URL).json['total_matches'] > 0
+
+        load_amazon_csv_from_string(basic_items_csv.replace('$36.65', '$1.00'))
+
+        assert client.get(self.URL).json['item_matches'] == []
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = app.ResultCache(max_size=2, ttl=60)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.stats()['evictions'] == 1
+
+
+class TestSearchResponseShape:
+    """Test suite for field projection, pagination, lean mode and compression of search responses"""
+
+    URL = '/api/purchases/search?date=2025-11-20&amount=10.00&days_range=7&search_type=all&max_combo_items=2'
+
+    @pytest.fixture
+    def client(self):
+        """Seven $10 single-item orders, a two-item $10 order and $5 items to combine"""
+        load_amazon_csv_from_string("\n".join([TestBranchAndBoundSearch.HEADER] + [
+            f"400-{i:07d},u{i},2025-11-{15 + i:02d},1,Item {i},i{i},$10.00,0,A{i}" for i in range(7)
+        ] + [
+            "401-0000001,o,2025-11-20,1,Left,l,$5.00,0,L1",
+            "401-0000001,o,2025-11-20,1,Right,r,$5.00,0,R1",
+        ]))
+        return app.app.test_client()
+
+    def test_fields_projection(self, client):
+        """Test that only the requested match and item fields are returned"""
+        full = client.get(self.URL).json
+        results = client.get(self.URL + '&fields=total,probability_score,items.description').json
+
+        assert results['order_matches'][0] == {
+            'total': full['order_matches'][0]['total'],
+            'items': [{'description': item['description']} for item in full['order_matches'][0]['items']]
+        }
+        assert results['item_matches'][0] == {}
+        assert results['combination_matches'][0]['probability_score'] == \
+            full['combination_matches'][0]['probability_score']
+        assert results['total_matches'] == full['total_matches']
+
+    def test_pages_cover_every_match(self, client):
+        """Test that following next_cursor returns each list once, in order"""
+        full = client.get(self.URL).json
+        pages = [client.get(self.URL + '&limit=3').json]
+        while pages[-1]['next_cursor']:
+            pages.append(client.get(self.URL + '&cursor=' + pages[-1]['next_cursor']).json)
+
+        assert len(pages) == 3
+        for key in ('item_matches', 'order_matches', 'combination_matches'):
+            assert [match for page in pages for match in page[key]] == full[key]
+        assert all(len(page['item_matches']) <= 3 for page in pages)
+        assert pages[0]['total_matches'] == full['total_matches']
+
+    def test_invalid_or_foreign_cursor(self, client):
+        """Test that a cursor only continues the search that issued it"""
+        cursor = client.get(self.URL + '&limit=3').json['next_cursor']
+
+        assert client.get(self.URL.replace('days_range=7', 'days_range=6') + '&cursor=' + cursor).status_code == 400
+        assert client.get(self.URL + '&cursor=not-a-cursor').status_code == 400
+        assert client.get(self.URL + '&limit=0').status_code == 400
+        load_amazon_csv_from_string("\n".join([TestBranchAndBoundSearch.HEADER,
+                                               "400-1,u,2025-11-20,1,Item,i,$10.00,0,A1"]))
+        assert client.get(self.URL + '&cursor=' + cursor).status_code == 400
+
+    def test_lean_mode_lists_each_purchase_once(self, client):
+        """Test that lean matches reference a deduplicated purchase table"""
+        full = client.get(self.URL).json
+        lean = client.get(self.URL + '&lean=1').json
+
+        purchases = lean['purchases']
+        assert [purchases[str(match['id'])]['description'] for match in lean['item_matches']] == \
+            [match['description'] for match in full['item_matches']]
+        assert [[purchases[str(i)] for i in match['item_ids']] for match in lean['order_matches']] == \
+            [match['items'] for match in full['order_matches']]
+        assert [match['item_ids'] for match in lean['combination_matches']] == \
+            [[item['id'] for item in match['items']] for match in full['combination_matches']]
+        assert all('items' not in match and 'description' not in match
+                   for key in ('item_matches', 'order_matches', 'combination_matches') for match in lean[key])
+        assert len(purchases) == 9
+
+    def test_gzip_when_accepted(self, client, monkeypatch):
+        """Test that large responses are compressed for clients that accept gzip"""
+        plain = client.get(self.URL)
+        monkeypatch.setattr(app, "RESPONSE_COMPRESS_MIN_BYTES", 100)
+
+        compressed = client.get(self.URL, headers={'Accept-Encoding': 'gzip, deflate'})
+        refused = client.get(self.URL, headers={'Accept-Encoding': 'gzip;q=0'})
+
+        assert compressed.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(compressed.data)) == plain.json
+        assert 'Content-Encoding' not in plain.headers
+        assert 'Content-Encoding' not in refused.headers
+        assert 'Accept-Encoding' in compressed.headers['Vary']
+
+
+class TestDatasetExport:
+    """Test suite for the columnar dataset export used by in-browser search"""
+
+    client = TestSearchResponseShape.client
+
+    def test_columns_describe_every_purchase(self, client):
+        """Test that the columns rebuild each purchase and order"""
+        data = client.get('/api/dataset').json
+        epoch = datetime(1970, 1, 1).toordinal()
+
+        assert [{
+            'id': i + 1,
+            'order_id': data['order_ids'][data['orders'][i]],
+            'date': datetime.fromordinal(epoch + data['days'][i]).strftime('%Y-%m-%d'),
+            'amount': data['cents'][i] / 100,
+            'description': data['strings'][data['descriptions'][i]],
+        } for i in range(len(data['cents']))] == [
+            {key: purchase[key] for key in ('id', 'order_id', 'date', 'amount', 'description')}
+            for purchase in app.PURCHASES
+        ]
+        assert data['order_cents'][data['order_ids'].index('401-0000001')] == 1000
+        assert len(data['strings']) == 9
+        assert data['version'] == app.DATASET_VERSION
+
+    def test_etag_until_next_upload(self, client):
+        """Test that the export revalidates until the dataset changes"""
+        first = client.get('/api/dataset')
+        etag = first.headers['ETag']
+
+        assert client.get('/api/dataset', headers={'If-None-Match': etag}).status_code == 304
+        load_amazon_csv_from_string("\n".join([TestBranchAndBoundSearch.HEADER,
+                                               "400-1,u,2025-11-20,1,Item,i,$10.00,0,A1"]))
+        changed = client.get('/api/dataset', headers={'If-None-Match': etag})
+        assert changed.status_code == 200
+        assert changed.headers['ETag'] != etag
+        assert changed.json['cents'] == [1000]
+
+    def test_gzip_when_accepted(self, client):
+        """Test that the export is sent compressed to clients that accept gzip"""
+        plain = client.get('/api/dataset')
+        compressed = client.get('/api/dataset', headers={'Accept-Encoding': 'gzip'})
+
+        assert compressed.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(compressed.data)) == plain.json
+        assert compressed.headers['ETag'] == plain.headers['ETag']
+
 
 # Edge Cases Tests
 class TestEdgeCases:
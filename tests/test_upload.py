@@ -0,0 +1,279 @@
+"""
+Test suite for CSV upload and ingestion.
+
+Tests cover the /api/upload endpoint (raw and multipart bodies, encodings)
+and row handling in the streaming loader.
+Run with: pytest tests/test_upload.py -v
+"""
+
+import io
+import threading
+
+import pytest
+import app
+from app import load_amazon_csv_from_string, find_matching_items
+
+
+HEADER = "order id,order url,order date,quantity,description,item url,price,subscribe & save,ASIN"
+
+
+@pytest.fixture
+def client():
+    """Flask test client"""
+    return app.app.test_client()
+
+
+@pytest.fixture
+def upload_csv():
+    """CSV with a subtotal row, a malformed row and a non-ASCII description"""
+    return "\n".join([
+        HEADER,
+        "112-4070994-2049014,https://www.amazon.com/test1,2025-11-26,1,Café Mug,https://www.amazon.com/test1,$36.65,0,TEST1",
+        "=SUBTOTAL,,,,,,,,",
+        "112-4070994-2049015,https://www.amazon.com/test2,not-a-date,1,Bad Row,https://www.amazon.com/test2,$10.00,0,TEST2",
+        "112-6824467-2953041,https://www.amazon.com/test3,2025-11-27,2,Test Item 3,https://www.amazon.com/test3,$35.81,0,TEST3",
+    ])
+
+
+class TestUploadEndpoint:
+    """Test suite for the /api/upload endpoint"""
+
+    def test_raw_csv_body(self, client, upload, upload_csv):
+        """Test uploading the file as a raw text/csv request body"""
+        response, job = upload(client, data=upload_csv.encode('utf-8'), content_type='text/csv')
+
+        assert response.status_code == 202
+        assert job['status'] == 'done'
+        assert job['result']['total_items'] == 2
+        assert job['result']['date_range'] == {'earliest': '2025-11-26', 'latest': '2025-11-27'}
+        assert (job['rows_processed'], job['rows_skipped']) == (4, 2)
+        assert job['progress'] == 1
+
+    def test_multipart_with_bom(self, client, upload, upload_csv):
+        """Test a multipart upload of a UTF-8 file with a byte order mark"""
+        body = b'\xef\xbb\xbf' + upload_csv.encode('utf-8')
+        response, job = upload(
+            client,
+            data={'file': (io.BytesIO(body), 'orders.csv')},
+            content_type='multipart/form-data',
+        )
+
+        assert job['status'] == 'done'
+        assert app.PURCHASES[0]['order_id'] == '112-4070994-2049014'
+        assert app.PURCHASES[0]['description'] == 'Café Mug'
+
+    def test_latin1_fallback(self, client, upload, upload_csv):
+        """Test that files which are not valid UTF-8 are read as latin-1"""
+        response, job = upload(client, data=upload_csv.encode('latin-1'), content_type='text/csv')
+
+        assert job['status'] == 'done'
+        assert app.PURCHASES[0]['description'] == 'Café Mug'
+
+    def test_latin1_after_first_chunk(self, client, upload, upload_csv):
+        """Test that a file with latin-1 bytes past its first chunk is read again as latin-1"""
+        filler = "\n".join(
+            f"113-{i:07d},https://www.amazon.com/o,2025-11-20,1,Item {i},https://www.amazon.com/i,$1.00,0,F{i}"
+            for i in range(app.UPLOAD_CHUNK_SIZE // 80 + 1))
+        body = upload_csv.replace("Café", "Cafe").encode('utf-8') + b"\n" + filler.encode('ascii') + (
+            "\n114-0000001,https://www.amazon.com/o,2025-11-21,1,Crème Brûlée Torch,"
+            "https://www.amazon.com/i,$20.00,0,T1").encode('latin-1')
+        response, job = upload(client, data=body, content_type='text/csv')
+
+        assert job['status'] == 'done'
+        assert app.PURCHASES[len(app.PURCHASES) - 1]['description'] == 'Crème Brûlée Torch'
+
+    def test_empty_file(self, client):
+        """Test that an empty body is rejected without starting a job"""
+        response = client.post('/api/upload', data=b"", content_type='text/csv')
+
+        assert response.status_code == 400
+        assert response.json['error'] == 'CSV file is empty'
+
+    def test_blank_file_fails_job(self, client, upload):
+        """Test that a file of blank lines fails its job and keeps the loaded dataset"""
+        load_amazon_csv_from_string(HEADER + "\n111-1,u,2025-11-26,1,Kept,u,$5.00,0,A1")
+
+        response, job = upload(client, data=b"  \n\n", content_type='text/csv')
+
+        assert job['status'] == 'failed'
+        assert job['error'] == 'CSV file is empty'
+        assert len(app.PURCHASES) == 1
+
+    def test_unknown_job(self, client):
+        """Test polling a job id that doesn't exist"""
+        assert client.get('/api/upload/nope').status_code == 404
+
+    def test_search_during_upload_sees_previous_dataset(self, client, monkeypatch):
+        """Test that searches keep using the old dataset until the job swaps the new one in"""
+        load_amazon_csv_from_string(HEADER + "\n111-1,u,2025-11-26,1,Old,u,$5.00,0,A1")
+        parsing = threading.Event()
+        release = threading.Event()
+        original = app.load_amazon_csv
+
+        def slow_load(lines, *args):
+            def progress(processed, skipped):
+                parsing.set()
+                release.wait(5)
+            return original(lines, args[0], args[1], progress)
+        monkeypatch.setattr(app, "load_amazon_csv", slow_load)
+
+        response = client.post('/api/upload', data=HEADER + "\n222-2,u,2025-11-26,1,New,u,$7.00,0,A2",
+                               content_type='text/csv')
+        assert parsing.wait(5)
+        during = client.get('/api/purchases/search?date=2025-11-26&amount=5.00&search_type=item').json
+        release.set()
+        app.UPLOAD_EXECUTOR.submit(lambda: None).result(5)
+        after = client.get('/api/purchases/search?date=2025-11-26&amount=7.00&search_type=item').json
+
+        assert client.get(response.json['status_url']).json['status'] == 'done'
+        assert [m['description'] for m in during['item_matches']] == ['Old']
+        assert [m['description'] for m in after['item_matches']] == ['New']
+
+    def test_non_csv_filename(self, client):
+        """Test that multipart uploads must be .csv files"""
+        response = client.post(
+            '/api/upload',
+            data={'file': (io.BytesIO(b'x'), 'orders.txt')},
+            content_type='multipart/form-data',
+        )
+
+        assert response.status_code == 400
+
+
+class TestLoader:
+    """Test suite for row handling in the loader"""
+
+    def test_summary_counts(self, upload_csv):
+        """Test that subtotal and malformed rows are skipped and counted"""
+        summary = load_amazon_csv_from_string(upload_csv)
+
+        assert summary['rows_processed'] == 4
+        assert summary['rows_skipped'] == 2
+        assert len(app.PURCHASES) == 2
+
+    def test_rejects_counted_by_reason(self):
+        """Test that rejected rows are counted per reason with a few samples each"""
+        summary = load_amazon_csv_from_string("\n".join([
+            HEADER,
+            "111-1,u,2025-11-26,1,Good,i,$5.00,0,A1",
+            "=SUBTOTAL,,,,,,,,",
+            ",u,2025-11-26,1,No order,i,$5.00,0,A2",
+            "111-2,u",
+            "111-3,u,2025-11-26,one,Bad quantity,i,$5.00,0,A3",
+        ] + [f"111-{i},u,2025-11-26,1,Bad price,i,$5.oo,0,B{i}" for i in range(10, 15)]))
+
+        rejected = summary['rejected']
+        assert {reason: entry['count'] for reason, entry in rejected.items()} == {
+            'bad_price': 5, 'bad_quantity': 1, 'missing_date': 1, 'missing_order_id': 1, 'subtotal': 1
+        }
+        assert [sample['row'] for sample in rejected['bad_price']['samples']] == [6, 7, 8]
+        assert rejected['missing_date']['samples'][0]['data'] == ['111-2', 'u']
+        assert 'invalid literal' in rejected['bad_quantity']['samples'][0]['error']
+        assert summary['rows_skipped'] == 9
+        assert len(app.PURCHASES) == 1
+
+    def test_stats_gathered_while_loading(self, client):
+        """Test that /api/stats and /api/health serve the statistics gathered during the load"""
+        load_amazon_csv_from_string("\n".join([
+            HEADER,
+            "111-1,u,2025-10-31,1,Mug,i,$4.00,0,A1",
+            "111-1,u,2025-10-31,1,Plate,i,$12.50,0,A2",
+            "111-2,u,2025-11-02,1,Lamp,i,$620.00,0,A3",
+            "111-3,u,2025-11-27,1,Pen,i,$1.25,0,A4",
+            "111-4,u,not-a-date,1,Bad,i,$1.00,0,A5",
+        ]))
+
+        stats = client.get('/api/stats').json
+        assert stats['date_range'] == {'earliest': '2025-10-31', 'latest': '2025-11-27'}
+        assert stats['months'] == [
+            {'month': '2025-10', 'items': 2, 'total': 16.50},
+            {'month': '2025-11', 'items': 2, 'total': 621.25},
+        ]
+        assert [bucket['items'] for bucket in stats['price_histogram']] == [2, 0, 1, 0, 0, 0, 0, 1]
+        assert stats['price_histogram'][-1] == {'min': 500.0, 'max': None, 'items': 1}
+        assert stats['order_sizes'] == [{'items': 1, 'orders': 2}, {'items': 2, 'orders': 1}]
+        assert (stats['items'], stats['orders']) == (4, 3)
+        assert stats['rejected_rows'] == {'bad_date': 1}
+        assert stats['dataset_version'] == app.DATASET_VERSION
+        assert client.get('/api/health').json['stats'] == {
+            key: value for key, value in stats.items() if key != 'dataset_version'
+        }
+
+    def test_quantity_and_missing_optional_columns(self):
+        """Test files without optional columns still load"""
+        load_amazon_csv_from_string("order id,order date,price\n111-1,2025-11-26,$12.50")
+        results = find_matching_items("2025-11-26", 12.50, days_range=1)
+
+        assert len(results) == 1
+        assert results[0]['description'] == ''
+        assert results[0]['quantity'] == 1
+
+    def test_short_row(self):
+        """Test that rows with missing trailing cells are parsed"""
+        load_amazon_csv_from_string(HEADER + "\n111-1,https://www.amazon.com/o,2025-11-26,3,Short,https://www.amazon.com/i,$5.00")
+
+        assert len(app.PURCHASES) == 1
+        assert app.PURCHASES[0]['asin'] == ''
+        assert app.PURCHASES[0]['quantity'] == 3
+
+
+class TestAppendUpload:
+    """Test suite for mode=append uploads"""
+
+    @pytest.fixture(autouse=True)
+    def history(self):
+        """Two orders already loaded"""
+        load_amazon_csv_from_string("\n".join([
+            HEADER,
+            "111-1,https://www.amazon.com/o1,2025-11-01,1,Cable,https://www.amazon.com/i1,$10.00,0,A1",
+            "111-1,https://www.amazon.com/o1,2025-11-01,1,Cable,https://www.amazon.com/i1,$10.00,0,A1",
+            "111-2,https://www.amazon.com/o2,2025-11-03,1,Lamp,https://www.amazon.com/i2,$20.00,0,A2",
+        ]))
+
+    def test_merges_and_deduplicates(self, client, upload):
+        """Test that known lines are skipped and new lines update their order in place"""
+        body = "\n".join([
+            HEADER,
+            "111-3,https://www.amazon.com/o3,2025-11-05,1,Pen,https://www.amazon.com/i3,$1.50,0,A3",
+            "111-2,https://www.amazon.com/o2,2025-11-03,1,Lamp,https://www.amazon.com/i2,$20.00,0,A2",
+            "111-2,https://www.amazon.com/o2,2025-11-03,1,Bulb,https://www.amazon.com/i4,$4.00,0,A4",
+            "111-1,https://www.amazon.com/o1,2025-11-01,1,Cable,https://www.amazon.com/i1,$10.00,0,A1",
+        ])
+        response, job = upload(client, '/api/upload?mode=append', data=body, content_type='text/csv')
+
+        assert job['result']['items_added'] == 2
+        assert job['result']['duplicates_skipped'] == 2
+        assert job['result']['total_items'] == 5
+        assert dict(app.ORDERS['111-2'])['total'] == 24.00
+        assert app.ORDERS['111-2']['item_count'] == 2
+        assert app.find_matching_orders("2025-11-03", 24.00, days_range=0)[0]['order_id'] == '111-2'
+        assert app.find_matching_orders("2025-11-03", 20.00, days_range=0) == []
+        assert [m['id'] for m in find_matching_items("2025-11-05", 1.50, days_range=0)] == [4]
+
+    def test_repeated_line_counts(self):
+        """Test that a line listed more often than it was loaded adds the extra copies"""
+        summary = load_amazon_csv_from_string("\n".join([HEADER] + [
+            "111-1,https://www.amazon.com/o1,2025-11-01,1,Cable,https://www.amazon.com/i1,$10.00,0,A1"
+        ] * 3), append=True)
+
+        assert (summary['rows_duplicate'], summary['items_added']) == (2, 1)
+        assert app.ORDERS['111-1']['item_count'] == 3
+
+    def test_patched_index_matches_rebuild(self):
+        """Test that the incrementally patched index equals a freshly sorted one"""
+        # Build the keyword postings so the append patches them too
+        app.INDEX.postings
+        load_amazon_csv_from_string("\n".join([HEADER] + [
+            f"11{i % 4},https://www.amazon.com/o,2025-11-0{i % 9 + 1},1,Item {i},https://www.amazon.com/i{i},"
+            f"${(i * 7) % 25 + 1}.00,0,B{i}"
+            for i in range(40)
+        ]), append=True)
+
+        rebuilt = app.PurchaseIndex(app.PURCHASES)
+        assert app.PURCHASES.stats.summary == app.DatasetStats.of(app.PURCHASES).summary
+        for name in app.PurchaseIndex.ARRAYS:
+            assert list(getattr(app.INDEX, name)) == list(getattr(rebuilt, name)), name
+        assert 'postings' in vars(app.INDEX)
+        assert [list(part) for part in app.INDEX.postings] == [list(part) for part in rebuilt.postings]
+        assert list(app.PURCHASES.order_members) == sorted(range(len(app.PURCHASES)),
+                                                            key=app.PURCHASES.order_idx.__getitem__)